@@ -1,14 +1,53 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
+import logging
 import os
+from src.config.settings import settings
+from src.utils.compression import CompressionMiddleware
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared clients once at startup and close them at shutdown."""
+    from fastapi.concurrency import run_in_threadpool
+    from src.db.database import mongodb
+    from src.db.engines import registry
+    from src.db.init_db import init_database
+    from src.services.upload_service import ingest_queue
+    from src.utils.auth import shutdown_password_hashing
+
+    await run_in_threadpool(init_database)
+    try:
+        await mongodb.connect()
+    except Exception as e:
+        # The API can still serve SQLite-backed routes without MongoDB
+        logger.warning(f"MongoDB unavailable at startup: {str(e)}")
+    resumed = await ingest_queue.resume()
+    if resumed:
+        logger.info(f"Resumed {resumed} queued uploads")
+    try:
+        yield
+    finally:
+        # Let running loads finish; unstarted ones stay queued for the next start
+        remaining = await ingest_queue.shutdown(settings.ingest_drain_timeout)
+        if remaining:
+            logger.warning(f"{remaining} uploads were still loading at shutdown")
+        await mongodb.disconnect()
+        await registry.dispose()
+        shutdown_password_hashing()
 
 # Create the FastAPI app
 app = FastAPI(
     title="POS Analytics API",
     description="API for POS transaction analytics",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -28,6 +67,14 @@ app.add_middleware(
     https_only=True
 )
 
+# Compress JSON and exports; added last so it wraps the other middleware
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.gzip_level,
+    brotli_quality=settings.brotli_quality
+)
+
 # Mount templates directory
 templates = Jinja2Templates(directory="src/templates")
 
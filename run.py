@@ -1,15 +1,58 @@
+import argparse
 import os
 import sys
 
 # Add the src directory to Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "src")))
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the POS Analytics server")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        default=os.environ.get("SERVER_MODE") == "production",
+        help="run several worker processes without auto-reload (or set SERVER_MODE=production)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", "0")),
+        help="worker processes in production mode; 0 = one per CPU core"
+    )
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    return parser.parse_args()
+
 if __name__ == "__main__":
     import uvicorn
-    
+
+    args = parse_args()
+
     # Create necessary directories
     os.makedirs("data/input", exist_ok=True)
     os.makedirs("logs", exist_ok=True)
-    
-    # Run the application
-    uvicorn.run("src.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+
+    if args.production:
+        # Workers share job progress and cache invalidations through this file;
+        # set before the workers import the settings
+        os.environ.setdefault("SHARED_STATE_PATH", "/tmp/pos_shared_state.db")
+        workers = args.workers or os.cpu_count() or 1
+        # Create and migrate the schema before any worker starts; the workers'
+        # own init_database then finds nothing left to do
+        from src.db.engines import registry
+        from src.db.init_db import init_database
+        init_database()
+        registry.writer().dispose()
+        uvicorn.run(
+            "api.index:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            proxy_headers=True,
+            # Keep open progress streams from holding up shutdown; running
+            # ingest jobs are drained afterwards by the app's lifespan
+            timeout_graceful_shutdown=int(os.environ.get("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+        )
+    else:
+        # Run the application
+        uvicorn.run("api.index:app", host=args.host, port=args.port, reload=True)
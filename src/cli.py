@@ -1,17 +1,200 @@
 import asyncio
 import typer
 from rich.console import Console
+from rich.table import Table
 from src.utils.system_check import verify_system
 
 console = Console()
+app = typer.Typer(help="POS Revenue System CLI")
 
-def main():
+@app.callback(invoke_without_command=True)
+def main(ctx: typer.Context):
     """POS Revenue System CLI"""
+    if ctx.invoked_subcommand is not None:
+        return
     try:
         asyncio.run(verify_system())
     except Exception as e:
         console.print(f"[red]Error running health check: {str(e)}[/red]")
         raise SystemExit(1)
 
+async def _with_mongodb(coro_factory):
+    from src.db.database import mongodb
+
+    await mongodb.connect()
+    try:
+        return await coro_factory(mongodb)
+    finally:
+        await mongodb.disconnect()
+
+@app.command("migrate")
+def migrate():
+    """Apply pending SQL schema migrations"""
+    from src.db.migrations import run_migrations, get_applied_versions
+    from src.db.engines import registry
+
+    engine = registry.writer()
+
+    try:
+        applied = run_migrations(engine)
+    except Exception as e:
+        console.print(f"[red]Error running migrations: {str(e)}[/red]")
+        raise SystemExit(1)
+    if applied:
+        console.print(f"Applied migrations: {applied}")
+    console.print(f"Schema version: {max(get_applied_versions(engine), default=0)}")
+
+@app.command("seed-users")
+def seed_users():
+    """Create the tables and add the demo users if there are no users yet"""
+    from src.db.base import Base
+    from src.db.engines import registry
+    from src.db.init_db import init_test_users
+
+    Base.metadata.create_all(bind=registry.writer())
+    db = registry.session()
+    try:
+        created = init_test_users(db)
+    except Exception as e:
+        console.print(f"[red]Error seeding users: {str(e)}[/red]")
+        raise SystemExit(1)
+    finally:
+        db.close()
+    console.print(f"Created {created} users" if created else "Users already exist")
+
+@app.command("db-vacuum")
+def db_vacuum():
+    """Rebuild the SQLite database with incremental auto-vacuum enabled"""
+    from sqlalchemy import text
+    from src.db.engines import registry
+
+    try:
+        with registry.writer().connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+            mode = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+    except Exception as e:
+        console.print(f"[red]Error vacuuming database: {str(e)}[/red]")
+        raise SystemExit(1)
+    console.print(f"Vacuum complete (auto_vacuum={mode})")
+
+@app.command("analytics-refresh")
+def analytics_refresh():
+    """Reload the DuckDB columnar analytics store from the SQL database"""
+    from src.services.columnar_analytics import columnar_store, duckdb_available
+    from src.db.engines import registry
+
+    if not duckdb_available():
+        console.print("[red]duckdb is not installed[/red]")
+        raise SystemExit(1)
+    db = registry.session()
+    try:
+        loaded = columnar_store.refresh(db, full=True)
+    except Exception as e:
+        console.print(f"[red]Error refreshing analytics store: {str(e)}[/red]")
+        raise SystemExit(1)
+    finally:
+        db.close()
+    console.print(f"Staged {loaded} transactions into {columnar_store.path}")
+
+@app.command("profile-startup")
+def profile_startup(
+    module: str = typer.Option("api.index", help="Module to import"),
+    top: int = typer.Option(15, help="Number of slowest modules to list")
+):
+    """Report the -X importtime cost of the app entry point against the budget"""
+    from src.config.settings import settings
+    from src.utils.import_profile import profile_imports
+
+    try:
+        profile = profile_imports(module)
+    except Exception as e:
+        console.print(f"[red]Error profiling imports: {str(e)}[/red]")
+        raise SystemExit(1)
+
+    table = Table(title=f"Slowest imports under {module}")
+    table.add_column("Module", style="cyan")
+    table.add_column("Cumulative ms", style="magenta", justify="right")
+    slowest = sorted(profile["modules"].items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative_ms in slowest[:top]:
+        table.add_row(name, f"{cumulative_ms:.1f}")
+    console.print(table)
+
+    over_budget = profile["total_ms"] > settings.import_time_budget_ms
+    color = "red" if over_budget else "green"
+    console.print(f"[{color}]Total import time: {profile['total_ms']:.0f} ms "
+                  f"(budget {settings.import_time_budget_ms} ms)[/{color}]")
+    if profile["lazy_modules_loaded"]:
+        console.print(f"[red]Loaded at import: {', '.join(profile['lazy_modules_loaded'])}[/red]")
+    if over_budget or profile["lazy_modules_loaded"]:
+        raise SystemExit(1)
+
+@app.command("mongo-diagnostics")
+def mongo_diagnostics():
+    """Show raw transaction indexes, build status and query plans"""
+    try:
+        diagnostics = asyncio.run(_with_mongodb(lambda db: db.get_index_diagnostics()))
+    except Exception as e:
+        console.print(f"[red]Error running MongoDB diagnostics: {str(e)}[/red]")
+        raise SystemExit(1)
+
+    indexes = Table(title="Indexes")
+    indexes.add_column("Name", style="cyan")
+    indexes.add_column("Keys", style="magenta")
+    indexes.add_column("Ops", style="green")
+    for name, info in diagnostics["indexes"].items():
+        keys = ", ".join(f"{field}:{direction}" for field, direction in info["key"])
+        indexes.add_row(name, keys, str(diagnostics["usage"].get(name, "-")))
+    console.print(indexes)
+
+    if diagnostics["builds_in_progress"]:
+        for build in diagnostics["builds_in_progress"]:
+            console.print(f"[yellow]Index build in progress: {build['indexes']} {build['msg'] or ''}[/yellow]")
+    else:
+        console.print("No index builds in progress")
+
+    plans = Table(title="Query Plans")
+    plans.add_column("Query", style="cyan")
+    plans.add_column("Status", style="magenta")
+    plans.add_column("Indexes", style="green")
+    for name, plan in diagnostics["plans"].items():
+        status = "❌ Collection scan" if plan["collection_scan"] else "✅ Index scan"
+        plans.add_row(name, status, ", ".join(plan["indexes"]) or "-")
+    console.print(plans)
+
+@app.command("retention-archive")
+def retention_archive(
+    days: int = typer.Option(None, help="Archive documents processed more than N days ago"),
+    dry_run: bool = typer.Option(False, help="Count matching documents without archiving them")
+):
+    """Archive processed raw transactions and delete them from MongoDB"""
+    from src.services.retention_service import RetentionService
+
+    try:
+        result = asyncio.run(_with_mongodb(lambda db: RetentionService(db).archive(days, dry_run=dry_run)))
+    except Exception as e:
+        console.print(f"[red]Error archiving raw transactions: {str(e)}[/red]")
+        raise SystemExit(1)
+    console.print(
+        f"Archived {result['archived']} documents, deleted {result['deleted']} "
+        f"(cutoff {result['cutoff']}) -> {result['path'] or 'no archive written'}"
+    )
+
+@app.command("retention-restore")
+def retention_restore(path: str = typer.Argument(..., help="Archive file to restore")):
+    """Restore archived raw transactions into MongoDB"""
+    from src.services.retention_service import RetentionService
+
+    try:
+        result = asyncio.run(_with_mongodb(lambda db: RetentionService(db).restore(path)))
+    except Exception as e:
+        console.print(f"[red]Error restoring archive: {str(e)}[/red]")
+        raise SystemExit(1)
+    console.print(
+        f"Restored {result['inserted']} documents "
+        f"({result['duplicates']} already present, {result['errors']} errors)"
+    )
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    app()
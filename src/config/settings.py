@@ -10,17 +10,86 @@ class Settings(BaseSettings):
     api_version: str = "1.0.0"
 
     # File upload settings
-    max_file_size: int = 10 * 1024 * 1024  # 10MB
+    max_file_size: int = int(os.environ.get("MAX_FILE_SIZE", str(10 * 1024 * 1024)))  # single-request uploads
+    max_upload_size: int = int(os.environ.get("MAX_UPLOAD_SIZE", str(5 * 1024 ** 3)))  # resumable uploads
+    upload_chunk_size: int = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # bytes buffered per write
+    ingest_concurrency: int = int(os.environ.get("INGEST_CONCURRENCY", "1"))  # uploads loaded at once
+    progress_event_interval_ms: int = int(os.environ.get("PROGRESS_EVENT_INTERVAL_MS", "500"))  # min gap between progress events
+    progress_poll_seconds: float = float(os.environ.get("PROGRESS_POLL_SECONDS", "2"))  # for jobs not running in this process
+    progress_keepalive_seconds: float = float(os.environ.get("PROGRESS_KEEPALIVE_SECONDS", "15"))
+    ingest_drain_timeout: float = float(os.environ.get("INGEST_DRAIN_TIMEOUT", "60"))  # seconds shutdown waits for running loads
     allowed_extensions: Set[str] = {".csv"}
     upload_dir: str = "/tmp/uploads"  # Use /tmp for Vercel
     input_dir: str = "/tmp/data/input"  # Use /tmp for Vercel
 
+    # Response compression settings (brotli is used when the package is installed)
+    compression_minimum_size: int = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", "1024"))  # bytes
+    gzip_level: int = int(os.environ.get("GZIP_LEVEL", "6"))
+    brotli_quality: int = int(os.environ.get("BROTLI_QUALITY", "4"))
+
     # Database settings
-    database_url: str = os.environ.get("DATABASE_URL", "sqlite:///tmp/app.db")
+    database_url: str = os.environ.get("DATABASE_URL", "sqlite:////tmp/app.db")
+    database_replica_url: str = os.environ.get("DATABASE_REPLICA_URL", "")  # read replica for server databases
+    writer_queue_timeout: int = int(os.environ.get("WRITER_QUEUE_TIMEOUT", "30"))  # seconds a write waits for the writer
+
+    # SQL connection pool settings (the SQLite writer always uses one connection)
+    db_pool_size: int = int(os.environ.get("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: int = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    db_pool_pre_ping: bool = os.environ.get("DB_POOL_PRE_PING", "false").lower() == "true"
+    db_pool_recycle: int = int(os.environ.get("DB_POOL_RECYCLE", "-1"))  # seconds, -1 = never
     mongodb_url: str = os.environ.get("MONGODB_URL", "mongodb://localhost:27017")
     mongodb_db: str = os.environ.get("MONGODB_DB", "pos_etl")
     mongodb_collection: str = os.environ.get("MONGODB_COLLECTION", "raw_transactions")
 
+    # MongoDB connection pool settings
+    mongodb_max_pool_size: int = int(os.environ.get("MONGODB_MAX_POOL_SIZE", "50"))
+    mongodb_min_pool_size: int = int(os.environ.get("MONGODB_MIN_POOL_SIZE", "5"))
+    mongodb_max_idle_time_ms: int = int(os.environ.get("MONGODB_MAX_IDLE_TIME_MS", "300000"))
+    mongodb_connect_timeout_ms: int = int(os.environ.get("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+    mongodb_server_selection_timeout_ms: int = int(os.environ.get("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    mongodb_socket_timeout_ms: int = int(os.environ.get("MONGODB_SOCKET_TIMEOUT_MS", "30000"))
+    mongodb_wait_queue_timeout_ms: int = int(os.environ.get("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+    mongodb_compressors: str = os.environ.get("MONGODB_COMPRESSORS", "")  # e.g. "zstd,snappy,zlib"
+    mongodb_zlib_compression_level: int = int(os.environ.get("MONGODB_ZLIB_COMPRESSION_LEVEL", "6"))
+    mongodb_cursor_batch_size: int = int(os.environ.get("MONGODB_CURSOR_BATCH_SIZE", "1000"))
+    mongodb_ensure_indexes: bool = os.environ.get("MONGODB_ENSURE_INDEXES", "true").lower() == "true"
+    mongodb_processed_ttl_days: int = int(os.environ.get("MONGODB_PROCESSED_TTL_DAYS", "0"))  # 0 disables the TTL
+
+    # Raw document retention settings
+    retention_days: int = int(os.environ.get("RETENTION_DAYS", "30"))
+    retention_batch_size: int = int(os.environ.get("RETENTION_BATCH_SIZE", "1000"))
+    retention_max_docs_per_second: int = int(os.environ.get("RETENTION_MAX_DOCS_PER_SECOND", "2000"))  # 0 = unlimited
+    retention_compression: str = os.environ.get("RETENTION_COMPRESSION", "zstd")  # zstd or gzip
+    archive_dir: str = os.environ.get("ARCHIVE_DIR", "/tmp/data/archive")
+
+    # Result cache settings
+    cache_backend: str = os.environ.get("CACHE_BACKEND", "memory")  # memory, sqlite or none
+    cache_ttl_seconds: int = int(os.environ.get("CACHE_TTL_SECONDS", "300"))
+    cache_max_entries: int = int(os.environ.get("CACHE_MAX_ENTRIES", "1000"))
+    cache_path: str = os.environ.get("CACHE_PATH", "/tmp/pos_cache.db")
+
+    # Server worker settings
+    web_concurrency: int = int(os.environ.get("WEB_CONCURRENCY", "0"))  # 0 = one worker per core
+    shared_state_path: str = os.environ.get("SHARED_STATE_PATH", "")  # empty = single process, no shared state
+    shared_state_poll_ms: int = int(os.environ.get("SHARED_STATE_POLL_MS", "250"))  # how often caches check for invalidations
+
+    # Analytics backend settings
+    analytics_backend: str = os.environ.get("ANALYTICS_BACKEND", "rollup")  # rollup or duckdb
+    duckdb_path: str = os.environ.get("DUCKDB_PATH", ":memory:")
+    duckdb_threads: int = int(os.environ.get("DUCKDB_THREADS", "0"))  # 0 = one per core
+    duckdb_full_refresh_seconds: int = int(os.environ.get("DUCKDB_FULL_REFRESH_SECONDS", "3600"))
+
+    # Data clear settings
+    clear_batch_size: int = int(os.environ.get("CLEAR_BATCH_SIZE", "2000"))
+    clear_batch_pause_seconds: float = float(os.environ.get("CLEAR_BATCH_PAUSE_SECONDS", "0.01"))
+
+    # Import time allowed for the serverless entry point (see `cli.py profile-startup`)
+    import_time_budget_ms: int = int(os.environ.get("IMPORT_TIME_BUDGET_MS", "1200"))
+
+    # Export settings
+    export_batch_size: int = int(os.environ.get("EXPORT_BATCH_SIZE", "5000"))
+
     # ETL settings
     batch_size: int = int(os.environ.get("BATCH_SIZE", "1000"))
     sync_interval: int = int(os.environ.get("SYNC_INTERVAL", "300"))  # 5 minutes
@@ -29,6 +98,13 @@ class Settings(BaseSettings):
     secret_key: str = os.environ.get("SECRET_KEY", "your-secret-key-here")
     algorithm: str = "HS256"
     access_token_expire_minutes: int = int(os.environ.get("TOKEN_EXPIRE_MINUTES", "30"))
+    # bcrypt runs on this many threads; further logins wait their turn
+    password_hash_workers: int = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+    # Seed the demo users into an empty users table at startup (see `cli.py seed-users`)
+    seed_test_users: bool = os.environ.get("SEED_TEST_USERS", "true").lower() == "true"
+    token_cache_max_entries: int = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    user_cache_ttl_seconds: int = int(os.environ.get("USER_CACHE_TTL_SECONDS", "30"))
+    user_cache_max_entries: int = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "1000"))
 
     class Config:
         env_prefix = "POS_ETL_"
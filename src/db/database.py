@@ -1,26 +1,81 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 import logging
 import asyncio
-from contextlib import asynccontextmanager
+from datetime import datetime
 from src.models.pos_transaction import Base
 from src.config.settings import settings
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable, Iterator, AsyncIterator, Callable
+import importlib.util
+import bson
 from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src.db.monitoring import MongoPoolMetrics, MongoCommandMetrics
+from src.db.mongo_indexes import ensure_indexes, index_diagnostics
+from src.db.migrations import run_migrations
+from src.db.engines import registry
 
 logger = logging.getLogger(__name__)
 
-# SQLite Configuration
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
+# MongoDB server limits for a single write command
+MAX_BULK_OPS = 100_000
+MAX_BULK_BYTES = 16 * 1024 * 1024
+
+# Fields the SQL loaders read from raw transaction documents
+RAW_TRANSACTION_FIELDS = (
+    "store_code", "store_display_name", "trans_date", "trans_time", "trans_no",
+    "till_no", "discount_header", "tax_header", "net_sales_header_values",
+    "quantity", "trans_type", "id_key", "tender", "dm_load_date",
+    "dm_load_delta_id", "user_id",
 )
+RAW_TRANSACTION_PROJECTION = {field: 1 for field in RAW_TRANSACTION_FIELDS}
+
+# Wire protocol compressors and the optional module each one needs
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+def _available_compressors(requested: str) -> List[str]:
+    """Filter the configured compressors down to the ones that can be loaded"""
+    available = []
+    for name in (c.strip().lower() for c in requested.split(",") if c.strip()):
+        if name not in COMPRESSOR_MODULES:
+            logger.warning(f"Unknown MongoDB compressor ignored: {name}")
+            continue
+        module = COMPRESSOR_MODULES[name]
+        if module and importlib.util.find_spec(module) is None:
+            logger.warning(f"MongoDB compressor {name} requires the {module} package, skipping")
+            continue
+        available.append(name)
+    return available
+
+def _write_op_size(op) -> int:
+    """Approximate the BSON size of a bulk write operation"""
+    size = 0
+    for attr in ("_filter", "_doc"):
+        part = getattr(op, attr, None)
+        if isinstance(part, dict):
+            size += len(bson.encode(part))
+    return size
 
-# SQLite SessionMaker
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def chunk_by_limits(
+    items: Iterable[Any],
+    size_of: Callable[[Any], int],
+    max_ops: int = MAX_BULK_OPS,
+    max_bytes: int = MAX_BULK_BYTES
+) -> Iterator[List[Any]]:
+    """Split items into batches that stay under the op-count and byte limits"""
+    batch: List[Any] = []
+    batch_bytes = 0
+    for item in items:
+        item_bytes = size_of(item)
+        if batch and (len(batch) >= max_ops or batch_bytes + item_bytes > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(item)
+        batch_bytes += item_bytes
+    if batch:
+        yield batch
 
 # MongoDB Client
 class MongoDB:
@@ -29,34 +84,82 @@ class MongoDB:
         self.db = None
         self.collection = None
         self._connected = False
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self.pool_metrics = MongoPoolMetrics()
+        self.command_metrics = MongoCommandMetrics()
 
     @property
     def is_connected(self) -> bool:
         """Check if MongoDB is connected"""
         return self._connected and self.client is not None and self.db is not None and self.collection is not None
 
+    def _client_options(self) -> Dict[str, Any]:
+        """Build the Motor client options from settings"""
+        options = {
+            "maxPoolSize": settings.mongodb_max_pool_size,
+            "minPoolSize": settings.mongodb_min_pool_size,
+            "maxIdleTimeMS": settings.mongodb_max_idle_time_ms,
+            "connectTimeoutMS": settings.mongodb_connect_timeout_ms,
+            "serverSelectionTimeoutMS": settings.mongodb_server_selection_timeout_ms,
+            "socketTimeoutMS": settings.mongodb_socket_timeout_ms,
+            "waitQueueTimeoutMS": settings.mongodb_wait_queue_timeout_ms,
+            "event_listeners": [self.pool_metrics, self.command_metrics],
+        }
+        compressors = _available_compressors(settings.mongodb_compressors)
+        if compressors:
+            options["compressors"] = compressors
+            options["zlibCompressionLevel"] = settings.mongodb_zlib_compression_level
+        return options
+
     async def ensure_connected(self):
         """Ensure MongoDB connection is established"""
         if not self.is_connected:
             await self.connect()
 
+    async def _get_collection(self):
+        """Return the raw transactions collection, connecting lazily if needed"""
+        if not self.is_connected:
+            await self.connect()
+        return self.collection
+
     async def connect(self):
-        """Connect to MongoDB"""
+        """Connect to MongoDB.
+
+        The client is created and verified once (normally from the app
+        lifespan); after that the driver's pool handles reconnects itself.
+        """
         if self.is_connected:
             return
 
-        try:
-            self.client = AsyncIOMotorClient(settings.mongodb_url)
-            await self.client.admin.command('ping')  # Test connection
-            
-            self.db = self.client[settings.mongodb_db]
-            self.collection = self.db[settings.mongodb_collection]
-            self._connected = True
-            logger.info("Successfully connected to MongoDB")
-        except Exception as e:
-            await self.disconnect()
-            logger.error(f"Failed to connect to MongoDB: {str(e)}")
-            raise
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self.is_connected:
+                return
+
+            try:
+                self.client = AsyncIOMotorClient(settings.mongodb_url, **self._client_options())
+                await self.client.admin.command('ping')  # Test connection
+
+                self.db = self.client[settings.mongodb_db]
+                self.collection = self.db[settings.mongodb_collection]
+                self._connected = True
+                logger.info(
+                    f"Successfully connected to MongoDB "
+                    f"(pool {settings.mongodb_min_pool_size}-{settings.mongodb_max_pool_size})"
+                )
+            except Exception as e:
+                await self.disconnect()
+                logger.error(f"Failed to connect to MongoDB: {str(e)}")
+                raise
+
+            if settings.mongodb_ensure_indexes:
+                try:
+                    await ensure_indexes(self.collection)
+                except Exception as e:
+                    # Missing indexes slow queries down but must not block startup
+                    logger.error(f"Failed to migrate MongoDB indexes: {str(e)}")
 
     async def disconnect(self):
         """Disconnect from MongoDB"""
@@ -71,45 +174,210 @@ class MongoDB:
         except Exception as e:
             logger.error(f"Error during MongoDB disconnect: {str(e)}")
 
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get connection pool and command latency metrics"""
+        return {
+            "connected": self.is_connected,
+            "pool_options": {
+                "max_pool_size": settings.mongodb_max_pool_size,
+                "min_pool_size": settings.mongodb_min_pool_size,
+                "max_idle_time_ms": settings.mongodb_max_idle_time_ms,
+                "wait_queue_timeout_ms": settings.mongodb_wait_queue_timeout_ms,
+            },
+            "pool": self.pool_metrics.snapshot(),
+            "commands": self.command_metrics.snapshot(),
+        }
+
     async def insert_raw_transaction(self, transaction: Dict[str, Any]) -> bool:
         """Insert a raw transaction into MongoDB"""
         try:
-            await self.ensure_connected()
-            if not self.is_connected:
-                raise Exception("MongoDB not connected")
-            
-            result = await self.collection.insert_one(transaction)
+            collection = await self._get_collection()
+
+            result = await collection.insert_one(transaction)
             return result.inserted_id is not None
         except Exception as e:
             logger.error(f"Failed to insert transaction: {str(e)}")
             return False
 
-    async def get_unprocessed_transactions(self, batch_size: int = 100) -> List[Dict[str, Any]]:
-        """Get unprocessed transactions from MongoDB"""
+    async def insert_many_raw(self, transactions: List[Dict[str, Any]], ordered: bool = False) -> Dict[str, int]:
+        """Insert raw transactions in batches sized to the server write limits"""
+        counts = {"inserted": 0, "duplicates": 0, "errors": 0, "batches": 0}
+        if not transactions:
+            return counts
+
         try:
-            await self.ensure_connected()
-            if not self.is_connected:
-                raise Exception("MongoDB not connected")
-            
-            cursor = self.collection.find({"processed": False}).limit(batch_size)
+            collection = await self._get_collection()
+        except Exception as e:
+            logger.error(f"Failed to insert transactions: {str(e)}")
+            counts["errors"] = len(transactions)
+            return counts
+
+        pending = len(transactions)
+        for batch in chunk_by_limits(transactions, lambda doc: len(bson.encode(doc))):
+            counts["batches"] += 1
+            pending -= len(batch)
+            try:
+                result = await collection.insert_many(batch, ordered=ordered)
+                counts["inserted"] += len(result.inserted_ids)
+            except BulkWriteError as e:
+                # Duplicate keys are expected on re-loads and are not treated as failures
+                inserted = e.details.get("nInserted", 0)
+                write_errors = e.details.get("writeErrors", [])
+                duplicates = sum(1 for err in write_errors if err.get("code") == 11000)
+                counts["inserted"] += inserted
+                counts["duplicates"] += duplicates
+                if ordered:
+                    # An ordered insert stops at the first error
+                    counts["errors"] += len(batch) - inserted - duplicates + pending
+                    break
+                counts["errors"] += len(write_errors) - duplicates
+            except Exception as e:
+                logger.error(f"Failed to insert transaction batch: {str(e)}")
+                counts["errors"] += len(batch) + pending
+                break
+
+        logger.info(f"Bulk inserted {counts['inserted']} transactions in {counts['batches']} batches")
+        return counts
+
+    async def bulk_upsert(self, transactions: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Upsert raw transactions keyed on (store_code, trans_no)"""
+        operations = []
+        for transaction in transactions:
+            document = {k: v for k, v in transaction.items() if k != "_id"}
+            update: Dict[str, Any] = {"$set": document}
+            if "processed" not in document:
+                update["$setOnInsert"] = {"processed": False}
+            operations.append(UpdateOne(
+                {"store_code": document.get("store_code"), "trans_no": document.get("trans_no")},
+                update,
+                upsert=True
+            ))
+        return await self.bulk_write(operations)
+
+    async def bulk_write(self, operations: List[Any], ordered: bool = False) -> Dict[str, int]:
+        """Run mixed write operations in batches sized to the server write limits"""
+        counts = {
+            "inserted": 0, "matched": 0, "modified": 0, "deleted": 0,
+            "upserted": 0, "errors": 0, "batches": 0
+        }
+        if not operations:
+            return counts
+
+        try:
+            collection = await self._get_collection()
+        except Exception as e:
+            logger.error(f"Failed to run bulk write: {str(e)}")
+            counts["errors"] = len(operations)
+            return counts
+
+        pending = len(operations)
+        for batch in chunk_by_limits(operations, _write_op_size):
+            counts["batches"] += 1
+            pending -= len(batch)
+            try:
+                result = await collection.bulk_write(batch, ordered=ordered)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                counts["errors"] += len(details.get("writeErrors", []))
+                if ordered:
+                    counts["errors"] += pending
+                    self._add_bulk_counts(counts, details)
+                    break
+            except Exception as e:
+                logger.error(f"Failed to run bulk write batch: {str(e)}")
+                counts["errors"] += len(batch) + pending
+                break
+            self._add_bulk_counts(counts, details)
+
+        logger.info(
+            f"Bulk write finished: {counts['inserted']} inserted, {counts['upserted']} upserted, "
+            f"{counts['modified']} modified, {counts['deleted']} deleted, {counts['errors']} errors"
+        )
+        return counts
+
+    @staticmethod
+    def _add_bulk_counts(counts: Dict[str, int], details: Dict[str, Any]) -> None:
+        counts["inserted"] += details.get("nInserted", 0)
+        counts["matched"] += details.get("nMatched", 0)
+        counts["modified"] += details.get("nModified", 0)
+        counts["deleted"] += details.get("nRemoved", 0)
+        counts["upserted"] += details.get("nUpserted", 0)
+
+    async def get_unprocessed_transactions(
+        self,
+        batch_size: int = 100,
+        projection: Optional[Dict[str, int]] = RAW_TRANSACTION_PROJECTION
+    ) -> List[Dict[str, Any]]:
+        """Get unprocessed transactions from MongoDB, limited to the projected fields"""
+        try:
+            collection = await self._get_collection()
+
+            cursor = collection.find({"processed": False}, projection).limit(batch_size)
             return await cursor.to_list(length=batch_size)
         except Exception as e:
             logger.error(f"Failed to get unprocessed transactions: {str(e)}")
             return []
 
+    async def iter_unprocessed_transactions(
+        self,
+        limit: int = 0,
+        batch_size: Optional[int] = None,
+        projection: Optional[Dict[str, int]] = RAW_TRANSACTION_PROJECTION
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream unprocessed transactions without materializing the whole result.
+
+        ``batch_size`` controls how many documents each getMore round trip
+        fetches; ``limit`` of 0 means no limit.
+        """
+        collection = await self._get_collection()
+        cursor = collection.find({"processed": False}, projection).limit(limit)
+        cursor = cursor.batch_size(batch_size or settings.mongodb_cursor_batch_size)
+        async for document in cursor:
+            yield document
+
+    async def get_unprocessed_columns(
+        self,
+        batch_size: int = 100,
+        fields: Iterable[str] = RAW_TRANSACTION_FIELDS
+    ) -> Dict[str, List[Any]]:
+        """Get unprocessed transactions as columns keyed by field name.
+
+        Documents are read as RawBSONDocument so only the projected fields are
+        ever decoded, and are appended straight into per-field lists for the
+        SQL loaders. The ``_id`` column is always included.
+        """
+        fields = list(fields)
+        columns: Dict[str, List[Any]] = {"_id": [], **{field: [] for field in fields}}
+        try:
+            collection = await self._get_collection()
+            raw_collection = collection.with_options(
+                codec_options=CodecOptions(document_class=RawBSONDocument)
+            )
+            cursor = raw_collection.find(
+                {"processed": False},
+                {field: 1 for field in fields}
+            ).limit(batch_size).batch_size(min(batch_size, settings.mongodb_cursor_batch_size))
+
+            async for document in cursor:
+                for field, values in columns.items():
+                    values.append(document.get(field))
+            return columns
+        except Exception as e:
+            logger.error(f"Failed to get unprocessed transactions: {str(e)}")
+            return {field: [] for field in columns}
+
     async def mark_as_processed(self, transaction_ids: List[str]) -> int:
         """Mark transactions as processed"""
         try:
-            await self.ensure_connected()
-            if not self.is_connected:
-                raise Exception("MongoDB not connected")
-            
+            collection = await self._get_collection()
+
             # Convert string IDs to ObjectId
             object_ids = [ObjectId(id_) for id_ in transaction_ids]
             
-            result = await self.collection.update_many(
+            result = await collection.update_many(
                 {"_id": {"$in": object_ids}},
-                {"$set": {"processed": True}}
+                {"$set": {"processed": True, "processed_at": datetime.utcnow()}}
             )
             logger.info(f"Marked {result.modified_count} transactions as processed")
             return result.modified_count
@@ -117,14 +385,53 @@ class MongoDB:
             logger.error(f"Failed to mark transactions as processed: {str(e)}")
             return 0
 
+    async def get_index_diagnostics(self) -> Dict[str, Any]:
+        """Get index definitions, build status and plans for the sync queries"""
+        collection = await self._get_collection()
+        return await index_diagnostics(self.client, collection)
+
+    async def get_processed_before(
+        self,
+        cutoff: datetime,
+        after_id: Optional[ObjectId] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """Get processed transactions older than the cutoff, in _id order.
+
+        Documents processed before processed_at was recorded fall back to the
+        creation time embedded in their ObjectId.
+        """
+        query: Dict[str, Any] = {
+            "processed": True,
+            "$or": [
+                {"processed_at": {"$lt": cutoff}},
+                {"processed_at": {"$exists": False}, "_id": {"$lt": ObjectId.from_datetime(cutoff)}},
+            ],
+        }
+        if after_id is not None:
+            query["_id"] = {"$gt": after_id}
+
+        collection = await self._get_collection()
+        cursor = collection.find(query).sort("_id", 1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def delete_by_ids(self, transaction_ids: List[Any]) -> int:
+        """Delete transactions by _id"""
+        try:
+            collection = await self._get_collection()
+
+            result = await collection.delete_many({"_id": {"$in": transaction_ids}})
+            return result.deleted_count
+        except Exception as e:
+            logger.error(f"Failed to delete transactions: {str(e)}")
+            return 0
+
     async def delete_all(self) -> bool:
         """Delete all documents in the collection (for testing/cleanup)"""
         try:
-            await self.ensure_connected()
-            if not self.is_connected:
-                raise Exception("MongoDB not connected")
-            
-            result = await self.collection.delete_many({})
+            collection = await self._get_collection()
+
+            result = await collection.delete_many({})
             logger.info(f"Deleted {result.deleted_count} documents from MongoDB")
             return True
         except Exception as e:
@@ -136,23 +443,18 @@ mongodb = MongoDB()
 
 def init_db():
     """Initialize SQLite database"""
+    engine = registry.writer()
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 def get_db():
     """Get SQLite database session"""
-    db = SessionLocal()
+    db = registry.session()
     try:
         yield db
     finally:
         db.close()
 
-# Async SQLite setup for background tasks
-ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./pos_transactions.db"
-async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
-async_session = sessionmaker(
-    async_engine, 
-    class_=AsyncSession, 
-    expire_on_commit=False,
-    autocommit=False, 
-    autoflush=False
-) 
\ No newline at end of file
+def async_session():
+    """Open an async session for background tasks"""
+    return registry.async_session()
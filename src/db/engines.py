@@ -0,0 +1,382 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util import await_only
+from src.config.settings import settings
+from src.db.sqlite import configure_sqlite_engine, is_sqlite_file, read_only_url
+
+logger = logging.getLogger(__name__)
+
+# Async drivers for the sync URLs we support
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+class SQLPoolMetrics:
+    """SQLAlchemy pool counters, fed by pool events and the timed pool classes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._created = 0
+            self._closed = 0
+            self._checked_out = 0
+            self._checkout_timeouts = 0
+            self._in_use = 0
+            self._max_in_use = 0
+            self._wait_total = 0.0
+            self._wait_max = 0.0
+
+    def attach(self, pool_events_target) -> None:
+        """Listen to connect/close/checkout/checkin events of an engine or pool"""
+        event.listen(pool_events_target, "connect", self._on_connect)
+        event.listen(pool_events_target, "close", self._on_close)
+        event.listen(pool_events_target, "checkout", self._on_checkout)
+        event.listen(pool_events_target, "checkin", self._on_checkin)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._created += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._closed += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self._in_use += 1
+            self._max_in_use = max(self._max_in_use, self._in_use)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._in_use = max(self._in_use - 1, 0)
+
+    def record_wait(self, wait: float) -> None:
+        with self._lock:
+            self._checked_out += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self._checkout_timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of the current pool counters"""
+        with self._lock:
+            checkouts = self._checked_out
+            return {
+                "connections_created": self._created,
+                "connections_closed": self._closed,
+                "connections_open": self._created - self._closed,
+                "checked_out": checkouts,
+                "checkout_timeouts": self._checkout_timeouts,
+                "in_use": self._in_use,
+                "max_in_use": self._max_in_use,
+                "avg_checkout_wait_ms": (self._wait_total / checkouts * 1000) if checkouts else 0.0,
+                "max_checkout_wait_ms": self._wait_max * 1000,
+            }
+
+class _TimedPoolMixin:
+    """Record how long each checkout waited for a connection."""
+
+    metrics: Optional[SQLPoolMetrics] = None
+
+    def recreate(self):
+        # engine.dispose() swaps in a recreated pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        metrics = self.metrics
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            if metrics:
+                metrics.record_timeout()
+            raise
+        if metrics:
+            metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+class _WriteLockMixin:
+    """Hold a lock shared with the other writer pool while a connection is checked out.
+
+    The sync and async writers open their own connections to the same
+    SQLite file; with the lock only one of them is in use at a time, so a
+    write waits for the other one instead of failing with "database is
+    locked".
+    """
+
+    write_lock: Optional[threading.Lock] = None
+    write_lock_timeout: float = -1
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.write_lock = self.write_lock
+        pool.write_lock_timeout = self.write_lock_timeout
+        return pool
+
+    def _acquire_write_lock(self) -> bool:
+        return self.write_lock.acquire(timeout=self.write_lock_timeout)
+
+    def _do_get(self):
+        if self.write_lock is None:
+            return super()._do_get()
+        if not self._acquire_write_lock():
+            raise exc.TimeoutError(f"Timed out after {self.write_lock_timeout}s waiting for the database writer")
+        try:
+            return super()._do_get()
+        except BaseException:
+            self.write_lock.release()
+            raise
+
+    def _do_return_conn(self, record):
+        try:
+            super()._do_return_conn(record)
+        finally:
+            if self.write_lock is not None:
+                self.write_lock.release()
+
+class _AsyncWriteLockMixin(_WriteLockMixin):
+    def _acquire_write_lock(self) -> bool:
+        # Wait on a worker thread so the event loop keeps running meanwhile
+        lock = self.write_lock
+        acquired = asyncio.get_running_loop().run_in_executor(None, lock.acquire, True, self.write_lock_timeout)
+        try:
+            return await_only(asyncio.shield(acquired))
+        except BaseException:
+            # Cancelled while waiting: give the lock back once the thread gets it
+            acquired.add_done_callback(lambda future: future.exception() is None and future.result() and lock.release())
+            raise
+
+class WriterQueuePool(_WriteLockMixin, TimedQueuePool):
+    pass
+
+class AsyncWriterQueuePool(_AsyncWriteLockMixin, TimedAsyncAdaptedQueuePool):
+    pass
+
+# SQLAlchemy names pool loggers after the pool class; keep ours at the
+# WARN default it uses for its own pools
+for _pool_class in (TimedQueuePool, TimedAsyncAdaptedQueuePool, WriterQueuePool, AsyncWriterQueuePool):
+    _pool_logger = logging.getLogger(f"{__name__}.{_pool_class.__name__}")
+    if _pool_logger.level == logging.NOTSET:
+        _pool_logger.setLevel(logging.WARN)
+
+def to_async_url(url: str) -> str:
+    """Get the async driver URL for a database URL."""
+    parsed = make_url(url)
+    if "+" in parsed.drivername or parsed.drivername not in ASYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.drivername]).render_as_string(hide_password=False)
+
+class EngineRegistry:
+    """The process-wide SQLAlchemy engines, created on first use.
+
+    ``writer`` and ``async_writer`` share one pool configuration from
+    Settings. For SQLite files each writer is limited to a single
+    connection, and the two pools share one lock held while either
+    connection is checked out, so all writes to the file queue behind each
+    other instead of failing with "database is locked". ``reader`` and
+    ``async_reader`` serve read-only queries from a replica or from
+    read-only WAL connections to the same file.
+    """
+
+    def __init__(self, database_url: Optional[str] = None, replica_url: Optional[str] = None):
+        self.database_url = database_url or settings.database_url
+        self.replica_url = settings.database_replica_url if replica_url is None else replica_url
+        # Reentrant: building the reader creates the writer first
+        self._lock = threading.RLock()
+        self._engines: Dict[str, Any] = {}
+        self._sessionmakers: Dict[str, Any] = {}
+        self._metrics: Dict[str, SQLPoolMetrics] = {}
+        # Shared by the sync and async writer pools of a SQLite file
+        self._write_lock = threading.Lock()
+
+    def _pool_args(self, url: str, single_writer: bool) -> Dict[str, Any]:
+        args: Dict[str, Any] = {
+            "pool_pre_ping": settings.db_pool_pre_ping,
+            "pool_recycle": settings.db_pool_recycle,
+        }
+        if url.startswith("sqlite") and not is_sqlite_file(url):
+            # In-memory databases keep the dialect's default pool
+            return args
+        args.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+        if single_writer:
+            args.update(pool_size=1, max_overflow=0, pool_timeout=settings.writer_queue_timeout)
+        return args
+
+    def _share_write_lock(self, engine: Engine) -> None:
+        engine.pool.write_lock = self._write_lock
+        engine.pool.write_lock_timeout = settings.writer_queue_timeout
+
+    def _instrument(self, name: str, engine: Engine) -> None:
+        metrics = self._metrics[name] = SQLPoolMetrics()
+        metrics.attach(engine)
+        if isinstance(engine.pool, _TimedPoolMixin):
+            engine.pool.metrics = metrics
+
+    def _build(self, name: str) -> Any:
+        url = self.database_url
+        sqlite_file = is_sqlite_file(url)
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+        if name == "writer":
+            if sqlite_file:
+                os.makedirs(os.path.dirname(os.path.abspath(make_url(url).database)), exist_ok=True)
+            pool_args = self._pool_args(url, single_writer=sqlite_file)
+            if "pool_size" in pool_args:
+                pool_args.update(poolclass=WriterQueuePool if sqlite_file else TimedQueuePool)
+            engine = configure_sqlite_engine(create_engine(url, connect_args=connect_args, **pool_args))
+            if sqlite_file:
+                self._share_write_lock(engine)
+            self._instrument(name, engine)
+            return engine
+
+        if name == "reader":
+            if self.replica_url:
+                pool_args = self._pool_args(self.replica_url, single_writer=False)
+                pool_args.update(poolclass=TimedQueuePool)
+                engine = create_engine(self.replica_url, **pool_args)
+            elif sqlite_file:
+                # A read-only connection cannot create the file, so let the writer do it
+                with self.writer().connect():
+                    pass
+                pool_args = self._pool_args(url, single_writer=False)
+                pool_args.update(poolclass=TimedQueuePool)
+                engine = configure_sqlite_engine(
+                    create_engine(read_only_url(url), connect_args=connect_args, **pool_args),
+                    read_only=True
+                )
+            else:
+                return self.writer()
+            self._instrument(name, engine)
+            return engine
+
+        if name == "async_writer":
+            if sqlite_file:
+                os.makedirs(os.path.dirname(os.path.abspath(make_url(url).database)), exist_ok=True)
+            pool_args = self._pool_args(url, single_writer=sqlite_file)
+            if "pool_size" in pool_args:
+                pool_args.update(poolclass=AsyncWriterQueuePool if sqlite_file else TimedAsyncAdaptedQueuePool)
+            engine = create_async_engine(to_async_url(url), **pool_args)
+            configure_sqlite_engine(engine.sync_engine)
+            if sqlite_file:
+                self._share_write_lock(engine.sync_engine)
+            self._instrument(name, engine.sync_engine)
+            return engine
+
+        if name == "async_reader":
+            if self.replica_url:
+                read_url = self.replica_url
+            elif sqlite_file:
+                # Same as the sync reader: the writer creates the file first
+                with self.writer().connect():
+                    pass
+                read_url = read_only_url(url)
+            else:
+                return self.async_writer()
+            pool_args = self._pool_args(read_url, single_writer=False)
+            pool_args.update(poolclass=TimedAsyncAdaptedQueuePool)
+            engine = create_async_engine(to_async_url(read_url), **pool_args)
+            configure_sqlite_engine(engine.sync_engine, read_only=True)
+            self._instrument(name, engine.sync_engine)
+            return engine
+
+        raise ValueError(f"Unknown engine: {name}")
+
+    def _get(self, name: str) -> Any:
+        engine = self._engines.get(name)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(name)
+                if engine is None:
+                    engine = self._engines[name] = self._build(name)
+                    logger.info(f"Created {name} engine for {make_url(self.database_url).render_as_string()}")
+        return engine
+
+    def writer(self) -> Engine:
+        return self._get("writer")
+
+    def reader(self) -> Engine:
+        return self._get("reader")
+
+    def async_writer(self) -> AsyncEngine:
+        return self._get("async_writer")
+
+    def async_reader(self) -> AsyncEngine:
+        return self._get("async_reader")
+
+    def _sessionmaker(self, name: str):
+        factory = self._sessionmakers.get(name)
+        if factory is None:
+            if name in ("async_writer", "async_reader"):
+                factory = async_sessionmaker(
+                    self._get(name), class_=AsyncSession,
+                    expire_on_commit=False, autoflush=False
+                )
+            else:
+                # Objects stay readable after commit without starting another
+                # transaction, which would hold the single writer connection
+                factory = sessionmaker(
+                    autocommit=False, autoflush=False, expire_on_commit=False, bind=self._get(name)
+                )
+            self._sessionmakers[name] = factory
+        return factory
+
+    def session(self) -> Session:
+        """Open a session on the writer engine."""
+        return self._sessionmaker("writer")()
+
+    def read_session(self) -> Session:
+        """Open a session for read-only queries."""
+        return self._sessionmaker("reader")()
+
+    def async_session(self) -> AsyncSession:
+        """Open an async session on the writer database."""
+        return self._sessionmaker("async_writer")()
+
+    def async_read_session(self) -> AsyncSession:
+        """Open an async session for read-only queries."""
+        return self._sessionmaker("async_reader")()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Pool status and checkout latency of each engine created so far."""
+        metrics = {}
+        for name, engine in list(self._engines.items()):
+            sync_engine = getattr(engine, "sync_engine", engine)
+            if name not in self._metrics:
+                continue
+            metrics[name] = {"pool": sync_engine.pool.status(), **self._metrics[name].snapshot()}
+        return metrics
+
+    async def dispose(self) -> None:
+        """Close the pooled connections of every engine."""
+        for engine in list(self._engines.values()):
+            if isinstance(engine, AsyncEngine):
+                await engine.dispose()
+            else:
+                engine.dispose()
+
+registry = EngineRegistry()
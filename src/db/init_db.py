@@ -1,17 +1,19 @@
 import logging
-import os
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from src.config.settings import settings
+from sqlalchemy import text
 from src.models.user import User
 from src.models.pos_transaction import POSTransaction
+from src.models.upload import Upload
+from src.models.data_version import DataVersion
 from src.utils.auth import get_password_hash
 from src.db.base import Base
+from src.db.migrations import run_migrations, schema_lock
+from src.db.engines import registry
+from src.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
-def init_test_users(db):
-    """Initialize test users if they don't exist."""
+def init_test_users(db) -> int:
+    """Initialize test users if the users table is empty; returns how many were added."""
     try:
         # Check if users exist
         if db.query(User).count() == 0:
@@ -40,61 +42,75 @@ def init_test_users(db):
             
             db.commit()
             logger.info("Test users initialized successfully")
+            return len(test_users)
+        return 0
     except Exception as e:
         db.rollback()
         logger.error(f"Error initializing test users: {str(e)}")
         raise
 
 def init_database():
-    """Initialize database connection and create tables."""
+    """Create tables, apply migrations and seed test users.
+
+    Runs once per process from the app lifespan; request handlers and
+    repositories never touch the schema or seed data. Worker processes
+    starting together take turns under `schema_lock`, so only the first
+    one creates tables, migrates and seeds.
+    """
     try:
-        # Create database directory if it doesn't exist
-        db_path = settings.database_url.replace("sqlite:///", "")
-        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
-        
-        # Create engine
-        engine = create_engine(
-            settings.database_url,
-            connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
-        )
-        
-        # Create tables if they don't exist
-        Base.metadata.create_all(bind=engine)
-        
-        # Create session factory
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        
-        # Initialize test users
-        db = SessionLocal()
-        try:
-            # Test connection
-            db.execute(text("SELECT 1"))
-            
+        engine = registry.writer()
+
+        with schema_lock(registry.database_url):
+            # Create tables if they don't exist, then bring existing ones up to date
+            Base.metadata.create_all(bind=engine)
+            run_migrations(engine)
+
             # Initialize test users
-            init_test_users(db)
-            
-            logger.info("Database initialized successfully")
-        except Exception as e:
-            logger.error(f"Error testing database connection: {str(e)}")
-            raise
-        finally:
-            db.close()
-        
-        return engine, SessionLocal
+            db = registry.session()
+            try:
+                # Test connection
+                db.execute(text("SELECT 1"))
+
+                if settings.seed_test_users:
+                    init_test_users(db)
+
+                logger.info("Database initialized successfully")
+            except Exception as e:
+                logger.error(f"Error testing database connection: {str(e)}")
+                raise
+            finally:
+                db.close()
+
+        return engine
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
 
 def get_db():
-    """Get database session."""
-    db = SessionLocal()
+    """Get database session for writes."""
+    db = registry.session()
     try:
         yield db
     finally:
         db.close()
 
-# Initialize database and create global SessionLocal
-engine, SessionLocal = init_database()
+def get_read_db():
+    """Get database session for read-only queries."""
+    db = registry.read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Get an async database session for writes."""
+    async with registry.async_session() as db:
+        yield db
+
+async def get_async_read_db():
+    """Get an async database session for read-only queries."""
+    async with registry.async_read_session() as db:
+        yield db
 
 if __name__ == "__main__":
     # Set up logging
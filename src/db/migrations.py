@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, Tuple
+from sqlalchemy import Integer, MetaData, Table, inspect, insert, select, text
+from sqlalchemy.engine import Connection, Engine, make_url
+from src.models.dimensions import Store, TenderType, TransactionType
+from src.models.pos_transaction import POSTransaction
+from src.models.sales_rollup import DailySalesRollup, HourlySalesRollup
+from src.services.dimension_service import encode_dimensions
+from src.services.rollup_service import rebuild_rollups
+from src.db.sqlite import is_sqlite_file
+from src.db.types import parse_time_of_day
+
+try:
+    import fcntl
+except ImportError:  # Windows: no worker processes to coordinate with
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+def _create_indexes(conn: Connection, table, names: List[str]) -> None:
+    """Create the named model indexes that do not exist yet"""
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+def _dashboard_indexes(conn: Connection) -> None:
+    _create_indexes(conn, POSTransaction.__table__, [
+        "ix_pos_transactions_user_date_store",
+        "ix_pos_transactions_store_date",
+        "ix_pos_transactions_trans_date",
+    ])
+
+def _is_compact(conn: Connection) -> bool:
+    columns = {column["name"] for column in inspect(conn).get_columns(POSTransaction.__tablename__)}
+    return "tender_code" in columns
+
+def _sales_rollups(conn: Connection) -> None:
+    for model in (DailySalesRollup, HourlySalesRollup):
+        model.__table__.create(conn, checkfirst=True)
+    # The model reads the compact layout; an older table is rebuilt by migration 4
+    if _is_compact(conn):
+        rebuild_rollups(conn)
+
+def _keyset_index(conn: Connection) -> None:
+    _create_indexes(conn, POSTransaction.__table__, ["ix_pos_transactions_user_date"])
+
+def _unparseable_times(conn: Connection, table_name: str, chunk_size: int) -> List[int]:
+    """Get the ids of rows whose trans_time is not a valid time of day"""
+    old_table = Table(table_name, MetaData(), autoload_with=conn)
+    bad, last_id = [], 0
+    while True:
+        rows = conn.execute(
+            select(old_table.c.id, old_table.c.trans_time)
+            .where(old_table.c.id > last_id).order_by(old_table.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return bad
+        for row_id, trans_time in rows:
+            try:
+                parse_time_of_day(trans_time)
+            except ValueError:
+                bad.append(row_id)
+        last_id = rows[-1][0]
+
+def _compact_transactions(conn: Connection, chunk_size: int = 10000) -> None:
+    """Move pos_transactions to integer cents, seconds of day and dimension codes.
+
+    Times are read back as 24-hour 'HH:MM:SS' whatever format they were
+    loaded in. Rows whose time cannot be parsed stop the migration before
+    anything changes, so they can be fixed instead of losing their time.
+    """
+    for model in (Store, TenderType, TransactionType):
+        model.__table__.create(conn, checkfirst=True)
+    if _is_compact(conn):
+        return
+
+    table = POSTransaction.__table__
+    bad = _unparseable_times(conn, table.name, chunk_size)
+    if bad:
+        raise ValueError(
+            f"{len(bad)} transactions have a trans_time that is not a time of day "
+            f"(ids {', '.join(map(str, bad[:10]))}{', ...' if len(bad) > 10 else ''}); "
+            "fix or delete them and restart"
+        )
+    old_columns = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    # Renaming keeps the indexes, whose names the new table needs
+    for index in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {table.name}_old"))
+    table.create(conn)
+
+    old_table = Table(f"{table.name}_old", MetaData(), autoload_with=conn)
+    copied_columns = [column.name for column in table.columns if column.name in old_columns]
+    last_id, copied = 0, 0
+    while True:
+        rows = [dict(row._mapping) for row in conn.execute(
+            select(old_table).where(old_table.c.id > last_id).order_by(old_table.c.id).limit(chunk_size)
+        )]
+        if not rows:
+            break
+        encode_dimensions(conn, rows)
+        conn.execute(insert(table), [
+            {name: row.get(name) for name in copied_columns + ["tender_code", "trans_type_code"]}
+            for row in rows
+        ])
+        last_id = rows[-1]["id"]
+        copied += len(rows)
+
+    conn.execute(text(f"DROP TABLE {table.name}_old"))
+    logger.info(f"Copied {copied} transactions to the compact layout")
+    rebuild_rollups(conn)
+
+def _rollup_cents(conn: Connection) -> None:
+    """Rebuild float rollup tables with their money columns in integer cents."""
+    columns = {column["name"]: column["type"] for column in inspect(conn).get_columns(DailySalesRollup.__tablename__)}
+    if isinstance(columns["net_sales"], Integer):
+        return
+    # The rollups are derived data, so recreate them rather than convert
+    for model in (DailySalesRollup, HourlySalesRollup):
+        model.__table__.drop(conn)
+        model.__table__.create(conn)
+    rebuild_rollups(conn)
+
+# Ordered schema migrations: (version, description, upgrade function).
+# Base.metadata.create_all only creates missing tables, so anything that
+# changes an existing table must be added here.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Composite indexes for dashboard queries", _dashboard_indexes),
+    (2, "Daily and hourly sales rollups", _sales_rollups),
+    (3, "Index for keyset pagination of transactions", _keyset_index),
+    (4, "Compact transaction storage with dimension tables", _compact_transactions),
+    (5, "Sales rollup money in integer cents", _rollup_cents),
+]
+
+def get_applied_versions(engine: Engine) -> List[int]:
+    """Get the versions already recorded in schema_migrations"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, description VARCHAR, applied_at TIMESTAMP)"
+        ))
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+def _lock_path(url: str) -> str:
+    if is_sqlite_file(url):
+        return os.path.abspath(make_url(url).database) + ".schema.lock"
+    digest = hashlib.sha1(url.encode()).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"pos_schema_{digest}.lock")
+
+@contextmanager
+def schema_lock(url: str) -> Iterator[None]:
+    """Hold an exclusive lock for a database's schema setup across processes.
+
+    Server workers start together and each one runs `init_database`; the
+    first to get the lock creates and migrates the schema, the others find
+    it done once they get their turn.
+    """
+    if fcntl is None:
+        yield
+        return
+    path = _lock_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations in order, each in its own transaction.
+
+    Call under `schema_lock` when other processes may migrate the same
+    database; the applied versions are read after the lock is held.
+    """
+    applied = set(get_applied_versions(engine))
+    newly_applied = []
+
+    for version, description, upgrade in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()}
+            )
+        logger.info(f"Applied migration {version}: {description}")
+        newly_applied.append(version)
+
+    return newly_applied
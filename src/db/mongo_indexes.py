@@ -0,0 +1,153 @@
+import logging
+from typing import Dict, Any, List
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Names of every index this module has ever managed. Indexes listed here but
+# missing from the current spec are dropped on the next migration.
+MANAGED_INDEX_NAMES = {
+    "unprocessed_idx",
+    "store_trans_no_uniq",
+    "id_key_idx",
+    "processed_ttl_idx",
+}
+
+# Options compared when deciding whether an existing index must be rebuilt
+COMPARED_OPTIONS = ("unique", "partialFilterExpression", "expireAfterSeconds")
+
+# Representative queries whose plans are checked by the diagnostics command
+PLAN_CHECKS = {
+    "unprocessed": {"processed": False},
+    "mark_processed": {"_id": {"$in": [ObjectId()]}},
+    "dedup_trans_no": {"store_code": "", "trans_no": ""},
+    "dedup_id_key": {"id_key": 0},
+}
+
+def raw_transaction_index_specs() -> List[Dict[str, Any]]:
+    """Index specs for the raw transactions collection"""
+    specs = [
+        {
+            # Sync reads only ever look at unprocessed documents
+            "name": "unprocessed_idx",
+            "keys": [("processed", 1), ("_id", 1)],
+            "options": {"partialFilterExpression": {"processed": False}},
+        },
+        {
+            "name": "store_trans_no_uniq",
+            "keys": [("store_code", 1), ("trans_no", 1)],
+            "options": {"unique": True},
+        },
+        {
+            "name": "id_key_idx",
+            "keys": [("id_key", 1)],
+            "options": {},
+        },
+    ]
+    if settings.mongodb_processed_ttl_days > 0:
+        specs.append({
+            "name": "processed_ttl_idx",
+            "keys": [("processed_at", 1)],
+            "options": {
+                "expireAfterSeconds": settings.mongodb_processed_ttl_days * 86400,
+                "partialFilterExpression": {"processed": True},
+            },
+        })
+    return specs
+
+def _index_matches(info: Dict[str, Any], spec: Dict[str, Any]) -> bool:
+    """Check whether an existing index matches its spec"""
+    existing_keys = [(field, int(direction)) for field, direction in info.get("key", [])]
+    if existing_keys != spec["keys"]:
+        return False
+    return all(info.get(option) == spec["options"].get(option) for option in COMPARED_OPTIONS)
+
+async def ensure_indexes(collection) -> Dict[str, List[str]]:
+    """Create missing indexes, rebuild changed ones and drop retired ones"""
+    report = {"created": [], "rebuilt": [], "dropped": [], "failed": []}
+    existing = await collection.index_information()
+    specs = raw_transaction_index_specs()
+    wanted = {spec["name"] for spec in specs}
+
+    for name in existing:
+        if name in MANAGED_INDEX_NAMES and name not in wanted:
+            await collection.drop_index(name)
+            report["dropped"].append(name)
+
+    for spec in specs:
+        current = existing.get(spec["name"])
+        if current is not None and _index_matches(current, spec):
+            continue
+        try:
+            if current is not None:
+                await collection.drop_index(spec["name"])
+            await collection.create_index(spec["keys"], name=spec["name"], **spec["options"])
+            report["rebuilt" if current is not None else "created"].append(spec["name"])
+        except OperationFailure as e:
+            # e.g. existing duplicates prevent building the unique index
+            logger.error(f"Failed to build index {spec['name']}: {str(e)}")
+            report["failed"].append(spec["name"])
+
+    if any(report.values()):
+        logger.info(f"MongoDB index migration: {report}")
+    return report
+
+def _plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a winning plan into its stages"""
+    stages = [plan]
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    return stages
+
+def summarize_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce explain() output to the scan type and indexes used"""
+    winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+    # Slot-based engine plans nest the classic plan under queryPlan
+    winning = winning.get("queryPlan", winning)
+    stages = _plan_stages(winning)
+    names = [stage.get("stage") for stage in stages]
+    indexes = [stage["indexName"] for stage in stages if "indexName" in stage]
+    return {
+        "collection_scan": "COLLSCAN" in names,
+        "indexes": indexes,
+        "stages": names,
+    }
+
+async def index_diagnostics(client, collection) -> Dict[str, Any]:
+    """Collect index definitions, usage, in-progress builds and query plans"""
+    diagnostics: Dict[str, Any] = {
+        "indexes": await collection.index_information(),
+        "usage": {},
+        "builds_in_progress": [],
+        "plans": {},
+    }
+
+    try:
+        async for stats in collection.aggregate([{"$indexStats": {}}]):
+            diagnostics["usage"][stats["name"]] = stats.get("accesses", {}).get("ops", 0)
+    except OperationFailure as e:
+        logger.warning(f"Index usage stats unavailable: {str(e)}")
+
+    try:
+        pipeline = [
+            {"$currentOp": {"allUsers": True, "idleConnections": False}},
+            {"$match": {"command.createIndexes": collection.name}},
+        ]
+        async for op in client.admin.aggregate(pipeline):
+            diagnostics["builds_in_progress"].append({
+                "indexes": [index.get("name") for index in op["command"].get("indexes", [])],
+                "progress": op.get("progress"),
+                "msg": op.get("msg"),
+            })
+    except OperationFailure as e:
+        logger.warning(f"Index build status unavailable: {str(e)}")
+
+    for name, query in PLAN_CHECKS.items():
+        explain = await collection.find(query).explain()
+        diagnostics["plans"][name] = summarize_plan(explain)
+
+    return diagnostics
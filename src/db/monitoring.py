@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Dict, Any
+from pymongo import monitoring
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener that keeps pool usage counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._created = 0
+            self._closed = 0
+            self._checked_out = 0
+            self._checkout_failed = 0
+            self._in_use = 0
+            self._max_in_use = 0
+            self._pool_cleared = 0
+            self._wait_total = 0.0
+            self._wait_max = 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self._created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._closed += 1
+
+    def connection_check_out_started(self, event):
+        # Motor runs each operation on an executor thread, so the checkout
+        # start and finish events for one operation share a thread.
+        self._local.started = time.perf_counter()
+
+    def _checkout_wait(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_failed(self, event):
+        self._checkout_wait()
+        with self._lock:
+            self._checkout_failed += 1
+
+    def connection_checked_out(self, event):
+        wait = self._checkout_wait()
+        with self._lock:
+            self._checked_out += 1
+            self._in_use += 1
+            self._max_in_use = max(self._max_in_use, self._in_use)
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._in_use = max(self._in_use - 1, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of the current pool counters"""
+        with self._lock:
+            checkouts = self._checked_out
+            return {
+                "connections_created": self._created,
+                "connections_closed": self._closed,
+                "connections_open": self._created - self._closed,
+                "checked_out": checkouts,
+                "checkout_failed": self._checkout_failed,
+                "in_use": self._in_use,
+                "max_in_use": self._max_in_use,
+                "pool_cleared": self._pool_cleared,
+                "avg_checkout_wait_ms": (self._wait_total / checkouts * 1000) if checkouts else 0.0,
+                "max_checkout_wait_ms": self._wait_max * 1000,
+            }
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Command listener that keeps per-command latency counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands: Dict[str, Dict[str, float]] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._commands = {}
+
+    def _record(self, command_name: str, duration_micros: int, failed: bool) -> None:
+        duration_ms = duration_micros / 1000
+        with self._lock:
+            stats = self._commands.setdefault(
+                command_name,
+                {"count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            if failed:
+                stats["failures"] += 1
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.command_name, event.duration_micros, failed=False)
+
+    def failed(self, event):
+        self._record(event.command_name, event.duration_micros, failed=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return latency counters keyed by command name"""
+        with self._lock:
+            return {
+                name: {
+                    "count": int(stats["count"]),
+                    "failures": int(stats["failures"]),
+                    "avg_ms": stats["total_ms"] / stats["count"] if stats["count"] else 0.0,
+                    "max_ms": stats["max_ms"],
+                }
+                for name, stats in self._commands.items()
+            }
@@ -0,0 +1,74 @@
+import logging
+import os
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+def is_sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+def read_only_url(url: str) -> str:
+    """Get a URL that opens a SQLite file read-only (other URLs are returned as is)"""
+    if not is_sqlite_file(url):
+        return url
+    path = os.path.abspath(make_url(url).database)
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+def configure_sqlite_engine(engine: Engine, read_only: bool = False) -> Engine:
+    """Set the connection pragmas the app relies on for SQLite engines.
+
+    WAL lets readers keep going while a batch is being written, and
+    incremental auto-vacuum lets space freed by deletes be returned to the
+    OS in small steps. auto_vacuum only takes effect on a new database or
+    after a full VACUUM (see `cli.py db-vacuum`). Read-only engines leave
+    the file settings to the writer.
+    """
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    if read_only:
+        @event.listens_for(engine, "connect")
+        def _set_query_only(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute("PRAGMA query_only=ON")
+            finally:
+                cursor.close()
+
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        finally:
+            cursor.close()
+
+    return engine
+
+def reclaim_free_pages(db: Session, pages_per_step: int = 1000) -> int:
+    """Release free pages left by deletes, a few at a time, committing in between"""
+    if db.get_bind().dialect.name != "sqlite":
+        return 0
+    if db.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+        db.commit()
+        return 0
+
+    released = 0
+    while True:
+        free_pages = db.execute(text("PRAGMA freelist_count")).scalar()
+        if not free_pages:
+            break
+        step = min(free_pages, pages_per_step)
+        db.execute(text(f"PRAGMA incremental_vacuum({step})"))
+        db.commit()
+        released += step
+    if released:
+        logger.info(f"Released {released} free pages")
+    return released
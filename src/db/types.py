@@ -0,0 +1,74 @@
+import math
+import re
+from datetime import datetime, time
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Optional
+from sqlalchemy import Integer
+from sqlalchemy.types import TypeDecorator
+
+def _missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+# H:MM[:SS[.fff]] with an optional AM/PM suffix
+TIME_OF_DAY = re.compile(r"^(\d{1,2}):(\d{1,2})(?::(\d{1,2})(?:\.\d+)?)?\s*(?:([ap])\.?m\.?)?$", re.IGNORECASE)
+
+def parse_time_of_day(value: Any) -> Optional[int]:
+    """Convert 'H:MM[:SS]' strings (24-hour or with AM/PM) or time objects to seconds since midnight.
+
+    Missing values give None; anything else that is not a valid time of
+    day raises ValueError, so a bad value is never stored as NULL.
+    """
+    if _missing(value) or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, datetime):
+        value = value.time()
+    if isinstance(value, time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    if isinstance(value, int) and not isinstance(value, bool):
+        if not 0 <= value < 24 * 3600:
+            raise ValueError(f"Seconds of day out of range: {value}")
+        return value
+    match = TIME_OF_DAY.match(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid time of day: {value!r}")
+    hours, minutes, seconds = (int(part or 0) for part in match.group(1, 2, 3))
+    meridiem = match.group(4)
+    if meridiem:
+        if not 1 <= hours <= 12:
+            raise ValueError(f"Invalid time of day: {value!r}")
+        hours = hours % 12 + (12 if meridiem.lower() == "p" else 0)
+    if hours > 23 or minutes > 59 or seconds > 59:
+        raise ValueError(f"Invalid time of day: {value!r}")
+    return hours * 3600 + minutes * 60 + seconds
+
+def format_time_of_day(seconds: Optional[int]) -> Optional[str]:
+    if seconds is None:
+        return None
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+class Cents(TypeDecorator):
+    """Money stored as an integer number of cents and read back as a float."""
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if _missing(value):
+            return None
+        # Via the decimal text so 12.345 rounds to 1235 like it reads
+        return int((Decimal(str(float(value))) * 100).to_integral_value(ROUND_HALF_UP))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else value / 100
+
+class SecondsOfDay(TypeDecorator):
+    """Time of day stored as seconds since midnight and read back as 24-hour 'HH:MM:SS'."""
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return parse_time_of_day(value)
+
+    def process_result_value(self, value, dialect):
+        return format_time_of_day(value)
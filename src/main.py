@@ -1,21 +1,41 @@
 import os
+import hashlib
 import logging
 from fastapi import FastAPI, Request, File, UploadFile, HTTPException, Depends, APIRouter, Form
 from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, or_
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from datetime import datetime
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, RedirectResponse, Response, StreamingResponse
+from starlette.datastructures import UploadFile as FormFile
+from starlette.requests import ClientDisconnect
+from datetime import datetime, date
+from typing import Optional, Tuple
 from src.models.user import User
 from src.models.pos_transaction import POSTransaction
 from src.utils.auth import (
-    verify_password, create_access_token, get_current_user,
-    ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash
+    verify_password_async, create_access_token, get_current_user,
+    ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash, password_hash_metrics
 )
-from src.repositories.user_repository import UserRepository
-from src.services.etl_service import ETLService
-from src.db.init_db import get_db
+from src.repositories.user_repository import AsyncUserRepository
+from src.repositories.transaction_repository import AsyncTransactionRepository
+from src.repositories.analytics_repository import AsyncAnalyticsRepository
+from src.repositories.data_version_repository import AsyncDataVersionRepository
+from src.services.analytics_service import get_user_data_filter, get_cache_scope, columnar_analytics
+from src.services.data_service import DataService
+from src.services.export_service import ExportService
+from src.services.upload_service import (
+    UploadService, UploadTooLarge, IngestQueue, ingest_queue, check_filename,
+    parse_upload_metadata, write_chunks, file_sha256, received_bytes, upload_lock, serialize_upload,
+    progress_events
+)
+from src.utils.status_monitor import ingest_monitors
+from src.utils.shared_state import get_shared_state
+from src.db.init_db import get_db, get_read_db, get_async_read_db
+from src.db.engines import registry
 from src.config.settings import settings
+from src.utils.http_cache import cache_headers, is_not_modified
 
 # Configure logging for Vercel
 logging.basicConfig(level=logging.INFO)
@@ -27,28 +47,42 @@ app = APIRouter()
 # Initialize templates
 templates = Jinja2Templates(directory="src/templates")
 
-def get_user_repository(db: Session = Depends(get_db)):
-    """Get user repository with database session."""
-    return UserRepository(db)
-
-def get_user_data_filter(user: dict, query, db: Session):
-    """Apply user-specific data filter to query."""
-    if user["role"] == "admin":
-        # Admin can see all data
-        return query
-    elif user["role"] == "manager":
-        # Manager can see their own data and data from regular users
-        return query.filter(
-            or_(
-                POSTransaction.user_id == user["id"],
-                POSTransaction.user_id.in_(
-                    db.query(User.id).filter(User.role == "user")
-                )
-            )
-        )
-    else:
-        # Regular users can only see their own data
-        return query.filter(POSTransaction.user_id == user["id"])
+def get_user_repository(db: AsyncSession = Depends(get_async_read_db)):
+    """Get user repository with an async database session."""
+    return AsyncUserRepository(db)
+
+def get_transaction_repository(db: AsyncSession = Depends(get_async_read_db)):
+    """Get transaction repository with an async read-only session."""
+    return AsyncTransactionRepository(db)
+
+def get_analytics_repository(db: AsyncSession = Depends(get_async_read_db)):
+    """Get analytics repository with an async read-only session."""
+    return AsyncAnalyticsRepository(db)
+
+def get_data_version_repository(db: AsyncSession = Depends(get_async_read_db)):
+    """Get data version repository with an async read-only session."""
+    return AsyncDataVersionRepository(db)
+
+def get_upload_service(db: Session = Depends(get_db)):
+    """Get upload service with a database session."""
+    return UploadService(db)
+
+def get_ingest_queue() -> IngestQueue:
+    """Get the queue that loads received uploads."""
+    return ingest_queue
+
+def get_session_user(request: Request) -> dict:
+    """Get the logged-in user from the session or fail with 401."""
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user
+
+async def get_cache_headers(user: dict, versions: AsyncDataVersionRepository) -> Tuple[int, dict]:
+    """The version of the data visible to the user and the ETag/Last-Modified built from it."""
+    scope, tags = get_cache_scope(user)
+    version, updated_at = await versions.get_version(tags)
+    return version, cache_headers(scope, version, updated_at)
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -72,15 +106,15 @@ async def login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    user_repository: UserRepository = Depends(get_user_repository)
+    user_repository: AsyncUserRepository = Depends(get_user_repository)
 ):
     """Login endpoint."""
     try:
         # Clear any existing session
         request.session.clear()
         
-        user = user_repository.get_by_username(username)
-        if not user or not verify_password(password, user.password_hash):
+        user = await user_repository.get_by_username(username)
+        if not user or not await verify_password_async(password, user.password_hash):
             return templates.TemplateResponse(
                 "login.html",
                 {"request": request, "error": "Invalid username or password"},
@@ -119,8 +153,396 @@ async def login(
 
 # ... Rest of your routes (upload, analytics, etc.) ...
 
+# Headers sent with every resumable upload response
+TUS_HEADERS = {"Tus-Resumable": "1.0.0"}
+
+# Allowance for multipart boundaries and part headers over the file size
+MULTIPART_OVERHEAD = 64 * 1024
+
+async def _iter_upload_file(file: FormFile):
+    while chunk := await file.read(settings.upload_chunk_size):
+        yield chunk
+
+@app.post("/api/upload", status_code=202)
+async def upload_file(
+    request: Request,
+    filename: Optional[str] = None,
+    uploads: UploadService = Depends(get_upload_service),
+    queue: IngestQueue = Depends(get_ingest_queue)
+):
+    """Receive a CSV file in one request and queue it for loading.
+
+    The body is either the raw file, named by ``filename`` or the
+    X-Filename header, or a multipart form with a ``file`` field. It is
+    written to disk in chunks while being hashed; a file the user already
+    uploaded is recorded as a duplicate and not loaded again.
+    """
+    user = get_session_user(request)
+    multipart = request.headers.get("content-type", "").startswith("multipart/form-data")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit():
+        allowance = MULTIPART_OVERHEAD if multipart else 0
+        if int(declared) > settings.max_file_size + allowance:
+            raise HTTPException(status_code=413, detail=f"File exceeds the maximum size of {settings.max_file_size} bytes")
+
+    if multipart:
+        form = await request.form()
+        file = form.get("file")
+        if not isinstance(file, FormFile):
+            raise HTTPException(status_code=400, detail="No file in the form")
+        filename, chunks = file.filename, _iter_upload_file(file)
+    else:
+        filename, chunks = filename or request.headers.get("x-filename"), request.stream()
+    try:
+        filename = check_filename(filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    upload = await run_in_threadpool(uploads.create, user, filename)
+    path = upload.path
+    # Release the writer connection while the body streams to disk
+    await run_in_threadpool(uploads.db.rollback)
+    hasher = hashlib.sha256()
+    try:
+        size = await write_chunks(chunks, path, settings.max_file_size, hasher=hasher)
+    except UploadTooLarge as e:
+        await run_in_threadpool(uploads.discard, upload, str(e))
+        raise HTTPException(status_code=413, detail=str(e))
+    except ClientDisconnect:
+        await run_in_threadpool(uploads.discard, upload, "Client disconnected")
+        raise
+
+    upload = await run_in_threadpool(uploads.complete, upload, hasher.hexdigest(), size)
+    if upload.status == "queued":
+        queue.submit(upload.id)
+    return JSONResponse(status_code=202, content=serialize_upload(upload))
+
+@app.post("/api/uploads", status_code=201)
+async def create_upload(
+    request: Request,
+    filename: Optional[str] = None,
+    uploads: UploadService = Depends(get_upload_service)
+):
+    """Start a resumable upload (tus creation).
+
+    Send the file size in Upload-Length and the name in Upload-Metadata or
+    ``filename``, then PATCH the chunks to the returned Location.
+    """
+    user = get_session_user(request)
+    try:
+        length = int(request.headers["upload-length"])
+        metadata = parse_upload_metadata(request.headers.get("upload-metadata", ""))
+        filename = check_filename(filename or metadata.get("filename"))
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Upload-Length header is required", headers=TUS_HEADERS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e), headers=TUS_HEADERS)
+    if length < 0 or length > settings.max_upload_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File exceeds the maximum size of {settings.max_upload_size} bytes",
+            headers=TUS_HEADERS
+        )
+
+    upload = await run_in_threadpool(uploads.create, user, filename, length)
+    return Response(status_code=201, headers={
+        **TUS_HEADERS, "Location": f"/api/uploads/{upload.id}", "Upload-Offset": "0"
+    })
+
+async def _get_upload(uploads: UploadService, user: dict, upload_id: int):
+    try:
+        return await run_in_threadpool(uploads.get, user, upload_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e), headers=TUS_HEADERS)
+
+@app.head("/api/uploads/{upload_id}")
+async def get_upload_offset(
+    request: Request,
+    upload_id: int,
+    uploads: UploadService = Depends(get_upload_service)
+):
+    """Get how much of a resumable upload has been received."""
+    user = get_session_user(request)
+    upload = await _get_upload(uploads, user, upload_id)
+    return Response(headers={
+        **TUS_HEADERS,
+        "Upload-Offset": str(received_bytes(upload) if upload.status == "receiving" else upload.received),
+        "Upload-Length": str(upload.size),
+        "Cache-Control": "no-store"
+    })
+
+@app.patch("/api/uploads/{upload_id}")
+async def append_upload(
+    request: Request,
+    upload_id: int,
+    uploads: UploadService = Depends(get_upload_service),
+    queue: IngestQueue = Depends(get_ingest_queue)
+):
+    """Append a chunk to a resumable upload (tus PATCH).
+
+    Upload-Offset must equal the bytes received so far. Once the whole
+    file is in, it is hashed, checked for duplicates and queued.
+    """
+    user = get_session_user(request)
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(
+            status_code=415, detail="Content-Type must be application/offset+octet-stream", headers=TUS_HEADERS
+        )
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required", headers=TUS_HEADERS)
+
+    async with upload_lock(upload_id):
+        upload = await _get_upload(uploads, user, upload_id)
+        if upload.status != "receiving":
+            raise HTTPException(status_code=409, detail=f"Upload is {upload.status}", headers=TUS_HEADERS)
+        current = received_bytes(upload)
+        if offset != current:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload-Offset {offset} does not match the received {current} bytes",
+                headers={**TUS_HEADERS, "Upload-Offset": str(current)}
+            )
+        path, size = upload.path, upload.size
+        # Release the writer connection while the chunk streams to disk
+        await run_in_threadpool(uploads.db.rollback)
+        try:
+            written = await write_chunks(request.stream(), path, size, offset=offset)
+        except UploadTooLarge as e:
+            # Drop the rejected chunk so the upload can still be resumed
+            await run_in_threadpool(os.truncate, path, offset)
+            raise HTTPException(status_code=413, detail=str(e), headers=TUS_HEADERS)
+
+        received = offset + written
+        if received == size:
+            digest = await run_in_threadpool(file_sha256, path)
+            upload = await run_in_threadpool(uploads.complete, upload, digest, received)
+            if upload.status == "queued":
+                queue.submit(upload.id)
+        else:
+            await run_in_threadpool(uploads.record_progress, upload, received)
+
+    return Response(status_code=204, headers={
+        **TUS_HEADERS, "Upload-Offset": str(received), "Upload-Status": upload.status
+    })
+
+@app.get("/api/uploads/history")
+async def upload_history(
+    request: Request,
+    uploads: UploadService = Depends(get_upload_service),
+    versions: AsyncDataVersionRepository = Depends(get_data_version_repository)
+):
+    """Get the current user's recent uploads."""
+    user = get_session_user(request)
+    # Upload status changes bump the uploader's upload version
+    scope = f"uploads:{user['id']}"
+    headers = cache_headers(scope, *await versions.get_version([scope]))
+    if is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse({"history": await run_in_threadpool(uploads.history, user)}, headers=headers)
+
+@app.get("/api/uploads/{upload_id}/events")
+async def upload_events(
+    request: Request,
+    upload_id: int,
+    uploads: UploadService = Depends(get_upload_service)
+):
+    """Stream the progress of an upload as server-sent events.
+
+    Each ``progress`` event carries the job status and, while it is being
+    loaded, rows parsed/loaded/rejected, throughput and ETA. The stream
+    ends after the completed, failed or duplicate event.
+    """
+    user = get_session_user(request)
+    await _get_upload(uploads, user, upload_id)
+    await run_in_threadpool(uploads.db.rollback)
+
+    async def read_upload():
+        return await run_in_threadpool(uploads.read, user, upload_id)
+
+    return StreamingResponse(
+        progress_events(upload_id, read_upload),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload(
+    request: Request,
+    upload_id: int,
+    uploads: UploadService = Depends(get_upload_service)
+):
+    """Get the status of one of the current user's uploads."""
+    user = get_session_user(request)
+    return serialize_upload(await _get_upload(uploads, user, upload_id))
+
+@app.get("/api/analytics")
+async def get_analytics(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    format: str = "rows",
+    analytics: AsyncAnalyticsRepository = Depends(get_analytics_repository),
+    versions: AsyncDataVersionRepository = Depends(get_data_version_repository)
+):
+    """Get sales analytics for the data visible to the current user.
+
+    ``format=columns`` sends each chart series as one array per field
+    instead of a list of objects. Answers 304 when If-None-Match matches
+    the current data version.
+    """
+    user = get_session_user(request)
+    if format not in ("rows", "columns"):
+        raise HTTPException(status_code=400, detail=f"Invalid format: {format}. Expected rows or columns")
+    version, headers = await get_cache_headers(user, versions)
+    if is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+    try:
+        result = await analytics.get_analytics(user, start_date, end_date, version)
+        # The result is plain JSON types, so skip FastAPI's encoder pass
+        return ORJSONResponse(columnar_analytics(result) if format == "columns" else result, headers=headers)
+    except Exception as e:
+        logger.error(f"Analytics error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error computing analytics")
+
+@app.get("/api/data")
+async def get_data(
+    request: Request,
+    page: int = 1,
+    per_page: int = 20,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    store: Optional[str] = None,
+    tender: Optional[str] = None,
+    amount_range: Optional[str] = None,
+    cursor: Optional[str] = None,
+    total: str = "approx",
+    transactions: AsyncTransactionRepository = Depends(get_transaction_repository),
+    versions: AsyncDataVersionRepository = Depends(get_data_version_repository)
+):
+    """Get a page of the transactions visible to the current user.
+
+    Passing ``cursor`` (empty for the first page) switches to keyset
+    pagination; follow ``next_cursor`` for the next page.
+    """
+    user = get_session_user(request)
+    filters = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "store": store,
+        "tender": tender,
+        "amount_range": amount_range
+    }
+    version, headers = await get_cache_headers(user, versions)
+    if is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+    try:
+        if cursor is not None:
+            result = await transactions.get_keyset_page(user, cursor, per_page, filters, total, version)
+        else:
+            result = await transactions.get_page(user, page, per_page, filters, version)
+        return ORJSONResponse(result, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Data retrieval error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving data")
+
+@app.get("/api/export")
+async def export_data(
+    request: Request,
+    format: str = "csv",
+    gzip: bool = False,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    store: Optional[str] = None,
+    tender: Optional[str] = None,
+    amount_range: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Stream the transactions visible to the current user as a file."""
+    user = get_session_user(request)
+    filters = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "store": store,
+        "tender": tender,
+        "amount_range": amount_range
+    }
+    try:
+        chunks, media_type, filename = ExportService(db).export(user, format, filters, gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/data/clear")
+async def clear_data(request: Request, db: Session = Depends(get_db)):
+    """Delete all transactions uploaded by the current user."""
+    user = get_session_user(request)
+    try:
+        deleted = await run_in_threadpool(DataService(db).clear, user)
+        return {
+            "status": "success",
+            "records_deleted": deleted,
+            "message": f"Successfully deleted {deleted} records"
+        }
+    except Exception as e:
+        logger.error(f"Clear data error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": "Error clearing data"}
+        )
+
 # Add a health check endpoint
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
\ No newline at end of file
+    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+
+@app.get("/api/metrics/mongo")
+async def mongo_metrics(request: Request):
+    """MongoDB connection pool and command latency metrics."""
+    # Imported here so routes that never touch MongoDB do not load motor
+    from src.db.database import mongodb
+
+    user = get_session_user(request)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return mongodb.get_metrics()
+
+@app.get("/api/metrics/db")
+async def db_metrics(request: Request):
+    """SQL engine pool status and checkout latency metrics."""
+    user = get_session_user(request)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return registry.get_metrics()
+
+@app.get("/api/metrics/ingest")
+async def ingest_metrics(request: Request, queue: IngestQueue = Depends(get_ingest_queue)):
+    """Progress of the ingest jobs queued in this process and running in any worker."""
+    user = get_session_user(request)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    store = get_shared_state()
+    if store is not None:
+        jobs = await run_in_threadpool(store.all_progress)
+        # Jobs still waiting for a load slot only exist in this worker
+        running = {job["job_id"] for job in jobs}
+        jobs += [job for job in ingest_monitors.active() if job["job_id"] not in running]
+    else:
+        jobs = ingest_monitors.active()
+    return {"pending": queue.pending, "jobs": jobs}
+
+@app.get("/api/metrics/auth")
+async def auth_metrics(request: Request):
+    """Password hashing pool queue and latency metrics."""
+    user = get_session_user(request)
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return password_hash_metrics.snapshot()
@@ -0,0 +1,19 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String
+from src.db.base import Base
+
+class DataVersion(Base):
+    """A counter bumped whenever the data behind a cache tag changes.
+
+    Tags are the result cache's ("owner:<id>", "role:<role>", "owner:*"),
+    so the versions of a user's cache scope tell whether anything the user
+    can see changed since a response was sent.
+    """
+    __tablename__ = "data_versions"
+
+    tag = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DataVersion {self.tag} {self.version}>"
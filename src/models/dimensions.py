@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String
+from src.db.base import Base
+
+class Store(Base):
+    """Store dimension, so display names are stored once per store."""
+    __tablename__ = "stores"
+
+    store_code = Column(String, primary_key=True)
+    store_display_name = Column(String)
+
+    def __repr__(self):
+        return f"<Store {self.store_code}>"
+
+class TenderType(Base):
+    """Small-integer codes for tender names."""
+    __tablename__ = "tender_types"
+
+    code = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+    def __repr__(self):
+        return f"<TenderType {self.code} {self.name}>"
+
+class TransactionType(Base):
+    """Small-integer codes for transaction type names."""
+    __tablename__ = "trans_types"
+
+    code = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+    def __repr__(self):
+        return f"<TransactionType {self.code} {self.name}>"
@@ -1,30 +1,87 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, ForeignKey, Index, event, inspect, select
+from sqlalchemy.orm import Session, relationship, column_property
 from src.db.base import Base
+from src.db.types import Cents, SecondsOfDay
+from src.models.dimensions import Store, TenderType, TransactionType
 
 class POSTransaction(Base):
-    """POS Transaction model."""
+    """POS Transaction model.
+
+    Rows are stored compactly: money as integer cents, time as seconds since
+    midnight, tender and transaction type as codes, and the store display
+    name in the stores table. The attributes keep their original names and
+    Python types. Objects written through a session get their codes when
+    flushed; bulk inserts must set them with encode_dimensions() first.
+    """
     __tablename__ = "pos_transactions"
 
     id = Column(Integer, primary_key=True, index=True)
     store_code = Column(String, index=True)
-    store_display_name = Column(String)
     trans_date = Column(DateTime)
-    trans_time = Column(String)
+    trans_time = Column(SecondsOfDay)
     trans_no = Column(String, index=True)
     till_no = Column(String)
-    net_sales_header_values = Column(Float)
+    net_sales_header_values = Column(Cents)
     quantity = Column(Integer)
-    trans_type = Column(String)
-    tender = Column(String)
-    discount_header = Column(Float)
-    tax_header = Column(Float)
+    trans_type_code = Column(SmallInteger)
+    tender_code = Column(SmallInteger)
+    discount_header = Column(Cents)
+    tax_header = Column(Cents)
     user_id = Column(Integer, ForeignKey("users.id"))
     dm_load_date = Column(DateTime, default=datetime.utcnow)
 
+    # Names resolved from the dimension tables, labelled so Core selects keep the keys
+    store_display_name = column_property(
+        select(Store.store_display_name).where(Store.store_code == store_code).scalar_subquery()
+        .label("store_display_name")
+    )
+    trans_type = column_property(
+        select(TransactionType.name).where(TransactionType.code == trans_type_code).scalar_subquery()
+        .label("trans_type")
+    )
+    tender = column_property(
+        select(TenderType.name).where(TenderType.code == tender_code).scalar_subquery()
+        .label("tender")
+    )
+
     # Relationship
     user = relationship("User", backref="transactions")
 
+    # Dashboard queries filter by user and date range, then group by store or
+    # date. The trailing sales columns let the aggregates be read from the
+    # index alone.
+    __table_args__ = (
+        Index(
+            "ix_pos_transactions_user_date_store",
+            "user_id", "trans_date", "store_code", "net_sales_header_values", "quantity"
+        ),
+        Index(
+            "ix_pos_transactions_store_date",
+            "store_code", "trans_date", "net_sales_header_values", "quantity"
+        ),
+        Index("ix_pos_transactions_trans_date", "trans_date"),
+        # Keyset pagination walks (trans_date, id); the rowid completes the key
+        Index("ix_pos_transactions_user_date", "user_id", "trans_date"),
+    )
+
     def __repr__(self):
-        return f"<POSTransaction {self.trans_no}>"
\ No newline at end of file
+        return f"<POSTransaction {self.trans_no}>"
+
+# Name attributes backed by the dimension tables
+DIMENSION_ATTRIBUTES = ("store_display_name", "trans_type", "tender")
+
+@event.listens_for(Session, "before_flush")
+def _encode_transaction_dimensions(session, flush_context, instances):
+    """Set the dimension codes of new transactions and of renamed ones."""
+    from src.services.dimension_service import encode_dimensions
+
+    records = [obj for obj in session.new if isinstance(obj, POSTransaction)]
+    records += [
+        obj for obj in session.dirty
+        if isinstance(obj, POSTransaction) and any(
+            inspect(obj).attrs[name].history.has_changes() for name in DIMENSION_ATTRIBUTES
+        )
+    ]
+    if records:
+        encode_dimensions(session, records)
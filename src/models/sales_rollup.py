@@ -0,0 +1,56 @@
+from sqlalchemy import Column, Integer, String, Date, Index
+from src.db.base import Base
+from src.db.types import Cents
+
+class DailySalesRollup(Base):
+    """Daily sales totals per user, store and tender; money in integer cents."""
+    __tablename__ = "daily_sales_rollup"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, default=0)  # 0 for rows without an owner
+    store_code = Column(String, nullable=False, default="")
+    trans_date = Column(Date, nullable=False)
+    tender = Column(String, nullable=False, default="")
+    store_display_name = Column(String)
+    net_sales = Column(Cents, nullable=False, default=0.0)
+    tax = Column(Cents, nullable=False, default=0.0)
+    discount = Column(Cents, nullable=False, default=0.0)
+    quantity = Column(Integer, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index(
+            "ix_daily_sales_rollup_key",
+            "user_id", "trans_date", "store_code", "tender",
+            unique=True
+        ),
+    )
+
+    def __repr__(self):
+        return f"<DailySalesRollup {self.store_code} {self.trans_date}>"
+
+class HourlySalesRollup(Base):
+    """Hourly sales totals per user and store; money in integer cents."""
+    __tablename__ = "hourly_sales_rollup"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, default=0)
+    store_code = Column(String, nullable=False, default="")
+    trans_date = Column(Date, nullable=False)
+    hour = Column(Integer, nullable=False)
+    net_sales = Column(Cents, nullable=False, default=0.0)
+    tax = Column(Cents, nullable=False, default=0.0)
+    discount = Column(Cents, nullable=False, default=0.0)
+    quantity = Column(Integer, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index(
+            "ix_hourly_sales_rollup_key",
+            "user_id", "trans_date", "store_code", "hour",
+            unique=True
+        ),
+    )
+
+    def __repr__(self):
+        return f"<HourlySalesRollup {self.store_code} {self.trans_date} {self.hour}:00>"
@@ -0,0 +1,32 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, String
+from src.db.base import Base
+
+class Upload(Base):
+    """An uploaded CSV file and the state of its ingest job."""
+    __tablename__ = "uploads"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String)
+    path = Column(String)  # file in settings.upload_dir while it is received and loaded
+    size = Column(BigInteger)  # declared length of a resumable upload, else the received size
+    received = Column(BigInteger, nullable=False, default=0)
+    sha256 = Column(String(64))
+    # receiving, queued, processing, completed, failed or duplicate
+    status = Column(String, nullable=False, default="receiving")
+    duplicate_of = Column(Integer)
+    records_processed = Column(Integer, nullable=False, default=0)
+    total_sales = Column(Float, nullable=False, default=0.0)
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+
+    __table_args__ = (
+        # Dedup looks up a user's earlier uploads by content hash
+        Index("ix_uploads_user_sha256", "user_id", "sha256"),
+        Index("ix_uploads_user_created", "user_id", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<Upload {self.id} {self.filename} {self.status}>"
@@ -0,0 +1,27 @@
+from datetime import date
+from typing import Any, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.services.analytics_service import AnalyticsService
+
+class AsyncAnalyticsRepository:
+    """Dashboard analytics on an AsyncSession.
+
+    Runs AnalyticsService (and its result cache) through
+    AsyncSession.run_sync, so the rollup queries are awaited on the async
+    driver. DuckDB, pandas and disk cache work inside it is handed to the
+    threadpool with run_blocking.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_analytics(
+        self,
+        user: dict,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        return await self.db.run_sync(
+            lambda session: AnalyticsService(session).get_analytics(user, start_date, end_date, version)
+        )
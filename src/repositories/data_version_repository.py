@@ -0,0 +1,14 @@
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.services.data_version_service import get_data_version
+
+class AsyncDataVersionRepository:
+    """Data versions on an AsyncSession, for HTTP cache validators."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_version(self, tags: Iterable[str]) -> Tuple[int, Optional[datetime]]:
+        tags = list(tags)
+        return await self.db.run_sync(lambda session: get_data_version(session, tags))
@@ -1,5 +1,8 @@
+from typing import Any, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from src.models.database_models import TransactionModel
+from src.services.data_service import DataService
 
 class TransactionRepository:
     def __init__(self, db: Session):
@@ -9,4 +12,40 @@ class TransactionRepository:
         self.db.add(transaction)
         await self.db.commit()
         await self.db.refresh(transaction)
-        return transaction 
\ No newline at end of file
+        return transaction
+
+class AsyncTransactionRepository:
+    """Transaction pages on an AsyncSession.
+
+    The queries are DataService's own, run through AsyncSession.run_sync, so
+    both paths share one implementation while the database calls here go
+    through the async driver instead of blocking the event loop.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_page(
+        self,
+        user: dict,
+        page: int = 1,
+        per_page: int = 20,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        return await self.db.run_sync(
+            lambda session: DataService(session).get_page(user, page, per_page, filters, version)
+        )
+
+    async def get_keyset_page(
+        self,
+        user: dict,
+        cursor: Optional[str],
+        per_page: int = 20,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        total: str = "approx",
+        version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        return await self.db.run_sync(
+            lambda session: DataService(session).get_keyset_page(user, cursor, per_page, filters, total, version)
+        )
@@ -1,6 +1,33 @@
-from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from src.config.settings import settings
 from src.models.user import User
-from src.utils.auth import get_password_hash
+from src.utils.cache import MemoryCacheBackend, shared_invalidation
+
+# Detached copies of recently read users, keyed by id and by username
+user_cache = shared_invalidation(MemoryCacheBackend(max_entries=settings.user_cache_max_entries), "users")
+
+def _detached_copy(user: User) -> User:
+    """Copy a loaded user into a detached instance no session owns."""
+    copy = inspect(User).class_manager.new_instance()
+    for column in User.__table__.columns:
+        setattr(copy, column.key, getattr(user, column.key))
+    make_transient_to_detached(copy)
+    return copy
+
+def _cache_user(user: User) -> None:
+    copy = _detached_copy(user)
+    tags = {f"user:{user.id}"}
+    ttl = settings.user_cache_ttl_seconds
+    user_cache.set(f"id:{user.id}", copy, tags, ttl)
+    user_cache.set(f"username:{user.username}", copy, tags, ttl)
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop a user's cached copies, e.g. after a password or role change."""
+    user_cache.invalidate_tags({f"user:{user_id}"})
 
 class UserRepository:
     """Repository for user operations."""
@@ -8,55 +35,36 @@ class UserRepository:
     def __init__(self, db: Session = None):
         """Initialize repository with database session."""
         self.db = db
-        self._initialize_test_users()
 
-    def _initialize_test_users(self):
-        """Initialize test users if they don't exist."""
-        if not self.db:
-            return
-            
-        # Check if users exist
-        if self.db.query(User).count() == 0:
-            # Create test users
-            test_users = [
-                User(
-                    username="user1",
-                    password_hash=get_password_hash("pass1"),
-                    role="user"
-                ),
-                User(
-                    username="user2",
-                    password_hash=get_password_hash("pass2"),
-                    role="user"
-                ),
-                User(
-                    username="user3",
-                    password_hash=get_password_hash("pass3"),
-                    role="admin"
-                )
-            ]
-            
-            # Add users to database
-            for user in test_users:
-                self.db.add(user)
-            
-            try:
-                self.db.commit()
-            except Exception as e:
-                self.db.rollback()
-                raise e
+    def _cached(self, key: str, load) -> Optional[User]:
+        """Get a user from the cache, or load it and cache a detached copy."""
+        cached = user_cache.get(key)
+        if cached is not None:
+            # load=False attaches a copy to this session without a query
+            return self.db.merge(cached, load=False)
+
+        user = load()
+        if user is not None:
+            _cache_user(user)
+        return user
 
     def get_by_username(self, username: str) -> User:
         """Get user by username."""
         if not self.db:
             return None
-        return self.db.query(User).filter(User.username == username).first()
+        return self._cached(
+            f"username:{username}",
+            lambda: self.db.query(User).filter(User.username == username).first()
+        )
 
     def get_by_id(self, user_id: int) -> User:
         """Get user by ID."""
         if not self.db:
             return None
-        return self.db.query(User).filter(User.id == user_id).first()
+        return self._cached(
+            f"id:{user_id}",
+            lambda: self.db.query(User).filter(User.id == user_id).first()
+        )
 
     def create(self, user: User) -> User:
         """Create a new user."""
@@ -77,6 +85,7 @@ class UserRepository:
             return None
         try:
             self.db.commit()
+            invalidate_cached_user(user.id)
             self.db.refresh(user)
             return user
         except Exception as e:
@@ -88,9 +97,40 @@ class UserRepository:
         if not self.db:
             return False
         try:
+            user_id = user.id
             self.db.delete(user)
             self.db.commit()
+            invalidate_cached_user(user_id)
             return True
         except Exception as e:
             self.db.rollback()
-            raise e
\ No newline at end of file
+            raise e
+
+class AsyncUserRepository:
+    """User lookups on an AsyncSession, sharing the user cache with UserRepository."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _cached(self, key: str, statement) -> Optional[User]:
+        # With shared invalidations a cache call may read the shared state file
+        blocking = user_cache.blocking
+        cached = await run_in_threadpool(user_cache.get, key) if blocking else user_cache.get(key)
+        if cached is not None:
+            return await self.db.merge(cached, load=False)
+
+        user = (await self.db.execute(statement)).scalars().first()
+        if user is not None:
+            if blocking:
+                await run_in_threadpool(_cache_user, user)
+            else:
+                _cache_user(user)
+        return user
+
+    async def get_by_username(self, username: str) -> Optional[User]:
+        """Get user by username."""
+        return await self._cached(f"username:{username}", select(User).where(User.username == username))
+
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        """Get user by ID."""
+        return await self._cached(f"id:{user_id}", select(User).where(User.id == user_id))
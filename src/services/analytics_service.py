@@ -0,0 +1,246 @@
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from src.models.pos_transaction import POSTransaction
+from src.models.user import User
+from src.models.sales_rollup import DailySalesRollup, HourlySalesRollup
+from src.config.settings import settings
+from src.services.columnar_analytics import columnar_store, duckdb_available
+from src.services.data_version_service import bump_data_versions
+from src.utils.cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+def get_user_data_filter(user: dict, query, db: Session, model=POSTransaction):
+    """Apply user-specific data filter to a query on a table with a user_id column."""
+    if user["role"] == "admin":
+        # Admin can see all data
+        return query
+    elif user["role"] == "manager":
+        # Manager can see their own data and data from regular users
+        return query.filter(
+            or_(
+                model.user_id == user["id"],
+                model.user_id.in_(
+                    db.query(User.id).filter(User.role == "user")
+                )
+            )
+        )
+    else:
+        # Regular users can only see their own data
+        return query.filter(model.user_id == user["id"])
+
+def get_cache_scope(user: dict) -> Tuple[str, Set[str]]:
+    """Get the cache scope of a user and the data tags its results depend on."""
+    if user["role"] == "admin":
+        return "admin", {"owner:*"}
+    elif user["role"] == "manager":
+        return f"manager:{user['id']}", {f"owner:{user['id']}", "role:user"}
+    else:
+        return f"user:{user['id']}", {f"owner:{user['id']}"}
+
+def invalidate_user_data(db: Session, user_ids: Iterable[Optional[int]]) -> int:
+    """Invalidate cached results that include data owned by the given users.
+
+    Also bumps the data versions of the same tags, which the API's ETags
+    are built from, and commits that.
+    """
+    owner_ids = {int(user_id or 0) for user_id in user_ids}
+    if not owner_ids:
+        return 0
+    tags = {"owner:*"} | {f"owner:{owner_id}" for owner_id in owner_ids}
+    roles = db.query(User.role).filter(User.id.in_(owner_ids)).distinct()
+    tags |= {f"role:{role}" for (role,) in roles if role}
+    bump_data_versions(db, tags)
+    db.commit()
+    if settings.analytics_backend == "duckdb":
+        columnar_store.mark_stale(owner_ids)
+    return result_cache.invalidate(tags)
+
+def use_columnar_backend() -> bool:
+    """Whether analytics should run on the DuckDB columnar store."""
+    if settings.analytics_backend != "duckdb":
+        return False
+    if not duckdb_available():
+        logger.warning("ANALYTICS_BACKEND=duckdb but duckdb is not installed, using rollups")
+        return False
+    return True
+
+def format_analytics(summary, stores, tenders, daily, hourly) -> Dict[str, Any]:
+    """Shape aggregated rows into the /api/analytics response."""
+    total_sales, total_transactions, total_items, total_tax, total_discount = summary
+    total_sales = float(total_sales)
+
+    sales_by_store = []
+    for store_code, store_name, sales, count in stores:
+        sales_by_store.append({
+            "store_code": store_code,
+            "store": store_name or store_code,
+            "store_name": store_name or store_code,
+            "total_sales": float(sales),
+            "transaction_count": count,
+            "avg_transaction": float(sales) / count if count else 0.0
+        })
+
+    sales_by_tender = []
+    for tender, sales, count in tenders:
+        sales_by_tender.append({
+            "tender": tender or "Unknown",
+            "total": float(sales),
+            "count": count,
+            "percentage": float(sales) / total_sales * 100 if total_sales else 0.0
+        })
+
+    daily_sales = [
+        {"date": str(day), "total": float(sales), "transaction_count": count}
+        for day, sales, count in daily
+    ]
+
+    sales_by_hour = [
+        {"hour": hour, "total": float(sales), "transaction_count": count}
+        for hour, sales, count in hourly
+    ]
+
+    return {
+        "summary": {
+            "total_sales": total_sales,
+            "total_transactions": total_transactions,
+            "total_tax": float(total_tax),
+            "total_discount": float(total_discount),
+            "avg_transaction_value": total_sales / total_transactions if total_transactions else 0.0,
+            "items_per_transaction": total_items / total_transactions if total_transactions else 0.0
+        },
+        "sales_by_store": sales_by_store,
+        "sales_by_tender": sales_by_tender,
+        "daily_sales": daily_sales,
+        "sales_by_hour": sales_by_hour
+    }
+
+# Analytics series that can be sent column-oriented
+CHART_SERIES = ("sales_by_store", "sales_by_tender", "daily_sales", "sales_by_hour")
+
+def to_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Turn a list of row dicts into one list per key."""
+    if not rows:
+        return {}
+    return {key: [row[key] for row in rows] for key in rows[0]}
+
+def columnar_analytics(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Send the chart series of an analytics response as columns.
+
+    Chart libraries take one array per axis, and the keys are no longer
+    repeated in every row, which makes large series much smaller.
+    """
+    return {
+        **result,
+        **{series: to_columns(result[series]) for series in CHART_SERIES},
+        "format": "columns"
+    }
+
+class AnalyticsService:
+    """Service for dashboard analytics.
+
+    Reads the daily and hourly rollup tables that ingest keeps up to date,
+    so response time does not depend on how many transactions are stored.
+    With ANALYTICS_BACKEND=duckdb the same response is computed from the
+    columnar store instead.
+    """
+
+    def __init__(self, db: Session):
+        """Initialize analytics service."""
+        self.db = db
+
+    def _scoped(self, query, model, user: dict, start_date: Optional[date], end_date: Optional[date]):
+        """Restrict a rollup query to the user's data and an inclusive date range."""
+        query = get_user_data_filter(user, query, self.db, model)
+        if start_date:
+            query = query.filter(model.trans_date >= start_date)
+        if end_date:
+            query = query.filter(model.trans_date <= end_date)
+        return query
+
+    def _totals(self, model):
+        return (
+            func.coalesce(func.sum(model.net_sales), 0.0),
+            func.coalesce(func.sum(model.transaction_count), 0)
+        )
+
+    def summary_query(self, user: dict, start_date: Optional[date] = None, end_date: Optional[date] = None):
+        return self._scoped(
+            self.db.query(
+                *self._totals(DailySalesRollup),
+                func.coalesce(func.sum(DailySalesRollup.quantity), 0),
+                func.coalesce(func.sum(DailySalesRollup.tax), 0.0),
+                func.coalesce(func.sum(DailySalesRollup.discount), 0.0)
+            ),
+            DailySalesRollup, user, start_date, end_date
+        )
+
+    def store_query(self, user: dict, start_date: Optional[date] = None, end_date: Optional[date] = None):
+        return self._scoped(
+            self.db.query(
+                DailySalesRollup.store_code,
+                func.max(DailySalesRollup.store_display_name),
+                *self._totals(DailySalesRollup)
+            ),
+            DailySalesRollup, user, start_date, end_date
+        ).group_by(DailySalesRollup.store_code).order_by(DailySalesRollup.store_code)
+
+    def tender_query(self, user: dict, start_date: Optional[date] = None, end_date: Optional[date] = None):
+        return self._scoped(
+            self.db.query(DailySalesRollup.tender, *self._totals(DailySalesRollup)),
+            DailySalesRollup, user, start_date, end_date
+        ).group_by(DailySalesRollup.tender).order_by(DailySalesRollup.tender)
+
+    def daily_query(self, user: dict, start_date: Optional[date] = None, end_date: Optional[date] = None):
+        return self._scoped(
+            self.db.query(DailySalesRollup.trans_date, *self._totals(DailySalesRollup)),
+            DailySalesRollup, user, start_date, end_date
+        ).group_by(DailySalesRollup.trans_date).order_by(DailySalesRollup.trans_date)
+
+    def hourly_query(self, user: dict, start_date: Optional[date] = None, end_date: Optional[date] = None):
+        return self._scoped(
+            self.db.query(HourlySalesRollup.hour, *self._totals(HourlySalesRollup)),
+            HourlySalesRollup, user, start_date, end_date
+        ).group_by(HourlySalesRollup.hour).order_by(HourlySalesRollup.hour)
+
+    def get_analytics(
+        self,
+        user: dict,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get the dashboard analytics for the user's data.
+
+        ``version`` is the data version the response is served under; it
+        keys the cached result so it always matches the ETag.
+        """
+        scope, tags = get_cache_scope(user)
+        return result_cache.get_or_compute(
+            "analytics", scope, tags,
+            {"start_date": start_date, "end_date": end_date},
+            lambda: self._compute_analytics(user, start_date, end_date),
+            version
+        )
+
+    def _compute_analytics(
+        self,
+        user: dict,
+        start_date: Optional[date],
+        end_date: Optional[date]
+    ) -> Dict[str, Any]:
+        if use_columnar_backend():
+            rows = columnar_store.query_analytics(self.db, user, start_date, end_date)
+            return format_analytics(
+                rows["summary"], rows["stores"], rows["tenders"], rows["daily"], rows["hourly"]
+            )
+        return format_analytics(
+            self.summary_query(user, start_date, end_date).one(),
+            self.store_query(user, start_date, end_date),
+            self.tender_query(user, start_date, end_date),
+            self.daily_query(user, start_date, end_date),
+            self.hourly_query(user, start_date, end_date)
+        )
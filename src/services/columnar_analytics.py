@@ -0,0 +1,210 @@
+import importlib.util
+import logging
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+from src.config.settings import settings
+from src.models.pos_transaction import POSTransaction
+from src.models.user import User
+from src.utils.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# POSTransaction columns staged into the columnar copy
+STAGED_COLUMNS = (
+    "id", "user_id", "store_code", "store_display_name", "trans_date", "trans_time",
+    "tender", "till_no", "net_sales_header_values", "tax_header", "discount_header", "quantity",
+)
+
+STAGED_TABLE = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id BIGINT,
+    user_id BIGINT,
+    store_code VARCHAR,
+    store_display_name VARCHAR,
+    trans_date DATE,
+    hour INTEGER,
+    tender VARCHAR,
+    till_no VARCHAR,
+    net_sales DOUBLE,
+    tax DOUBLE,
+    discount DOUBLE,
+    quantity BIGINT
+)
+"""
+
+# Normalized the same way as the rollup keys so both backends agree
+STAGE_BATCH = """
+INSERT INTO transactions
+SELECT
+    id,
+    coalesce(user_id, 0),
+    coalesce(store_code, ''),
+    store_display_name,
+    CAST(trans_date AS DATE),
+    coalesce(TRY_CAST(split_part(trans_time, ':', 1) AS INTEGER) % 24, 0),
+    coalesce(tender, ''),
+    till_no,
+    coalesce(net_sales_header_values, 0),
+    coalesce(tax_header, 0),
+    coalesce(discount_header, 0),
+    coalesce(CAST(quantity AS BIGINT), 0)
+FROM batch
+WHERE trans_date IS NOT NULL
+"""
+
+def duckdb_available() -> bool:
+    return importlib.util.find_spec("duckdb") is not None
+
+class ColumnarAnalyticsStore:
+    """Columnar copy of pos_transactions in DuckDB for large analytical scans.
+
+    Rows are staged incrementally: new ids are appended past a watermark,
+    and owners whose existing rows changed (sync updates, clears) are
+    marked stale by cache invalidation and reloaded on the next refresh.
+    A periodic full reload picks up changes made by other processes.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.duckdb_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._watermark: Optional[int] = None
+        self._refreshed_at = 0.0
+        self._stale: Set[int] = set()
+
+    def _connect(self):
+        if self._conn is None:
+            import duckdb
+
+            config = {"threads": settings.duckdb_threads} if settings.duckdb_threads else {}
+            self._conn = duckdb.connect(self.path, config=config)
+            self._conn.execute(STAGED_TABLE)
+        return self._conn
+
+    def mark_stale(self, user_ids: Iterable[int]) -> None:
+        """Reload these owners' rows on the next refresh."""
+        with self._lock:
+            self._stale.update(user_ids)
+
+    def _stage(self, rows: List[Any]) -> int:
+        """Append one batch of pos_transactions rows; returns its highest id."""
+        import pandas as pd
+
+        conn = self._connect()
+        batch = pd.DataFrame(rows, columns=list(STAGED_COLUMNS))
+        batch["trans_date"] = pd.to_datetime(batch["trans_date"])
+        conn.register("batch", batch)
+        try:
+            conn.execute(STAGE_BATCH)
+        finally:
+            conn.unregister("batch")
+        return int(batch["id"].max())
+
+    def _load(self, db: Session, condition, batch_size: int) -> int:
+        columns = [getattr(POSTransaction, column) for column in STAGED_COLUMNS]
+        result = db.execute(select(*columns).where(condition).execution_options(yield_per=batch_size))
+        loaded = 0
+        for rows in result.partitions():
+            # pandas and DuckDB work off the event loop when called through run_sync
+            last_id = run_blocking(self._stage, rows)
+            self._watermark = max(self._watermark or 0, last_id)
+            loaded += len(rows)
+        return loaded
+
+    def refresh(self, db: Session, full: bool = False, batch_size: int = 50000) -> int:
+        """Bring the columnar copy up to date with pos_transactions."""
+        # Under run_sync the holder awaits its SQL with the lock held, so a
+        # waiter must not block the event loop thread on it
+        run_blocking(self._lock.acquire)
+        try:
+            expired = time.monotonic() - self._refreshed_at > settings.duckdb_full_refresh_seconds
+            loaded = 0
+            if full or expired or self._watermark is None:
+                run_blocking(self._execute, "DELETE FROM transactions")
+                self._watermark = 0
+                self._stale.clear()
+                self._refreshed_at = time.monotonic()
+            elif self._stale:
+                owners = sorted(self._stale)
+                self._stale.clear()
+                run_blocking(self._execute, "DELETE FROM transactions WHERE user_id IN (SELECT unnest(?))", [owners])
+                loaded += self._load(db, and_(
+                    func.coalesce(POSTransaction.user_id, 0).in_(owners),
+                    POSTransaction.id <= self._watermark
+                ), batch_size)
+
+            loaded += self._load(db, POSTransaction.id > self._watermark, batch_size)
+            if loaded:
+                logger.info(f"Staged {loaded} transactions into the columnar store")
+            return loaded
+        finally:
+            self._lock.release()
+
+    def _execute(self, sql: str, params: Optional[List[Any]] = None) -> None:
+        self._connect().execute(sql, params)
+
+    def _scope(self, db: Session, user: dict, start_date: Optional[date], end_date: Optional[date]):
+        """Build the WHERE clause and parameters for the user's data and dates."""
+        clauses, params = [], []
+        if user["role"] == "manager":
+            clauses.append("(user_id = ? OR user_id IN (SELECT unnest(?)))")
+            params += [user["id"], [user_id for (user_id,) in db.query(User.id).filter(User.role == "user")]]
+        elif user["role"] != "admin":
+            clauses.append("user_id = ?")
+            params.append(user["id"])
+        if start_date:
+            clauses.append("trans_date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("trans_date <= ?")
+            params.append(end_date)
+        return " AND ".join(clauses) or "TRUE", params
+
+    def query_analytics(
+        self,
+        db: Session,
+        user: dict,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> Dict[str, List[Any]]:
+        """Run the dashboard group-bys, returning rows shaped like the rollup queries."""
+        self.refresh(db)
+        where, params = self._scope(db, user, start_date, end_date)
+        return run_blocking(self._query, where, params)
+
+    def _query(self, where: str, params: List[Any]) -> Dict[str, List[Any]]:
+        totals = "coalesce(sum(net_sales), 0), count(*)"
+        cursor = self._connect().cursor()
+        try:
+            def rows(sql: str) -> List[tuple]:
+                return cursor.execute(sql.format(totals=totals, where=where), params).fetchall()
+
+            return {
+                "summary": rows(
+                    "SELECT {totals}, coalesce(sum(quantity), 0), coalesce(sum(tax), 0), "
+                    "coalesce(sum(discount), 0) FROM transactions WHERE {where}"
+                )[0],
+                "stores": rows(
+                    "SELECT store_code, max(store_display_name), {totals} FROM transactions "
+                    "WHERE {where} GROUP BY store_code ORDER BY store_code"
+                ),
+                "tenders": rows(
+                    "SELECT tender, {totals} FROM transactions WHERE {where} "
+                    "GROUP BY tender ORDER BY tender"
+                ),
+                "daily": rows(
+                    "SELECT trans_date, {totals} FROM transactions WHERE {where} "
+                    "GROUP BY trans_date ORDER BY trans_date"
+                ),
+                "hourly": rows(
+                    "SELECT hour, {totals} FROM transactions WHERE {where} GROUP BY hour ORDER BY hour"
+                ),
+            }
+        finally:
+            cursor.close()
+
+columnar_store = ColumnarAnalyticsStore()
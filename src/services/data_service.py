@@ -0,0 +1,299 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.orm import Session
+from src.db.sqlite import reclaim_free_pages
+from src.models.dimensions import Store, TenderType
+from src.models.pos_transaction import POSTransaction
+from src.models.sales_rollup import DailySalesRollup, HourlySalesRollup
+from src.services.analytics_service import get_user_data_filter, get_cache_scope, invalidate_user_data
+from src.services.rollup_service import SOURCE_COLUMNS, apply_rollups
+from src.config.settings import settings
+from src.utils.cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_PER_PAGE = 500
+
+# Filters the daily rollups can answer a row count for
+ROLLUP_COUNT_FILTERS = {"start_date", "end_date", "tender"}
+
+def _parse_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value}. Expected format: YYYY-MM-DD")
+
+def _parse_amount_range(value: Optional[str]):
+    """Parse '0-50' or '501+' into (low, high) bounds."""
+    if not value:
+        return None, None
+    try:
+        if value.endswith("+"):
+            return float(value[:-1]), None
+        low, high = value.split("-", 1)
+        return float(low), float(high)
+    except ValueError:
+        raise ValueError(f"Invalid amount_range: {value}. Expected format: 0-50 or 501+")
+
+def _filters_digest(filters: Dict[str, str]) -> str:
+    return hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()[:8]
+
+def _sign(payload: bytes) -> str:
+    return hmac.new(settings.secret_key.encode(), payload, hashlib.sha256).hexdigest()[:16]
+
+def encode_cursor(trans_date: Optional[datetime], row_id: int, filters: Dict[str, str]) -> str:
+    """Encode the position after a row as an opaque continuation token."""
+    payload = json.dumps([
+        trans_date.isoformat() if trans_date else None,
+        row_id,
+        _filters_digest(filters)
+    ]).encode()
+    return base64.urlsafe_b64encode(payload + b"." + _sign(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str, filters: Dict[str, str]) -> Tuple[Optional[datetime], int]:
+    """Decode a continuation token issued for the same filters."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload, signature = raw.rsplit(b".", 1)
+        if not hmac.compare_digest(signature.decode(), _sign(payload)):
+            raise ValueError("bad signature")
+        trans_date, row_id, digest = json.loads(payload)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if digest != _filters_digest(filters):
+        raise ValueError("Cursor does not match the current filters")
+    return (datetime.fromisoformat(trans_date) if trans_date else None), int(row_id)
+
+def serialize_transaction(transaction: POSTransaction) -> Dict[str, Any]:
+    """Convert a transaction row into its API representation."""
+    return {
+        "id": transaction.id,
+        "store_code": transaction.store_code,
+        "store_display_name": transaction.store_display_name,
+        "trans_date": transaction.trans_date.date().isoformat() if transaction.trans_date else None,
+        "trans_time": transaction.trans_time,
+        "trans_no": transaction.trans_no,
+        "till_no": transaction.till_no,
+        "net_sales_header_values": transaction.net_sales_header_values or 0.0,
+        "quantity": transaction.quantity,
+        "trans_type": transaction.trans_type,
+        "tender": transaction.tender,
+        "discount_header": transaction.discount_header,
+        "tax_header": transaction.tax_header
+    }
+
+class DataService:
+    """Service for browsing and clearing transaction data."""
+
+    def __init__(self, db: Session):
+        """Initialize data service."""
+        self.db = db
+
+    def filtered_query(self, user: dict, filters: Dict[str, Optional[str]]):
+        """Build the transactions query for a user's filters."""
+        query = get_user_data_filter(user, self.db.query(POSTransaction), self.db)
+
+        start_date = _parse_date(filters.get("start_date"), "start_date")
+        end_date = _parse_date(filters.get("end_date"), "end_date")
+        if start_date:
+            query = query.filter(POSTransaction.trans_date >= start_date)
+        if end_date:
+            query = query.filter(POSTransaction.trans_date < end_date + timedelta(days=1))
+        # Match names through the dimension tables so the code columns are compared
+        if filters.get("store"):
+            query = query.filter(POSTransaction.store_code.in_(
+                select(Store.store_code).where(Store.store_display_name == filters["store"])
+            ))
+        if filters.get("tender"):
+            query = query.filter(POSTransaction.tender_code == (
+                select(TenderType.code).where(TenderType.name == filters["tender"]).scalar_subquery()
+            ))
+
+        low, high = _parse_amount_range(filters.get("amount_range"))
+        if low is not None:
+            query = query.filter(POSTransaction.net_sales_header_values >= low)
+        if high is not None:
+            query = query.filter(POSTransaction.net_sales_header_values <= high)
+        return query
+
+    def estimate_total(self, user: dict, filters: Dict[str, str]) -> Tuple[int, bool]:
+        """Count matching rows from the daily rollups instead of the transactions.
+
+        Returns the count and whether it is only an upper bound, which is the
+        case when a filter the rollups do not carry (store, amount) is set.
+        """
+        query = get_user_data_filter(
+            user, self.db.query(func.coalesce(func.sum(DailySalesRollup.transaction_count), 0)),
+            self.db, DailySalesRollup
+        )
+        start_date = _parse_date(filters.get("start_date"), "start_date")
+        end_date = _parse_date(filters.get("end_date"), "end_date")
+        if start_date:
+            query = query.filter(DailySalesRollup.trans_date >= start_date)
+        if end_date:
+            query = query.filter(DailySalesRollup.trans_date <= end_date)
+        if filters.get("tender"):
+            query = query.filter(DailySalesRollup.tender == filters["tender"])
+        return int(query.scalar()), not set(filters) <= ROLLUP_COUNT_FILTERS
+
+    def get_page(
+        self,
+        user: dict,
+        page: int = 1,
+        per_page: int = 20,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get one page of the user's transactions, newest first."""
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        page = max(page, 1)
+        per_page = min(max(per_page, 1), MAX_PER_PAGE)
+        query = self.filtered_query(user, filters)
+
+        def compute():
+            total = query.count()
+            rows = (
+                query.order_by(POSTransaction.trans_date.desc(), POSTransaction.id.desc())
+                .offset((page - 1) * per_page)
+                .limit(per_page)
+                .all()
+            )
+            return {
+                "data": [serialize_transaction(row) for row in rows],
+                "total": total,
+                "page": page,
+                "per_page": per_page,
+                "total_pages": math.ceil(total / per_page) if total else 0
+            }
+
+        scope, tags = get_cache_scope(user)
+        return result_cache.get_or_compute(
+            "data", scope, tags,
+            {"page": page, "per_page": per_page, **filters},
+            compute,
+            version
+        )
+
+    def get_keyset_page(
+        self,
+        user: dict,
+        cursor: Optional[str] = None,
+        per_page: int = 20,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        total: str = "approx",
+        version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get the transactions after a continuation token, newest first.
+
+        Seeks on (trans_date, id) instead of skipping rows with OFFSET, so
+        deep pages cost the same as the first one. ``total`` is "exact" for
+        a COUNT query, "approx" for a rollup estimate or "none".
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        per_page = min(max(per_page, 1), MAX_PER_PAGE)
+        if total not in ("exact", "approx", "none"):
+            raise ValueError(f"Invalid total: {total}. Expected exact, approx or none")
+        after = decode_cursor(cursor, filters) if cursor else None
+        query = self.filtered_query(user, filters)
+
+        def compute():
+            page_query = query
+            if after is not None:
+                last_date, last_id = after
+                if last_date is None:
+                    page_query = page_query.filter(
+                        POSTransaction.trans_date.is_(None), POSTransaction.id < last_id
+                    )
+                else:
+                    page_query = page_query.filter(or_(
+                        POSTransaction.trans_date < last_date,
+                        and_(POSTransaction.trans_date == last_date, POSTransaction.id < last_id),
+                        POSTransaction.trans_date.is_(None)
+                    ))
+            rows = (
+                page_query.order_by(POSTransaction.trans_date.desc(), POSTransaction.id.desc())
+                .limit(per_page + 1)
+                .all()
+            )
+            has_more = len(rows) > per_page
+            rows = rows[:per_page]
+
+            result = {
+                "data": [serialize_transaction(row) for row in rows],
+                "per_page": per_page,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(rows[-1].trans_date, rows[-1].id, filters) if has_more else None,
+                "total": None,
+                "total_is_estimate": False
+            }
+            if total == "exact":
+                result["total"] = query.count()
+            elif total == "approx":
+                result["total"], result["total_is_estimate"] = self.estimate_total(user, filters)
+            return result
+
+        scope, tags = get_cache_scope(user)
+        return result_cache.get_or_compute(
+            "data_keyset", scope, tags,
+            {"cursor": cursor, "per_page": per_page, "total": total, **filters},
+            compute,
+            version
+        )
+
+    def clear(self, user: dict, batch_size: Optional[int] = None) -> int:
+        """Delete all transactions uploaded by the user, with their rollups.
+
+        Rows are removed in short batches, each committed together with the
+        matching rollup decrements, so the write lock is only held briefly
+        and other users' reads and writes interleave with a large clear.
+        Freed pages are then released with incremental vacuum. If a batch
+        fails, the user's cached results are still invalidated for the
+        batches already committed.
+        """
+        batch_size = batch_size or settings.clear_batch_size
+        columns = [POSTransaction.id] + [getattr(POSTransaction, column) for column in SOURCE_COLUMNS]
+        deleted = 0
+
+        try:
+            while True:
+                rows = self.db.query(*columns).filter(
+                    POSTransaction.user_id == user["id"]
+                ).limit(batch_size).all()
+                if not rows:
+                    # Drop rollup rows left over from drift
+                    for model in (DailySalesRollup, HourlySalesRollup):
+                        self.db.execute(delete(model).where(model.user_id == user["id"]))
+                    self.db.commit()
+                    break
+                apply_rollups(self.db, [row._mapping for row in rows], sign=-1)
+                self.db.execute(delete(POSTransaction).where(POSTransaction.id.in_([row.id for row in rows])))
+                self.db.commit()
+                deleted += len(rows)
+                if settings.clear_batch_pause_seconds:
+                    time.sleep(settings.clear_batch_pause_seconds)
+
+            reclaim_free_pages(self.db)
+        except Exception:
+            self.db.rollback()
+            if deleted:
+                try:
+                    invalidate_user_data(self.db, [user["id"]])
+                except Exception as e:
+                    # Keep the clear's own error; the cached results expire with their TTL
+                    self.db.rollback()
+                    logger.error(f"Error invalidating cached results: {str(e)}")
+            raise
+
+        invalidate_user_data(self.db, [user["id"]])
+        logger.info(f"Cleared {deleted} transactions for user {user['id']}")
+        return deleted
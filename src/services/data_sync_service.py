@@ -3,8 +3,12 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.models.pos_transaction import POSTransaction
+from src.config.settings import settings
 from src.db.database import mongodb
-from typing import List, Dict, Any
+from src.services.rollup_service import apply_rollups, transaction_values
+from src.services.dimension_service import encode_dimensions
+from src.services.analytics_service import invalidate_user_data
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 
 logger = logging.getLogger(__name__)
@@ -37,69 +41,135 @@ class DataSyncService:
             logger.error(f"Error creating POSTransaction: {str(e)}, Record: {record}")
             raise
 
-    async def sync_transactions(self, batch_size: int = 100) -> Dict[str, int]:
-        """Sync unprocessed transactions from MongoDB to SQLite"""
+    async def sync_transactions(self, batch_size: int = 100, cursor_batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Sync unprocessed transactions from MongoDB to SQLite.
+
+        Up to ``batch_size`` documents (0 for the whole backlog) are streamed
+        from the cursor, which fetches ``cursor_batch_size`` of them per round
+        trip (settings.mongodb_cursor_batch_size by default). Each fetched
+        group is committed and marked processed before the next one is read,
+        so memory use does not grow with the backlog.
+        """
+        group_size = cursor_batch_size or settings.mongodb_cursor_batch_size
+        if batch_size:
+            group_size = min(group_size, batch_size)
+        synced_count = 0
+        error_count = 0
+        group = []
         try:
-            # Get unprocessed transactions from MongoDB
-            transactions = await mongodb.get_unprocessed_transactions(batch_size)
-            if not transactions:
-                logger.info("No unprocessed transactions found")
-                return {"synced": 0, "errors": 0}
+            async for record in mongodb.iter_unprocessed_transactions(limit=batch_size, batch_size=group_size):
+                group.append(record)
+                if len(group) >= group_size:
+                    synced, errors = await self._sync_group(group)
+                    synced_count += synced
+                    error_count += errors
+                    group = []
+            if group:
+                synced, errors = await self._sync_group(group)
+                synced_count += synced
+                error_count += errors
+        except Exception as e:
+            logger.error(f"Error syncing transactions: {str(e)}")
+            # A failed read counts as an error even before any record was fetched
+            return {"synced": synced_count, "errors": error_count + max(len(group), 1)}
+
+        if not synced_count and not error_count:
+            logger.info("No unprocessed transactions found")
+        return {"synced": synced_count, "errors": error_count}
+
+    async def _sync_group(self, transactions: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Upsert one group of MongoDB records, commit and mark them processed."""
+        transaction_ids = []
+        error_count = 0
+        removed_values = []
+        added_values = []
+
+        # Process each transaction
+        for record in transactions:
+            try:
+                # Check if record already exists in SQLite
+                existing = self.db.query(POSTransaction).filter_by(
+                    id_key=record['id_key']
+                ).first()
+
+                if existing:
+                    # Update existing record, moving its totals in the rollups
+                    old_values = transaction_values(existing)
+                    for key, value in record.items():
+                        if key not in ['_id', 'processed']:
+                            if key == 'trans_date':
+                                value = datetime.fromisoformat(value)
+                            elif key in ['discount_header', 'tax_header', 'net_sales_header_values']:
+                                value = float(value or 0)
+                            elif key in ['quantity', 'trans_type', 'dm_load_delta_id']:
+                                value = int(value or 0)
+                            setattr(existing, key, value)
+                    removed_values.append(old_values)
+                    added_values.append(transaction_values(existing))
+                else:
+                    # Create new record
+                    pos_transaction = self._create_pos_transaction(record)
+                    self.db.add(pos_transaction)
+                    added_values.append(transaction_values(pos_transaction))
 
-            transaction_ids = []
-            error_count = 0
-            synced_count = 0
-
-            # Process each transaction
-            for record in transactions:
-                try:
-                    # Check if record already exists in SQLite
-                    existing = self.db.query(POSTransaction).filter_by(
-                        id_key=record['id_key']
-                    ).first()
-
-                    if existing:
-                        # Update existing record
-                        for key, value in record.items():
-                            if key not in ['_id', 'processed']:
-                                if key == 'trans_date':
-                                    value = datetime.fromisoformat(value)
-                                elif key in ['discount_header', 'tax_header', 'net_sales_header_values']:
-                                    value = float(value or 0)
-                                elif key in ['quantity', 'trans_type', 'dm_load_delta_id']:
-                                    value = int(value or 0)
-                                setattr(existing, key, value)
-                    else:
-                        # Create new record
-                        pos_transaction = self._create_pos_transaction(record)
-                        self.db.add(pos_transaction)
-
-                    transaction_ids.append(record['_id'])
-                    synced_count += 1
-                except Exception as e:
-                    logger.error(f"Error processing transaction {record.get('id_key')}: {str(e)}")
-                    error_count += 1
-                    continue
-
-            # Commit SQLite changes
-            if transaction_ids:
-                try:
-                    self.db.commit()
-                    # Mark transactions as processed in MongoDB
-                    processed_count = await mongodb.mark_as_processed(transaction_ids)
-                    if processed_count != len(transaction_ids):
-                        logger.warning(f"Only {processed_count} of {len(transaction_ids)} transactions were marked as processed")
-                    return {"synced": synced_count, "errors": error_count}
-                except Exception as e:
-                    self.db.rollback()
-                    logger.error(f"Error committing transactions: {str(e)}")
-                    return {"synced": 0, "errors": len(transactions)}
-
-            return {"synced": synced_count, "errors": error_count}
+                transaction_ids.append(record['_id'])
+            except Exception as e:
+                logger.error(f"Error processing transaction {record.get('id_key')}: {str(e)}")
+                error_count += 1
+                continue
 
+        if not transaction_ids:
+            return 0, error_count
+
+        # Commit SQLite changes
+        try:
+            apply_rollups(self.db, removed_values, sign=-1)
+            apply_rollups(self.db, added_values)
+            self.db.commit()
+            invalidate_user_data(
+                self.db,
+                {values["user_id"] for values in removed_values + added_values}
+            )
         except Exception as e:
-            logger.error(f"Error syncing transactions: {str(e)}")
-            return {"synced": 0, "errors": batch_size}
+            self.db.rollback()
+            logger.error(f"Error committing transactions: {str(e)}")
+            return 0, len(transactions)
+
+        # Mark transactions as processed in MongoDB
+        processed_count = await mongodb.mark_as_processed(transaction_ids)
+        if processed_count != len(transaction_ids):
+            logger.warning(f"Only {processed_count} of {len(transaction_ids)} transactions were marked as processed")
+        return len(transaction_ids), error_count
+
+def _mappings_from_columns(columns: Dict[str, List[Any]]) -> Tuple[List[Dict[str, Any]], List[Any], int]:
+    """Convert a columnar MongoDB batch into POSTransaction insert mappings"""
+    mappings = []
+    processed_ids = []
+    error_count = 0
+
+    for i, doc_id in enumerate(columns["_id"]):
+        try:
+            mappings.append({
+                "store_code": columns["store_code"][i],
+                "store_display_name": columns["store_display_name"][i],
+                "trans_date": datetime.fromisoformat(columns["trans_date"][i]),
+                "trans_time": columns["trans_time"][i],
+                "trans_no": columns["trans_no"][i],
+                "till_no": columns["till_no"][i],
+                "discount_header": float(columns["discount_header"][i] or 0),
+                "tax_header": float(columns["tax_header"][i] or 0),
+                "net_sales_header_values": float(columns["net_sales_header_values"][i] or 0),
+                "quantity": int(columns["quantity"][i] or 0),
+                "trans_type": int(columns["trans_type"][i] or 0),
+                "tender": columns["tender"][i],
+                "user_id": columns["user_id"][i],
+            })
+            processed_ids.append(doc_id)
+        except Exception as e:
+            logger.error(f"Error processing transaction {doc_id}: {str(e)}")
+            error_count += 1
+
+    return mappings, processed_ids, error_count
 
 class AsyncDataSyncService:
     def __init__(self, db: AsyncSession):
@@ -108,48 +178,27 @@ class AsyncDataSyncService:
     async def sync_transactions(self, batch_size: int = 100) -> Dict[str, Any]:
         """Sync transactions from MongoDB to SQLite (async version)"""
         try:
-            # Get unprocessed transactions from MongoDB
-            transactions = await mongodb.get_unprocessed_transactions(batch_size)
+            # Get unprocessed transactions from MongoDB as columns
+            columns = await mongodb.get_unprocessed_columns(batch_size)
             
-            if not transactions:
+            if not columns["_id"]:
                 logger.info("No new transactions to sync")
                 return {"synced": 0, "errors": 0}
 
-            processed_ids = []
-            error_count = 0
-
-            # Process each transaction
-            for transaction in transactions:
-                try:
-                    # Transform MongoDB document to SQLite record
-                    pos_transaction = POSTransaction(
-                        store_code=transaction.get('store_code'),
-                        store_display_name=transaction.get('store_display_name'),
-                        trans_date=datetime.fromisoformat(transaction.get('trans_date')),
-                        trans_time=transaction.get('trans_time'),
-                        trans_no=transaction.get('trans_no'),
-                        till_no=transaction.get('till_no'),
-                        discount_header=float(transaction.get('discount_header', 0)),
-                        tax_header=float(transaction.get('tax_header', 0)),
-                        net_sales_header_values=float(transaction.get('net_sales_header_values', 0)),
-                        quantity=int(transaction.get('quantity', 0)),
-                        trans_type=int(transaction.get('trans_type', 0)),
-                        id_key=int(transaction.get('id_key')),
-                        tender=transaction.get('tender'),
-                        dm_load_date=transaction.get('dm_load_date'),
-                        dm_load_delta_id=int(transaction.get('dm_load_delta_id', 0))
-                    )
-                    
-                    # Add to SQLite
-                    self.db.add(pos_transaction)
-                    processed_ids.append(transaction['_id'])
-                except Exception as e:
-                    logger.error(f"Error processing transaction {transaction.get('_id')}: {str(e)}")
-                    error_count += 1
+            mappings, processed_ids, error_count = _mappings_from_columns(columns)
 
             if processed_ids:
-                # Commit SQLite changes
+                # Bulk insert the batch with its rollups and commit SQLite changes
+                def load(session):
+                    encode_dimensions(session, mappings)
+                    session.bulk_insert_mappings(POSTransaction, mappings)
+                    apply_rollups(session, mappings)
+
+                await self.db.run_sync(load)
                 await self.db.commit()
+                await self.db.run_sync(
+                    lambda session: invalidate_user_data(session, {m["user_id"] for m in mappings})
+                )
                 
                 # Mark transactions as processed in MongoDB
                 processed_count = await mongodb.mark_as_processed(processed_ids)
@@ -0,0 +1,44 @@
+import logging
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import func, insert, select, update
+from src.models.data_version import DataVersion
+from src.services.dimension_service import _dialect_insert
+
+logger = logging.getLogger(__name__)
+
+def bump_data_versions(executor, tags: Iterable[str]) -> None:
+    """Increment the version of each tag, without committing."""
+    tags = sorted(set(tags))
+    if not tags:
+        return
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    dialect_insert = _dialect_insert(executor)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table)
+        executor.execute(stmt.on_conflict_do_update(
+            index_elements=["tag"],
+            set_={"version": table.c.version + 1, "updated_at": stmt.excluded.updated_at}
+        ), [{"tag": tag, "version": 1, "updated_at": now} for tag in tags])
+        return
+
+    existing = {tag for (tag,) in executor.execute(select(table.c.tag).where(table.c.tag.in_(tags)))}
+    if existing:
+        executor.execute(update(table).where(table.c.tag.in_(existing)).values(
+            version=table.c.version + 1, updated_at=now
+        ))
+    for tag in tags:
+        if tag not in existing:
+            executor.execute(insert(table).values(tag=tag, version=1, updated_at=now))
+
+def get_data_version(executor, tags: Iterable[str]) -> Tuple[int, Optional[datetime]]:
+    """Get the combined version of tags and when one of them last changed.
+
+    The sum only grows, so it changes whenever any of the tags is bumped.
+    """
+    version, updated_at = executor.execute(
+        select(func.coalesce(func.sum(DataVersion.version), 0), func.max(DataVersion.updated_at))
+        .where(DataVersion.tag.in_(sorted(set(tags))))
+    ).one()
+    return int(version), updated_at
@@ -0,0 +1,106 @@
+import logging
+import math
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import func, insert, select, update
+from src.models.dimensions import Store, TenderType, TransactionType
+from src.services.rollup_service import _dialect_name
+
+logger = logging.getLogger(__name__)
+
+# (name attribute, code column, dimension model) for the coded columns
+CODED_COLUMNS = (
+    ("tender", "tender_code", TenderType),
+    ("trans_type", "trans_type_code", TransactionType),
+)
+
+def _get(record: Any, key: str) -> Any:
+    if isinstance(record, dict):
+        return record.get(key)
+    return getattr(record, key, None)
+
+def _set(record: Any, key: str, value: Any) -> None:
+    if isinstance(record, dict):
+        record[key] = value
+    else:
+        setattr(record, key, value)
+
+def _name(value: Any) -> Optional[str]:
+    """Normalize a dimension value, treating missing and blank values as None."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value).strip() or None
+
+def _dialect_insert(executor):
+    dialect = _dialect_name(executor)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+def _upsert_stores(executor, stores: Dict[str, Optional[str]]) -> None:
+    rows = [{"store_code": code, "store_display_name": name} for code, name in stores.items()]
+    dialect_insert = _dialect_insert(executor)
+    if dialect_insert is not None:
+        stmt = dialect_insert(Store.__table__)
+        executor.execute(stmt.on_conflict_do_update(
+            index_elements=["store_code"],
+            set_={"store_display_name": func.coalesce(
+                stmt.excluded.store_display_name, Store.__table__.c.store_display_name
+            )}
+        ), rows)
+        return
+
+    existing = {code for (code,) in executor.execute(
+        select(Store.store_code).where(Store.store_code.in_(list(stores)))
+    )}
+    for row in rows:
+        if row["store_code"] not in existing:
+            executor.execute(insert(Store.__table__).values(**row))
+        elif row["store_display_name"]:
+            executor.execute(update(Store.__table__).where(
+                Store.__table__.c.store_code == row["store_code"]
+            ).values(store_display_name=row["store_display_name"]))
+
+def _get_codes(executor, model, names: Iterable[str]) -> Dict[str, int]:
+    """Get the codes for names, assigning new codes to unseen names."""
+    names = sorted(set(names))
+    dialect_insert = _dialect_insert(executor)
+    if dialect_insert is not None:
+        executor.execute(
+            dialect_insert(model.__table__).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": name} for name in names]
+        )
+        return dict(executor.execute(select(model.name, model.code).where(model.name.in_(names))).all())
+
+    codes = dict(executor.execute(select(model.name, model.code).where(model.name.in_(names))).all())
+    for name in names:
+        if name not in codes:
+            executor.execute(insert(model.__table__).values(name=name))
+    return dict(executor.execute(select(model.name, model.code).where(model.name.in_(names))).all())
+
+def encode_dimensions(executor, records: List[Any]) -> None:
+    """Fill the dimension tables from a batch and set its code columns.
+
+    Works on insert mappings or POSTransaction objects, on the caller's
+    session or connection and without committing, so the dimension rows
+    are written in the same transaction as the batch.
+    """
+    if not records:
+        return
+
+    stores: Dict[str, Optional[str]] = {}
+    for record in records:
+        store_code = _name(_get(record, "store_code"))
+        if store_code:
+            stores[store_code] = _name(_get(record, "store_display_name")) or stores.get(store_code)
+    if stores:
+        _upsert_stores(executor, stores)
+
+    for name_attr, code_attr, model in CODED_COLUMNS:
+        names = {name for name in (_name(_get(record, name_attr)) for record in records) if name}
+        codes = _get_codes(executor, model, names) if names else {}
+        for record in records:
+            _set(record, code_attr, codes.get(_name(_get(record, name_attr))))
@@ -2,10 +2,15 @@ import pandas as pd
 import logging
 from datetime import datetime
 import uuid
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from sqlalchemy.orm import Session
 from src.models.pos_transaction import POSTransaction
 from src.config.settings import settings
+from src.utils.status_monitor import ProcessingMonitor
+from src.db.database import mongodb
+from src.services.rollup_service import apply_rollups, transaction_values
+from src.services.dimension_service import encode_dimensions
+from src.services.analytics_service import invalidate_user_data
 
 logger = logging.getLogger(__name__)
 
@@ -41,75 +46,107 @@ class ETLService:
         except (ValueError, TypeError):
             return 0.0
 
-    async def process_file(self, file_path: str = None, user_id: int = None) -> dict:
-        """Process CSV file and store in database."""
-        try:
-            if file_path:
-                # Read and validate CSV
-                df = pd.read_csv(file_path)
-                if not self.validate_data(df):
-                    raise ValueError(f"Missing required columns. Required: {self.required_columns}")
-
-                # Convert column names to match database fields
-                df.columns = [col.lower() for col in df.columns]
+    def _prepare_chunk(self, df: pd.DataFrame, user_id: Optional[int], load_date: datetime, delta_id: str) -> List[Dict[str, Any]]:
+        """Convert one chunk of a CSV file into insert mappings."""
+        if not self.validate_data(df):
+            raise ValueError(f"Missing required columns. Required: {self.required_columns}")
 
-                # Add user_id to each record
-                if user_id:
-                    df['user_id'] = user_id
+        # Convert column names to match database fields
+        df.columns = [col.lower() for col in df.columns]
 
-                # Convert date and time fields - try multiple formats
-                try:
-                    # First try %m/%d/%y format
-                    df['trans_date'] = pd.to_datetime(df['trans_date'], format='%m/%d/%y')
-                except ValueError:
-                    try:
-                        # Then try %Y-%m-%d format
-                        df['trans_date'] = pd.to_datetime(df['trans_date'], format='%Y-%m-%d')
-                    except ValueError:
-                        # If both fail, let pandas infer the format
-                        df['trans_date'] = pd.to_datetime(df['trans_date'])
-
-                df['dm_load_date'] = datetime.now()
-                df['dm_load_delta_id'] = str(uuid.uuid4())
-
-                # Clean numeric fields
-                df['net_sales_header_values'] = df['net_sales_header_values'].apply(self.clean_numeric)
-                df['discount_header'] = df.get('discount_header', 0.0).apply(self.clean_numeric)
-                df['tax_header'] = df.get('tax_header', 0.0).apply(self.clean_numeric)
-                df['quantity'] = df['quantity'].fillna(0).astype(int)
-
-                # Set default values for optional fields
-                df['trans_type'] = df.get('trans_type', 'SALE')
-                df['tender'] = df.get('tender', 'CASH')
-
-                # Convert to records
-                records = df.to_dict('records')
-
-                # Insert in batches
-                batch_size = settings.batch_size
-                for i in range(0, len(records), batch_size):
-                    batch = records[i:i + batch_size]
-                    self.db.bulk_insert_mappings(POSTransaction, batch)
-                    self.db.commit()
-
-                return {
-                    "status": "success",
-                    "records_processed": len(records),
-                    "message": f"Successfully processed {len(records)} records"
-                }
-
-            return {
-                "status": "success",
-                "records_synced": 0,
-                "message": "Successfully synced 0 records"
-            }
+        # Add user_id to each record
+        if user_id:
+            df['user_id'] = user_id
 
-        except Exception as e:
+        # Convert date and time fields - try multiple formats
+        try:
+            # First try %m/%d/%y format
+            df['trans_date'] = pd.to_datetime(df['trans_date'], format='%m/%d/%y')
+        except ValueError:
+            try:
+                # Then try %Y-%m-%d format
+                df['trans_date'] = pd.to_datetime(df['trans_date'], format='%Y-%m-%d')
+            except ValueError:
+                # If both fail, let pandas infer the format
+                df['trans_date'] = pd.to_datetime(df['trans_date'])
+
+        df['dm_load_date'] = load_date
+        df['dm_load_delta_id'] = delta_id
+
+        # Clean numeric fields
+        df['net_sales_header_values'] = df['net_sales_header_values'].apply(self.clean_numeric)
+        df['discount_header'] = df.get('discount_header', 0.0).apply(self.clean_numeric)
+        df['tax_header'] = df.get('tax_header', 0.0).apply(self.clean_numeric)
+        df['quantity'] = df['quantity'].fillna(0).astype(int)
+
+        # Set default values for optional fields
+        df['trans_type'] = df.get('trans_type', 'SALE')
+        df['tender'] = df.get('tender', 'CASH')
+
+        return df.to_dict('records')
+
+    def load_csv(
+        self,
+        file_path: str,
+        user_id: Optional[int] = None,
+        monitor: Optional[ProcessingMonitor] = None
+    ) -> Dict[str, Any]:
+        """Load a CSV file in chunks of settings.batch_size rows.
+
+        Only one chunk is held in memory at a time, so memory use does not
+        grow with the file. Each chunk is committed with its rollups and
+        then counted on monitor; the rows of a chunk that fails are counted
+        as rejected. Cached results are invalidated even when a later chunk
+        fails, since the earlier ones are already committed.
+        """
+        load_date = datetime.now()
+        delta_id = str(uuid.uuid4())
+        processed = 0
+        total_sales = 0.0
+        parsed = 0
+        try:
+            for df in pd.read_csv(file_path, chunksize=settings.batch_size):
+                parsed = len(df)
+                batch = self._prepare_chunk(df, user_id, load_date, delta_id)
+                encode_dimensions(self.db, batch)
+                self.db.bulk_insert_mappings(POSTransaction, batch)
+                apply_rollups(self.db, batch)
+                self.db.commit()
+                processed += len(batch)
+                total_sales += sum(record['net_sales_header_values'] for record in batch)
+                if monitor:
+                    monitor.record_batch(parsed, len(batch))
+                parsed = 0
+        except Exception:
             self.db.rollback()
-            raise e
+            if monitor and parsed:
+                monitor.record_batch(parsed, 0)
+            if processed:
+                self._invalidate_after_failure(user_id)
+            raise
+
+        invalidate_user_data(self.db, [user_id])
+        return {
+            "status": "success",
+            "records_processed": processed,
+            "total_sales": total_sales,
+            "message": f"Successfully processed {processed} records"
+        }
+
+    async def process_file(self, file_path: str = None, user_id: int = None) -> dict:
+        """Process CSV file and store in database."""
+        if file_path:
+            return self.load_csv(file_path, user_id)
+
+        return {
+            "status": "success",
+            "records_synced": 0,
+            "message": "Successfully synced 0 records"
+        }
 
     async def _process_batch(self, df: pd.DataFrame, user_id: int) -> int:
         """Process a batch of records."""
+        committed = False
         try:
             # Convert column names to lowercase
             df.columns = df.columns.str.lower()
@@ -136,7 +173,7 @@ class ETLService:
                         store_code=str(row.get('store_code', '')),
                         store_display_name=str(row.get('store_display_name', '')),
                         trans_date=trans_date,
-                        trans_time=str(row.get('trans_time', '')),
+                        trans_time=row.get('trans_time'),
                         trans_no=str(row.get('trans_no', '')),
                         till_no=str(row.get('till_no', '')),
                         discount_header=self.clean_numeric(row.get('discount_header', 0)),
@@ -151,8 +188,11 @@ class ETLService:
                     records.append(transaction)
 
                     if len(records) >= settings.batch_size:
+                        encode_dimensions(self.db, records)
                         self.db.bulk_save_objects(records)
+                        apply_rollups(self.db, [transaction_values(t) for t in records])
                         self.db.commit()
+                        committed = True
                         records = []
 
                 except Exception as e:
@@ -160,16 +200,31 @@ class ETLService:
                     continue
 
             if records:
+                encode_dimensions(self.db, records)
                 self.db.bulk_save_objects(records)
+                apply_rollups(self.db, [transaction_values(t) for t in records])
                 self.db.commit()
 
+            invalidate_user_data(self.db, [user_id])
+
             return len(df)
 
         except Exception as e:
             self.db.rollback()
             logger.error(f"Error processing batch: {str(e)}")
+            if committed:
+                self._invalidate_after_failure(user_id)
             raise
 
+    def _invalidate_after_failure(self, user_id: Optional[int]) -> None:
+        """Invalidate results cached without the rows committed before a failed load."""
+        try:
+            invalidate_user_data(self.db, [user_id])
+        except Exception as e:
+            # Keep the load's own error; the cached results expire with their TTL
+            self.db.rollback()
+            logger.error(f"Error invalidating cached results: {str(e)}")
+
     async def _sync_transactions(self) -> int:
         """Sync transactions from source to destination."""
         try:
@@ -230,23 +285,12 @@ class ETLService:
     async def load_to_mongodb(self, records: List[Dict[str, Any]]) -> int:
         """Load the transformed data into MongoDB"""
         try:
-            # Ensure MongoDB is connected
-            await mongodb.ensure_connected()
-            
-            loaded_count = 0
-            failed_count = 0
-            
-            for record in records:
-                try:
-                    success = await mongodb.insert_raw_transaction(record)
-                    if success:
-                        loaded_count += 1
-                    else:
-                        failed_count += 1
-                except Exception as e:
-                    logger.error(f"Error inserting record: {str(e)}")
-                    failed_count += 1
-            
+            result = await mongodb.insert_many_raw(records)
+            loaded_count = result["inserted"]
+            failed_count = result["errors"]
+
+            if result["duplicates"] > 0:
+                logger.info(f"Skipped {result['duplicates']} duplicate records")
             if failed_count > 0:
                 logger.warning(f"Failed to load {failed_count} records")
             
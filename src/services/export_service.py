@@ -0,0 +1,155 @@
+import csv
+import importlib.util
+import io
+import json
+import logging
+import zlib
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from sqlalchemy.orm import Session
+from src.config.settings import settings
+from src.models.pos_transaction import POSTransaction
+from src.services.data_service import DataService, serialize_transaction
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = (
+    "id", "store_code", "store_display_name", "trans_date", "trans_time", "trans_no",
+    "till_no", "net_sales_header_values", "quantity", "trans_type", "tender",
+    "discount_header", "tax_header",
+)
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream into a single gzip member as it is produced."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def csv_chunks(rows: Iterable[Dict[str, Any]], rows_per_chunk: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % rows_per_chunk == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def ndjson_chunks(rows: Iterable[Dict[str, Any]], rows_per_chunk: int) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row))
+        if len(lines) >= rows_per_chunk:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def parquet_chunks(rows: Iterable[Dict[str, Any]], rows_per_chunk: int) -> Iterator[bytes]:
+    """Write one Parquet row group per chunk of rows."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("store_code", pa.string()), ("store_display_name", pa.string()),
+        ("trans_date", pa.string()), ("trans_time", pa.string()), ("trans_no", pa.string()),
+        ("till_no", pa.string()), ("net_sales_header_values", pa.float64()), ("quantity", pa.int64()),
+        ("trans_type", pa.string()), ("tender", pa.string()), ("discount_header", pa.float64()),
+        ("tax_header", pa.float64()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= rows_per_chunk:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            batch = []
+            yield sink.drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+CHUNK_WRITERS = {"csv": csv_chunks, "ndjson": ndjson_chunks, "parquet": parquet_chunks}
+
+class ExportService:
+    """Service for streaming a user's transactions out as files.
+
+    Rows are read through a server-side cursor in ``yield_per`` batches and
+    encoded chunk by chunk, so memory use does not grow with the export.
+    """
+
+    def __init__(self, db: Session):
+        """Initialize export service."""
+        self.db = db
+
+    def iter_rows(self, query, batch_size: int) -> Iterator[Dict[str, Any]]:
+        columns = [getattr(POSTransaction, column) for column in EXPORT_COLUMNS]
+        rows = (
+            query.with_entities(*columns)
+            .order_by(POSTransaction.trans_date, POSTransaction.id)
+            .yield_per(batch_size)
+        )
+        for row in rows:
+            yield serialize_transaction(row)
+
+    def export(
+        self,
+        user: dict,
+        fmt: str = "csv",
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        compress: bool = False,
+        batch_size: Optional[int] = None
+    ) -> Tuple[Iterator[bytes], str, str]:
+        """Get the byte stream, media type and file name of an export.
+
+        Validates the format and filters up front so errors surface before
+        any bytes are streamed.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format: {fmt}. Expected one of {', '.join(EXPORT_FORMATS)}")
+        if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            raise ValueError("Parquet export requires pyarrow to be installed")
+
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        batch_size = batch_size or settings.export_batch_size
+        query = DataService(self.db).filtered_query(user, filters)
+
+        media_type, extension = EXPORT_FORMATS[fmt]
+        filename = f"transactions_{date.today().isoformat()}{extension}"
+        chunks = CHUNK_WRITERS[fmt](self.iter_rows(query, batch_size), batch_size)
+        logger.info(f"Exporting transactions as {fmt} for user {user['id']}")
+        # Parquet pages are already compressed
+        if compress and fmt != "parquet":
+            return gzip_chunks(chunks), "application/gzip", filename + ".gz"
+        return chunks, media_type, filename
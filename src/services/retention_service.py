@@ -0,0 +1,139 @@
+import asyncio
+import gzip
+import importlib.util
+import io
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from src.config.settings import settings
+from src.db.database import mongodb, MongoDB
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_EXTENSIONS = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz"}
+
+def _resolve_compression(requested: str) -> str:
+    """Use zstd when requested and installed, gzip otherwise"""
+    if requested == "zstd" and importlib.util.find_spec("zstandard") is not None:
+        return "zstd"
+    if requested == "zstd":
+        logger.warning("zstandard is not installed, archiving with gzip")
+    return "gzip"
+
+def _compress(data: bytes, compression: str) -> bytes:
+    """Compress one batch as a self-contained zstd frame or gzip member"""
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+def _open_archive(path: str):
+    """Open an archive for reading across all of its frames or members"""
+    if path.endswith(ARCHIVE_EXTENSIONS["zstd"]):
+        import zstandard
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+class RetentionService:
+    """Archive processed raw transactions to compressed JSONL and delete them.
+
+    Each batch is appended to the archive as its own compressed frame and
+    fsynced before its documents are deleted, so an interrupted run never
+    loses data and its archive stays readable.
+    """
+
+    def __init__(self, mongo: MongoDB = mongodb, archive_dir: Optional[str] = None):
+        self.mongo = mongo
+        self.archive_dir = archive_dir or settings.archive_dir
+        self.compression = _resolve_compression(settings.retention_compression)
+
+    async def _throttle(self, started: float, processed: int) -> None:
+        """Sleep until throughput drops back under the configured rate"""
+        rate = settings.retention_max_docs_per_second
+        if rate <= 0:
+            return
+        ahead = processed / rate - (time.monotonic() - started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+    async def archive(self, older_than_days: Optional[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """Archive and delete processed transactions older than N days"""
+        days = settings.retention_days if older_than_days is None else older_than_days
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(
+            self.archive_dir,
+            f"{settings.mongodb_collection}-{datetime.utcnow():%Y%m%dT%H%M%S}{ARCHIVE_EXTENSIONS[self.compression]}"
+        )
+
+        result = {"archived": 0, "deleted": 0, "batches": 0, "path": None, "cutoff": cutoff.isoformat()}
+        started = time.monotonic()
+        last_id = None
+
+        while True:
+            batch = await self.mongo.get_processed_before(
+                cutoff, after_id=last_id, limit=settings.retention_batch_size
+            )
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            result["batches"] += 1
+            result["archived"] += len(batch)
+
+            if not dry_run:
+                lines = "".join(json_util.dumps(doc, json_options=CANONICAL_JSON_OPTIONS) + "\n" for doc in batch)
+                with open(path, "ab") as archive_file:
+                    archive_file.write(_compress(lines.encode("utf-8"), self.compression))
+                    archive_file.flush()
+                    os.fsync(archive_file.fileno())
+                result["path"] = path
+                result["deleted"] += await self.mongo.delete_by_ids([doc["_id"] for doc in batch])
+
+            await self._throttle(started, result["archived"])
+
+        logger.info(
+            f"Retention {'dry run' if dry_run else 'run'} finished: {result['archived']} archived, "
+            f"{result['deleted']} deleted from documents processed before {cutoff.isoformat()}"
+        )
+        return result
+
+    def read_archive(self, path: str) -> Iterator[Dict[str, Any]]:
+        """Read documents back from an archive file"""
+        with _open_archive(path) as archive_file:
+            try:
+                for line in archive_file:
+                    if line.strip():
+                        yield json_util.loads(line, json_options=CANONICAL_JSON_OPTIONS)
+            except EOFError:
+                # Only the frame being written when a run was interrupted can be cut short
+                logger.warning(f"Archive {path} ends with an incomplete batch")
+
+    async def restore(self, path: str) -> Dict[str, int]:
+        """Re-insert archived documents, keeping their original _id"""
+        counts = {"inserted": 0, "duplicates": 0, "errors": 0}
+        started = time.monotonic()
+        processed = 0
+        batch: List[Dict[str, Any]] = []
+
+        for document in self.read_archive(path):
+            batch.append(document)
+            if len(batch) >= settings.retention_batch_size:
+                processed += len(batch)
+                self._add_counts(counts, await self.mongo.insert_many_raw(batch))
+                batch = []
+                await self._throttle(started, processed)
+        if batch:
+            self._add_counts(counts, await self.mongo.insert_many_raw(batch))
+
+        logger.info(f"Restored {counts['inserted']} documents from {path}")
+        return counts
+
+    @staticmethod
+    def _add_counts(counts: Dict[str, int], result: Dict[str, int]) -> None:
+        for key in counts:
+            counts[key] += result.get(key, 0)
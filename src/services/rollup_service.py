@@ -0,0 +1,158 @@
+import logging
+import math
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, insert, select, update
+from src.db.types import parse_time_of_day
+from src.models.pos_transaction import POSTransaction
+from src.models.sales_rollup import DailySalesRollup, HourlySalesRollup
+
+logger = logging.getLogger(__name__)
+
+SUM_COLUMNS = ("net_sales", "tax", "discount", "quantity", "transaction_count")
+
+# POSTransaction columns the rollups are computed from
+SOURCE_COLUMNS = (
+    "user_id", "store_code", "store_display_name", "trans_date", "trans_time",
+    "tender", "net_sales_header_values", "tax_header", "discount_header", "quantity",
+)
+
+DAILY_KEY = ("user_id", "trans_date", "store_code", "tender")
+HOURLY_KEY = ("user_id", "trans_date", "store_code", "hour")
+
+def _number(value: Any) -> float:
+    """Treat missing and NaN values as zero."""
+    if value is None:
+        return 0.0
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(value) else value
+
+def _text(value: Any) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value)
+
+def _as_date(value: Any) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if hasattr(value, "to_pydatetime"):
+        return value.to_pydatetime().date()
+    return datetime.fromisoformat(str(value)).date()
+
+def _hour(trans_time: Any) -> int:
+    """Extract the hour from a time of day, 0 when missing or unparseable."""
+    try:
+        seconds = parse_time_of_day(trans_time)
+    except ValueError:
+        return 0
+    return 0 if seconds is None else seconds // 3600
+
+def transaction_values(transaction: POSTransaction) -> Dict[str, Any]:
+    """Get the rollup source values of a POSTransaction object."""
+    return {column: getattr(transaction, column) for column in SOURCE_COLUMNS}
+
+def aggregate(records: Iterable[Dict[str, Any]], sign: int = 1) -> Tuple[Dict[tuple, Dict], Dict[tuple, Dict]]:
+    """Aggregate transaction records into daily and hourly rollup rows."""
+    daily: Dict[tuple, Dict[str, Any]] = {}
+    hourly: Dict[tuple, Dict[str, Any]] = {}
+
+    for record in records:
+        trans_date = _as_date(record.get("trans_date"))
+        if trans_date is None:
+            continue
+        user_id = int(_number(record.get("user_id")))
+        store_code = _text(record.get("store_code"))
+        amounts = {
+            "net_sales": sign * _number(record.get("net_sales_header_values")),
+            "tax": sign * _number(record.get("tax_header")),
+            "discount": sign * _number(record.get("discount_header")),
+            "quantity": sign * int(_number(record.get("quantity"))),
+            "transaction_count": sign,
+        }
+
+        daily_key = (user_id, trans_date, store_code, _text(record.get("tender")))
+        row = daily.setdefault(daily_key, {
+            **dict(zip(DAILY_KEY, daily_key)),
+            "store_display_name": _text(record.get("store_display_name")) or None,
+            **{column: 0 for column in SUM_COLUMNS},
+        })
+        for column, amount in amounts.items():
+            row[column] += amount
+
+        hourly_key = (user_id, trans_date, store_code, _hour(record.get("trans_time")))
+        row = hourly.setdefault(hourly_key, {
+            **dict(zip(HOURLY_KEY, hourly_key)),
+            **{column: 0 for column in SUM_COLUMNS},
+        })
+        for column, amount in amounts.items():
+            row[column] += amount
+
+    return daily, hourly
+
+def _dialect_name(executor) -> str:
+    dialect = getattr(executor, "dialect", None) or executor.get_bind().dialect
+    return dialect.name
+
+def _upsert(executor, model, key: Tuple[str, ...], rows: List[Dict[str, Any]]) -> None:
+    """Add rows onto existing rollup rows, inserting the missing ones."""
+    if not rows:
+        return
+    table = model.__table__
+    dialect = _dialect_name(executor)
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        set_ = {column: table.c[column] + stmt.excluded[column] for column in SUM_COLUMNS}
+        if "store_display_name" in table.c:
+            set_["store_display_name"] = stmt.excluded.store_display_name
+        executor.execute(stmt.on_conflict_do_update(index_elements=list(key), set_=set_), rows)
+        return
+
+    for row in rows:
+        match = [table.c[column] == row[column] for column in key]
+        values = {column: table.c[column] + row[column] for column in SUM_COLUMNS}
+        result = executor.execute(update(table).where(*match).values(**values))
+        if result.rowcount == 0:
+            executor.execute(insert(table).values(**row))
+
+def apply_rollups(executor, records: Iterable[Dict[str, Any]], sign: int = 1) -> None:
+    """Fold transaction records into the rollup tables.
+
+    Runs on the caller's session or connection without committing, so the
+    rollups change in the same transaction as the rows they summarize. Use
+    ``sign=-1`` to remove records that are being updated or deleted.
+    """
+    daily, hourly = aggregate(records, sign)
+    _upsert(executor, DailySalesRollup, DAILY_KEY, list(daily.values()))
+    _upsert(executor, HourlySalesRollup, HOURLY_KEY, list(hourly.values()))
+    if sign < 0:
+        for model in (DailySalesRollup, HourlySalesRollup):
+            executor.execute(delete(model).where(model.transaction_count <= 0))
+
+def rebuild_rollups(executor, chunk_size: int = 50000) -> int:
+    """Recompute the rollup tables from all rows in pos_transactions."""
+    for model in (DailySalesRollup, HourlySalesRollup):
+        executor.execute(delete(model))
+
+    columns = [getattr(POSTransaction, column) for column in SOURCE_COLUMNS]
+    result = executor.execute(select(*columns).execution_options(yield_per=chunk_size))
+    daily, hourly = aggregate(row._mapping for row in result)
+
+    for model, rows in ((DailySalesRollup, daily), (HourlySalesRollup, hourly)):
+        rows = list(rows.values())
+        for i in range(0, len(rows), chunk_size):
+            executor.execute(insert(model), rows[i:i + chunk_size])
+
+    logger.info(f"Rebuilt {len(daily)} daily and {len(hourly)} hourly rollup rows")
+    return len(daily)
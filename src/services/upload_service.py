@@ -0,0 +1,447 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+import weakref
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from src.config.settings import settings
+from src.models.upload import Upload
+from src.services.data_version_service import bump_data_versions
+from src.utils.shared_state import get_shared_state
+from src.utils.status_monitor import ProcessingMonitor, TERMINAL_STATUSES, ingest_monitors
+
+logger = logging.getLogger(__name__)
+
+# Upload states in which a file counts as already received for dedup
+ACCEPTED_STATUSES = ("queued", "processing", "completed")
+
+class UploadTooLarge(ValueError):
+    """The upload is bigger than the allowed size."""
+
+def check_filename(filename: Optional[str]) -> str:
+    """Get the base name of an uploaded file, rejecting disallowed extensions."""
+    name = os.path.basename(filename or "")
+    if os.path.splitext(name)[1].lower() not in settings.allowed_extensions:
+        raise ValueError(f"Only {', '.join(sorted(settings.allowed_extensions))} files are accepted")
+    return name
+
+def parse_upload_metadata(header: str) -> Dict[str, str]:
+    """Parse a tus Upload-Metadata header ("key base64value,...")."""
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in header.split(","))):
+        key, _, value = pair.partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value).decode() if value else ""
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError(f"Invalid Upload-Metadata value for {key}")
+    return metadata
+
+async def write_chunks(
+    chunks: AsyncIterator[bytes],
+    path: str,
+    limit: int,
+    offset: int = 0,
+    hasher: Optional[Any] = None
+) -> int:
+    """Append a request body to a file and return the number of bytes written.
+
+    Chunks are collected into a buffer of settings.upload_chunk_size bytes
+    that is written from a worker thread, so memory stays constant whatever
+    the file size. Raises UploadTooLarge as soon as the file would grow past
+    limit; any other error (e.g. a client disconnect) still writes what was
+    received so a resumable upload can continue from there.
+    """
+    written = 0
+    buffer = bytearray()
+    with open(path, "ab") as handle:
+        try:
+            async for chunk in chunks:
+                written += len(chunk)
+                if offset + written > limit:
+                    raise UploadTooLarge(f"File exceeds the maximum size of {limit} bytes")
+                if hasher is not None:
+                    hasher.update(chunk)
+                buffer += chunk
+                if len(buffer) >= settings.upload_chunk_size:
+                    await run_in_threadpool(handle.write, bytes(buffer))
+                    buffer.clear()
+        finally:
+            if buffer and offset + written <= limit:
+                await run_in_threadpool(handle.write, bytes(buffer))
+    return written
+
+def file_sha256(path: str) -> str:
+    """Hash a file a chunk at a time."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(settings.upload_chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def count_csv_rows(path: str) -> int:
+    """Estimate the data rows of a CSV file by counting line breaks."""
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(settings.upload_chunk_size), b""):
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+def received_bytes(upload: Upload) -> int:
+    """Bytes of an upload stored so far; the file on disk is the source of truth."""
+    if upload.path and os.path.exists(upload.path):
+        return os.path.getsize(upload.path)
+    return upload.received or 0
+
+def _touch(db: Session, upload: Upload) -> None:
+    """Bump the uploader's upload version so upload history ETags change with the status.
+
+    This is kept apart from the owner's data version: analytics and data
+    validators only change once rows are loaded (see invalidate_user_data).
+    """
+    bump_data_versions(db, [f"uploads:{upload.user_id}"])
+
+def _remove_file(upload: Upload) -> None:
+    if upload.path and os.path.exists(upload.path):
+        os.remove(upload.path)
+    upload.path = None
+
+_upload_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def upload_lock(upload_id: int) -> asyncio.Lock:
+    """Lock that keeps two chunks of one resumable upload from being appended at once."""
+    lock = _upload_locks.get(upload_id)
+    if lock is None:
+        lock = _upload_locks[upload_id] = asyncio.Lock()
+    return lock
+
+def serialize_upload(upload: Upload) -> Dict[str, Any]:
+    """Convert an upload row into its API representation."""
+    return {
+        "id": upload.id,
+        "filename": upload.filename,
+        "status": upload.status,
+        "size": upload.size,
+        "received": upload.received,
+        "sha256": upload.sha256,
+        "duplicate_of": upload.duplicate_of,
+        "upload_date": upload.created_at.isoformat() if upload.created_at else None,
+        "completed_at": upload.completed_at.isoformat() if upload.completed_at else None,
+        "record_count": upload.records_processed,
+        "total_sales": upload.total_sales,
+        "error": upload.error
+    }
+
+class UploadService:
+    """Service for recording uploaded files."""
+
+    def __init__(self, db: Session):
+        """Initialize upload service."""
+        self.db = db
+
+    def create(self, user: dict, filename: str, size: Optional[int] = None) -> Upload:
+        """Start an upload with an empty file in settings.upload_dir."""
+        os.makedirs(settings.upload_dir, exist_ok=True)
+        upload = Upload(
+            user_id=user["id"],
+            filename=filename,
+            size=size,
+            path=os.path.join(settings.upload_dir, f"{uuid.uuid4().hex}.csv"),
+            status="receiving"
+        )
+        open(upload.path, "wb").close()
+        self.db.add(upload)
+        _touch(self.db, upload)
+        self.db.commit()
+        return upload
+
+    def get(self, user: dict, upload_id: int) -> Upload:
+        """Get one of the user's uploads."""
+        upload = self.db.get(Upload, upload_id)
+        if upload is None or (upload.user_id != user["id"] and user["role"] != "admin"):
+            raise LookupError(f"Upload {upload_id} not found")
+        return upload
+
+    def read(self, user: dict, upload_id: int) -> Dict[str, Any]:
+        """Get one of the user's uploads serialized, ending the read transaction.
+
+        Long-lived callers such as event streams poll with this so the
+        session holds no connection between polls.
+        """
+        try:
+            return serialize_upload(self.get(user, upload_id))
+        finally:
+            self.db.rollback()
+
+    def record_progress(self, upload: Upload, received: int) -> None:
+        upload.received = received
+        _touch(self.db, upload)
+        self.db.commit()
+
+    def complete(self, upload: Upload, sha256: str, size: int) -> Upload:
+        """Queue a fully received file, unless the user already uploaded the same content."""
+        upload.sha256 = sha256
+        upload.received = size
+        upload.size = upload.size or size
+        earlier = self.db.query(Upload.id).filter(
+            Upload.user_id == upload.user_id,
+            Upload.sha256 == sha256,
+            Upload.id != upload.id,
+            Upload.status.in_(ACCEPTED_STATUSES)
+        ).order_by(Upload.id).first()
+        if earlier:
+            upload.status = "duplicate"
+            upload.duplicate_of = earlier.id
+            upload.completed_at = datetime.utcnow()
+            _remove_file(upload)
+            logger.info(f"Upload {upload.id} duplicates upload {earlier.id}")
+        else:
+            upload.status = "queued"
+        _touch(self.db, upload)
+        self.db.commit()
+        return upload
+
+    def discard(self, upload: Upload, reason: str) -> None:
+        """Mark an upload failed and delete its file."""
+        upload.status = "failed"
+        upload.error = reason
+        upload.completed_at = datetime.utcnow()
+        _remove_file(upload)
+        _touch(self.db, upload)
+        self.db.commit()
+
+    def history(self, user: dict, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get the user's most recent uploads."""
+        uploads = self.db.query(Upload).filter(Upload.user_id == user["id"]).order_by(
+            Upload.created_at.desc(), Upload.id.desc()
+        ).limit(limit)
+        return [serialize_upload(upload) for upload in uploads]
+
+def ingest_upload(
+    upload_id: int,
+    session_factory: Optional[Callable[[], Session]] = None,
+    monitor: Optional[ProcessingMonitor] = None
+) -> None:
+    """Load a queued upload into the transactions table and record the outcome.
+
+    Runs on a worker thread with its own session, reporting progress on
+    monitor. The upload row is committed before the monitor finishes, so
+    a client that sees the final event reads the final status. The job is
+    claimed with a conditional update, so when several server workers
+    submit the same queued upload only one of them loads it; with shared
+    state enabled its progress is published for the other workers.
+    """
+    # pandas is only needed once a file is loaded
+    from src.services.etl_service import ETLService
+    from src.db.engines import registry
+
+    monitor = monitor or ProcessingMonitor(upload_id)
+    db = (session_factory or registry.session)()
+    store = get_shared_state()
+    publish = None
+    try:
+        claimed = db.execute(
+            update(Upload)
+            .where(Upload.id == upload_id, Upload.status == "queued")
+            .values(status="processing")
+        ).rowcount
+        upload = db.get(Upload, upload_id)
+        if not claimed:
+            db.rollback()
+            monitor.finish(upload.status if upload is not None else "failed")
+            return
+        _touch(db, upload)
+        db.commit()
+
+        if store is not None:
+            def publish():
+                try:
+                    store.publish_progress(upload_id, monitor.get_progress())
+                except sqlite3.Error as e:
+                    logger.warning(f"Publishing progress of upload {upload_id} failed: {str(e)}")
+            monitor.add_listener(publish)
+        monitor.start(count_csv_rows(upload.path))
+
+        try:
+            result = ETLService(db).load_csv(upload.path, upload.user_id, monitor)
+        except Exception as e:
+            logger.error(f"Error loading upload {upload_id}: {str(e)}")
+            upload.status = "failed"
+            upload.error = str(e)
+            upload.completed_at = datetime.utcnow()
+            _touch(db, upload)
+            db.commit()
+            monitor.finish("failed", str(e))
+            return
+
+        upload.status = "completed"
+        upload.records_processed = result["records_processed"]
+        upload.total_sales = result["total_sales"]
+        upload.completed_at = datetime.utcnow()
+        _remove_file(upload)
+        _touch(db, upload)
+        db.commit()
+        monitor.finish("completed")
+        logger.info(f"Loaded {result['records_processed']} records from upload {upload_id}")
+    finally:
+        if publish is not None:
+            monitor.remove_listener(publish)
+            try:
+                store.remove_progress(upload_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Removing progress of upload {upload_id} failed: {str(e)}")
+        db.close()
+
+def queued_upload_ids(session_factory: Optional[Callable[[], Session]] = None) -> List[int]:
+    """Ids of uploads received but not loaded yet, oldest first."""
+    from src.db.engines import registry
+
+    db = (session_factory or registry.session)()
+    try:
+        return list(db.scalars(
+            select(Upload.id).where(Upload.status == "queued").order_by(Upload.id)
+        ))
+    finally:
+        db.close()
+
+class IngestQueue:
+    """Loads received uploads in the background, settings.ingest_concurrency at a time.
+
+    Uploads stay "queued" in the database until a load starts, so jobs
+    not started before shutdown are picked up by resume() on the next
+    start, by whichever worker claims them first.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self.session_factory = session_factory
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._closing = False
+
+    def submit(self, upload_id: int) -> asyncio.Task:
+        """Queue an upload for loading and return its task."""
+        ingest_monitors.create(upload_id).update_status("queued")
+        task = asyncio.get_running_loop().create_task(self._run(upload_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, upload_id: int) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(settings.ingest_concurrency, 1))
+        try:
+            async with self._semaphore:
+                if self._closing:
+                    return
+                await run_in_threadpool(
+                    ingest_upload, upload_id, self.session_factory, ingest_monitors.get(upload_id)
+                )
+        finally:
+            ingest_monitors.discard(upload_id)
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self, timeout: Optional[float] = None) -> int:
+        """Wait for queued and running loads; returns how many are still unfinished."""
+        if not self._tasks:
+            return 0
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        return len(pending)
+
+    async def resume(self) -> int:
+        """Submit uploads left queued by an earlier run; returns how many."""
+        self._closing = False
+        upload_ids = await run_in_threadpool(queued_upload_ids, self.session_factory)
+        for upload_id in upload_ids:
+            self.submit(upload_id)
+        return len(upload_ids)
+
+    async def shutdown(self, timeout: Optional[float] = None) -> int:
+        """Stop starting loads and wait for the running ones; returns how many are still running."""
+        self._closing = True
+        return await self.drain(timeout)
+
+ingest_queue = IngestQueue()
+
+def progress_from_upload(upload: Dict[str, Any]) -> Dict[str, Any]:
+    """Progress event for an upload that has no monitor in this process."""
+    return {
+        "job_id": upload["id"],
+        "status": upload["status"],
+        "rows_loaded": upload["record_count"],
+        "received": upload["received"],
+        "size": upload["size"],
+        "error": upload["error"]
+    }
+
+def format_event(data: Dict[str, Any], event: str = "progress") -> bytes:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+async def progress_events(
+    upload_id: int,
+    read_upload: Callable[[], Awaitable[Dict[str, Any]]],
+    interval: Optional[float] = None,
+    keepalive: Optional[float] = None
+) -> AsyncIterator[bytes]:
+    """Stream the progress of an upload as server-sent events until it is done.
+
+    While the ingest job runs in this process, events follow its monitor
+    but are coalesced: after a change the stream waits ``interval``
+    seconds and then sends only the latest state. While another worker
+    runs it, the progress it publishes to the shared state is polled
+    every ``interval``. Otherwise the upload row is re-read every
+    settings.progress_poll_seconds. A comment line is sent
+    after ``keepalive`` seconds without events so proxies keep the
+    connection open.
+    """
+    interval = settings.progress_event_interval_ms / 1000 if interval is None else interval
+    keepalive = settings.progress_keepalive_seconds if keepalive is None else keepalive
+    store = get_shared_state()
+    last = None
+    version = -1
+    idle = 0.0
+    while True:
+        monitor = ingest_monitors.get(upload_id)
+        shared = None
+        if monitor is not None:
+            version = monitor.version
+            progress = monitor.get_progress()
+        else:
+            if store is not None:
+                shared = await run_in_threadpool(store.get_progress, upload_id)
+            progress = shared or progress_from_upload(await read_upload())
+
+        if progress != last:
+            yield format_event(progress)
+            last = progress
+            idle = 0.0
+        elif idle >= keepalive:
+            yield b": keepalive\n\n"
+            idle = 0.0
+        if progress["status"] in TERMINAL_STATUSES:
+            return
+
+        started = time.monotonic()
+        if monitor is not None:
+            await monitor.wait_for_change(version, keepalive)
+            await asyncio.sleep(interval)
+        elif shared is not None:
+            await asyncio.sleep(interval)
+        else:
+            await asyncio.sleep(max(interval, settings.progress_poll_seconds))
+        idle += time.monotonic() - started
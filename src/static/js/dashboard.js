@@ -158,34 +158,13 @@ function nextPage() {
 }
 
 // Export data
-function exportData() {
-  fetch("/api/export")
-    .then((response) => response.json())
-    .then((data) => {
-      // Convert to CSV
-      const headers = Object.keys(data[0]);
-      const csv = [
-        headers.join(","),
-        ...data.map((row) =>
-          headers.map((header) => JSON.stringify(row[header])).join(",")
-        ),
-      ].join("\n");
-
-      // Download file
-      const blob = new Blob([csv], { type: "text/csv" });
-      const url = window.URL.createObjectURL(blob);
-      const a = document.createElement("a");
-      a.href = url;
-      a.download = `transactions_${new Date().toISOString().split("T")[0]}.csv`;
-      document.body.appendChild(a);
-      a.click();
-      window.URL.revokeObjectURL(url);
-      document.body.removeChild(a);
-    })
-    .catch((error) => {
-      console.error("Error exporting data:", error);
-      alert("Error exporting data: " + error.message);
-    });
+function exportData(format = "csv") {
+  // The server streams the file, so let the browser download it directly
+  const a = document.createElement("a");
+  a.href = `/api/export?format=${format}`;
+  document.body.appendChild(a);
+  a.click();
+  document.body.removeChild(a);
 }
 
 // Run ETL process
@@ -1,14 +1,29 @@
+import os
+import tempfile
+
+# Anything that reaches the default engines writes to a throwaway database,
+# never to one in the working tree; set before the settings are imported
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='pos_tests_')}/app.db")
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
-import os
-import tempfile
 from datetime import datetime
 
 from src.models.pos_transaction import Base
 from src.models.user import User
-from src.utils.auth import get_password_hash
+from src.repositories.user_repository import user_cache
+from src.utils.auth import claims_cache, get_password_hash
+from src.utils.cache import result_cache
+
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    """Keep cached results and users from leaking between tests."""
+    result_cache.clear()
+    user_cache.clear()
+    claims_cache.clear()
+    yield
 
 @pytest.fixture(scope="session")
 def engine():
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from src.config.settings import settings
+from src.db.base import Base
+from src.db.engines import EngineRegistry
+from src.db.init_db import get_async_read_db
+from src.main import app as main_router
+from src.models.pos_transaction import POSTransaction
+from src.models.user import User
+from src.repositories.analytics_repository import AsyncAnalyticsRepository
+from src.repositories.transaction_repository import AsyncTransactionRepository
+from src.repositories.user_repository import AsyncUserRepository
+from src.services.analytics_service import AnalyticsService
+from src.services.data_service import DataService
+from src.services.rollup_service import apply_rollups, transaction_values
+from src.utils.cache import ResultCache, SQLiteCacheBackend
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = EngineRegistry(f"sqlite:///{tmp_path / 'app.db'}", replica_url="")
+    Base.metadata.create_all(bind=registry.writer())
+    with registry.session() as db:
+        db.add(User(username="cashier", password_hash="x", role="user"))
+        db.flush()
+        user_id = db.query(User.id).scalar()
+        rows = [
+            POSTransaction(
+                user_id=user_id, store_code=f"S{i % 2}", store_display_name=f"Store {i % 2}",
+                trans_date=datetime(2024, 1, 1 + i % 4), trans_time="12:00", trans_no=f"T{i}",
+                net_sales_header_values=5.0 * i, quantity=1, tender="CASH"
+            )
+            for i in range(10)
+        ]
+        db.add_all(rows)
+        db.flush()
+        apply_rollups(db, [transaction_values(row) for row in rows])
+        db.commit()
+    yield registry
+    asyncio.run(registry.dispose())
+
+def test_async_repositories_match_sync_services(registry):
+    async def read():
+        async with registry.async_read_session() as db:
+            user = await AsyncUserRepository(db).get_by_username("cashier")
+            scope = {"id": user.id, "role": user.role}
+            analytics = await AsyncAnalyticsRepository(db).get_analytics(scope)
+            page = await AsyncTransactionRepository(db).get_page(scope, 1, 5)
+            keyset = await AsyncTransactionRepository(db).get_keyset_page(scope, None, 5)
+            return scope, analytics, page, keyset
+
+    scope, analytics, page, keyset = asyncio.run(read())
+    with registry.read_session() as db:
+        assert analytics == AnalyticsService(db).get_analytics(scope)
+        assert page == DataService(db).get_page(scope, 1, 5)
+        assert keyset["data"] == page["data"]
+
+def test_concurrent_dashboard_requests_share_one_loop(registry):
+    async def override_get_async_read_db():
+        async with registry.async_read_session() as session:
+            yield session
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def fake_session(request: Request, call_next):
+        request.scope["session"] = {"user": {"id": 1, "role": "user"}}
+        return await call_next(request)
+
+    app.include_router(main_router)
+    app.dependency_overrides[get_async_read_db] = override_get_async_read_db
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.get("/api/analytics" if i % 2 else f"/api/data?page={i % 3 + 1}&per_page=4")
+                for i in range(30)
+            ])
+
+    responses = asyncio.run(burst())
+    assert [response.status_code for response in responses] == [200] * 30
+    assert responses[1].json()["summary"]["total_transactions"] == 10
+
+def test_duckdb_and_disk_cache_work_runs_off_the_event_loop(registry, tmp_path, monkeypatch):
+    pytest.importorskip("duckdb")
+    from src.services.columnar_analytics import ColumnarAnalyticsStore
+
+    store = ColumnarAnalyticsStore(":memory:")
+    cache = ResultCache(SQLiteCacheBackend(str(tmp_path / "cache.db"), 100))
+    monkeypatch.setattr(settings, "analytics_backend", "duckdb")
+    monkeypatch.setattr("src.services.analytics_service.columnar_store", store)
+    monkeypatch.setattr("src.services.analytics_service.result_cache", cache)
+
+    threads = []
+    def record(method):
+        def recorded(*args):
+            threads.append(threading.get_ident())
+            return method(*args)
+        return recorded
+
+    for target, name in ((store, "_stage"), (store, "_query"), (cache.backend, "get"), (cache.backend, "set")):
+        monkeypatch.setattr(target, name, record(getattr(target, name)))
+
+    async def analytics(scope):
+        async with registry.async_read_session() as db:
+            return await AsyncAnalyticsRepository(db).get_analytics(scope)
+
+    async def read():
+        # Both refreshes wait on the store's lock while one of them awaits its SQL
+        return threading.get_ident(), await asyncio.gather(
+            analytics({"id": 1, "role": "user"}), analytics({"id": 1, "role": "admin"})
+        )
+
+    loop_thread, results = asyncio.run(read())
+    assert threads and loop_thread not in threads
+    with registry.read_session() as db:
+        assert results[0] == AnalyticsService(db).get_analytics({"id": 1, "role": "user"})
+    assert results[1]["summary"]["total_transactions"] == 10
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI
+from jose import jwt
+from sqlalchemy import event
+from starlette.middleware.sessions import SessionMiddleware
+
+from src.config.settings import settings
+from src.main import app as main_router, get_user_repository
+from src.models.user import User
+from src.repositories.user_repository import UserRepository
+from src.utils.auth import (
+    create_access_token, decode_token, get_password_hash, password_hash_metrics, verify_password_async
+)
+
+class StaticUserRepository:
+    def __init__(self, user):
+        self.user = user
+
+    async def get_by_username(self, username):
+        return self.user if username == self.user.username else None
+
+def test_verify_password_async():
+    hashed = get_password_hash("secret")
+    assert asyncio.run(verify_password_async("secret", hashed)) is True
+    assert asyncio.run(verify_password_async("wrong", hashed)) is False
+
+def test_health_stays_responsive_during_login_burst():
+    user = SimpleNamespace(id=1, username="cashier", role="user", password_hash=get_password_hash("pass"))
+    app = FastAPI()
+    app.add_middleware(SessionMiddleware, secret_key="test")
+    app.include_router(main_router)
+    app.dependency_overrides[get_user_repository] = lambda: StaticUserRepository(user)
+    password_hash_metrics.reset()
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            logins = [
+                asyncio.create_task(client.post("/login", data={"username": "cashier", "password": "pass"}))
+                for _ in range(8)
+            ]
+            await asyncio.sleep(0.05)
+            # Logins still unfinished when each health check was answered
+            pending = []
+            while not all(task.done() for task in logins):
+                assert (await client.get("/api/health")).status_code == 200
+                pending.append(sum(not task.done() for task in logins))
+                await asyncio.sleep(0.02)
+            return [task.result() for task in logins], pending
+
+    responses, pending = asyncio.run(burst())
+    assert [response.status_code for response in responses] == [303] * 8
+    # Health checks are answered while logins still queue for the bcrypt
+    # threads, not after them
+    assert len(pending) >= 2
+    assert pending[0] > settings.password_hash_workers
+
+    metrics = password_hash_metrics.snapshot()
+    assert metrics["operations"]["verify"]["count"] == 8
+    assert metrics["max_waiting"] > 0
+
+def test_claims_cache_expires_at_token_exp(monkeypatch):
+    token = create_access_token({"sub": "user1"}, expires_delta=timedelta(minutes=5))
+    payload = decode_token(token)
+
+    decodes = []
+    real_decode = jwt.decode
+    def counting_decode(*args, **kwargs):
+        decodes.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr("jose.jwt.decode", counting_decode)
+    assert decode_token(token) == payload
+    assert decodes == []
+
+    monkeypatch.setattr("src.utils.auth.time", SimpleNamespace(time=lambda: payload["exp"]))
+    decode_token(token)
+    assert decodes == [token]
+
+def test_user_lookups_are_cached_until_changed(db):
+    db.add(User(username="cached", password_hash="x", role="user"))
+    db.commit()
+    repository = UserRepository(db)
+    user = repository.get_by_username("cached")
+
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        assert repository.get_by_username("cached") is user
+        assert repository.get_by_id(user.id).role == "user"
+        assert statements == []
+
+        user.role = "manager"
+        repository.update(user)
+        statements.clear()
+        assert UserRepository(db).get_by_id(user.id).role == "manager"
+        assert statements
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
+        repository.delete(user)
@@ -0,0 +1,87 @@
+import time
+import pytest
+
+from src.services.analytics_service import get_cache_scope
+from src.utils.cache import MemoryCacheBackend, SQLiteCacheBackend, ResultCache
+
+USER = {"id": 3, "role": "user"}
+OTHER_USER = {"id": 4, "role": "user"}
+MANAGER = {"id": 2, "role": "manager"}
+ADMIN = {"id": 1, "role": "admin"}
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCacheBackend(max_entries=3)
+    return SQLiteCacheBackend(str(tmp_path / "cache.db"), max_entries=3)
+
+def test_lru_eviction(backend):
+    for key in ("a", "b", "c"):
+        backend.set(key, {"value": key}, set(), ttl=60)
+    assert backend.get("a") == {"value": "a"}
+    time.sleep(0.01)
+    backend.set("d", {"value": "d"}, set(), ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == {"value": "a"}
+
+def test_ttl_expiry(backend):
+    backend.set("a", {"value": 1}, set(), ttl=-1)
+    assert backend.get("a") is None
+
+def test_tag_invalidation(backend):
+    backend.set("a", {"value": 1}, {"owner:1"}, ttl=60)
+    backend.set("b", {"value": 2}, {"owner:2"}, ttl=60)
+    assert backend.invalidate_tags({"owner:1"}) == 1
+    assert backend.get("a") is None
+    assert backend.get("b") == {"value": 2}
+
+def test_sqlite_backend_is_shared(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SQLiteCacheBackend(path, 10).set("a", {"value": 1}, {"owner:1"}, ttl=60)
+    other_worker = SQLiteCacheBackend(path, 10)
+    assert other_worker.get("a") == {"value": 1}
+    other_worker.invalidate_tags({"owner:1"})
+    assert SQLiteCacheBackend(path, 10).get("a") is None
+
+def _cache_all(cache):
+    for user in (USER, OTHER_USER, MANAGER, ADMIN):
+        scope, tags = get_cache_scope(user)
+        cache.get_or_compute("analytics", scope, tags, {}, lambda: {"scope": scope})
+
+def _cached_scopes(cache):
+    scopes = set()
+    for user in (USER, OTHER_USER, MANAGER, ADMIN):
+        scope, _ = get_cache_scope(user)
+        if cache.backend.get(cache.make_key("analytics", scope, {})) is not None:
+            scopes.add(scope)
+    return scopes
+
+def test_upload_by_user_invalidates_only_affected_scopes():
+    cache = ResultCache(MemoryCacheBackend(100), ttl=60)
+    _cache_all(cache)
+    # What invalidate_user_data computes for an upload by a regular user
+    cache.invalidate({"owner:*", "owner:3", "role:user"})
+    assert _cached_scopes(cache) == {"user:4"}
+
+def test_upload_by_manager_keeps_user_scopes():
+    cache = ResultCache(MemoryCacheBackend(100), ttl=60)
+    _cache_all(cache)
+    cache.invalidate({"owner:*", "owner:2", "role:manager"})
+    assert _cached_scopes(cache) == {"user:3", "user:4"}
+
+def test_get_or_compute_counts_hits():
+    cache = ResultCache(MemoryCacheBackend(100), ttl=60)
+    calls = []
+    for _ in range(3):
+        cache.get_or_compute("data", "user:3", {"owner:3"}, {"page": 1}, lambda: calls.append(1) or {"n": 1})
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_a_new_data_version_misses_entries_of_the_old_one():
+    cache = ResultCache(MemoryCacheBackend(100), ttl=60)
+    calls = []
+    for version in (1, 1, 2):
+        cache.get_or_compute(
+            "data", "user:3", {"owner:3"}, {"page": 1}, lambda: calls.append(version) or {"n": version}, version
+        )
+    assert calls == [1, 2]
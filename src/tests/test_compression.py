@@ -0,0 +1,124 @@
+import gzip
+import json
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.base import Base
+from src.db.init_db import get_read_db
+from src.main import app as main_router
+from src.models.pos_transaction import POSTransaction
+from src.services.analytics_service import columnar_analytics
+from src.utils.compression import CompressionMiddleware, choose_encoding, is_compressed_type
+
+ROWS = [{"date": f"2024-01-{day:02d}", "total": day * 10.5, "transaction_count": day} for day in range(1, 31)]
+
+def make_client():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/large")
+    async def large():
+        return {"daily_sales": ROWS}
+
+    @app.get("/small")
+    async def small():
+        return {"status": "ok"}
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse((f"row {i}\n" * 100 for i in range(5)), media_type="text/csv")
+
+    @app.get("/events")
+    async def events():
+        return StreamingResponse(iter(["data: 1\n\n" * 100]), media_type="text/event-stream")
+
+    @app.get("/encoded")
+    async def encoded():
+        body = gzip.compress(b"x" * 1000)
+        return StreamingResponse(iter([body]), headers={"Content-Encoding": "gzip"})
+
+    return TestClient(app)
+
+def test_large_responses_are_gzipped():
+    client = make_client()
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(json.dumps({"daily_sales": ROWS}))
+    assert response.json() == {"daily_sales": ROWS}
+    assert "Accept-Encoding" in response.headers["vary"]
+
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.text == "".join(f"row {i}\n" * 100 for i in range(5))
+
+def test_small_encoded_and_event_stream_responses_pass_through():
+    client = make_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+    encoded = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+    assert encoded.content == b"x" * 1000
+
+def test_gzip_export_is_not_compressed_twice():
+    # The export streams from a worker thread, so every thread shares the one in-memory connection
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        POSTransaction(
+            user_id=1, store_code="S001", trans_date=datetime(2024, 1, 1 + i % 28),
+            trans_time="10:00:00", trans_no=f"T{i}", net_sales_header_values=1.5 * i, quantity=1
+        )
+        for i in range(200)
+    ])
+    session.commit()
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.middleware("http")
+    async def fake_session(request: Request, call_next):
+        request.scope["session"] = {"user": {"id": 1, "role": "user"}}
+        return await call_next(request)
+
+    app.include_router(main_router)
+    app.dependency_overrides[get_read_db] = lambda: session
+    response = TestClient(app).get("/api/export?format=csv&gzip=true", headers={"Accept-Encoding": "gzip"})
+    session.close()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert "content-encoding" not in response.headers
+    assert gzip.decompress(response.content).decode().count("\n") == 201
+
+def test_compressed_types():
+    assert is_compressed_type("application/gzip")
+    assert is_compressed_type("application/vnd.apache.parquet")
+    assert is_compressed_type("image/png")
+    assert not is_compressed_type("image/svg+xml")
+    assert not is_compressed_type("text/csv; charset=utf-8")
+
+def test_choose_encoding_respects_zero_quality():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("") is None
+
+def test_columnar_analytics():
+    result = columnar_analytics({
+        "summary": {"total_sales": 1.0},
+        "sales_by_store": [],
+        "sales_by_tender": [{"tender": "CASH", "total": 1.0, "count": 1, "percentage": 100.0}],
+        "daily_sales": ROWS,
+        "sales_by_hour": []
+    })
+    assert result["format"] == "columns"
+    assert result["summary"] == {"total_sales": 1.0}
+    assert result["daily_sales"]["total"] == [row["total"] for row in ROWS]
+    assert result["sales_by_tender"] == {"tender": ["CASH"], "total": [1.0], "count": [1], "percentage": [100.0]}
+    assert result["sales_by_store"] == {}
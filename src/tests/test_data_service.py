@@ -0,0 +1,125 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.db.base import Base
+from src.db.sqlite import configure_sqlite_engine
+from src.models.pos_transaction import POSTransaction
+from src.models.sales_rollup import DailySalesRollup
+from src.services.data_service import DataService
+from src.services.data_version_service import get_data_version
+from src.services.rollup_service import apply_rollups, transaction_values
+
+USER = {"id": 5, "role": "user"}
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    rows = [
+        POSTransaction(
+            user_id=USER["id"],
+            store_code="S001",
+            store_display_name="Store 1",
+            trans_date=datetime(2024, 1, 1 + i % 3),
+            trans_time="10:00:00",
+            trans_no=f"T{i}",
+            net_sales_header_values=10.0 * i,
+            quantity=1,
+            tender="CASH" if i % 2 else "CARD"
+        )
+        for i in range(7)
+    ]
+    session.add_all(rows)
+    session.flush()
+    apply_rollups(session, [transaction_values(row) for row in rows])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def test_keyset_pages_match_offset_order(session):
+    service = DataService(session)
+    expected = [row["id"] for row in service.get_page(USER, 1, 100)["data"]]
+
+    seen, cursor = [], ""
+    while True:
+        page = service.get_keyset_page(USER, cursor, per_page=3)
+        seen += [row["id"] for row in page["data"]]
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+
+    assert seen == expected
+    assert page["next_cursor"] is None
+
+def test_keyset_totals(session):
+    service = DataService(session)
+    assert service.get_keyset_page(USER, None, 2, {"tender": "CASH"})["total"] == 3
+    assert service.get_keyset_page(USER, None, 2, {"tender": "CASH"}, total="none")["total"] is None
+
+    page = service.get_keyset_page(USER, None, 2, {"amount_range": "0-20"})
+    assert page["total_is_estimate"] is True
+    assert service.get_keyset_page(USER, None, 2, {"amount_range": "0-20"}, total="exact")["total"] == 3
+
+def test_cursor_is_bound_to_filters(session):
+    service = DataService(session)
+    cursor = service.get_keyset_page(USER, None, 2)["next_cursor"]
+    with pytest.raises(ValueError):
+        service.get_keyset_page(USER, cursor, 2, {"tender": "CASH"})
+    with pytest.raises(ValueError):
+        service.get_keyset_page(USER, cursor[:-2] + "xx", 2)
+
+def test_batched_clear_keeps_rollups_consistent(session, monkeypatch):
+    monkeypatch.setattr("src.services.data_service.settings.clear_batch_pause_seconds", 0)
+    other = POSTransaction(
+        user_id=6, store_code="S002", trans_date=datetime(2024, 1, 1),
+        trans_no="X1", net_sales_header_values=99.0, quantity=1, tender="CASH"
+    )
+    session.add(other)
+    session.flush()
+    apply_rollups(session, [transaction_values(other)])
+    session.commit()
+
+    assert DataService(session).clear(USER, batch_size=3) == 7
+    assert session.query(POSTransaction).filter(POSTransaction.user_id == USER["id"]).count() == 0
+    assert session.query(DailySalesRollup).filter(DailySalesRollup.user_id == USER["id"]).count() == 0
+    assert [(r.user_id, r.net_sales) for r in session.query(DailySalesRollup)] == [(6, 99.0)]
+
+def test_clear_failing_partway_invalidates_the_committed_batches(session, monkeypatch):
+    monkeypatch.setattr("src.services.data_service.settings.clear_batch_pause_seconds", 0)
+    service = DataService(session)
+    assert service.get_page(USER, 1, 100)["total"] == 7
+    version = get_data_version(session, ["owner:5"])[0]
+
+    calls = []
+    def apply_rollups_then_fail(db, rows, sign=1):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("disk I/O error")
+        apply_rollups(db, rows, sign)
+    monkeypatch.setattr("src.services.data_service.apply_rollups", apply_rollups_then_fail)
+
+    with pytest.raises(RuntimeError):
+        service.clear(USER, batch_size=3)
+    assert get_data_version(session, ["owner:5"])[0] > version
+    # The first batch is gone, and the cached page no longer shows it
+    assert service.get_page(USER, 1, 100)["total"] == 4
+
+def test_clear_releases_free_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.services.data_service.settings.clear_batch_pause_seconds", 0)
+    engine = configure_sqlite_engine(create_engine(f"sqlite:///{tmp_path / 'clear.db'}"))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        POSTransaction(user_id=USER["id"], trans_no=f"T{i}", store_display_name="x" * 200)
+        for i in range(2000)
+    ])
+    session.commit()
+
+    DataService(session).clear(USER, batch_size=500)
+    assert session.execute(text("PRAGMA freelist_count")).scalar() == 0
+    session.close()
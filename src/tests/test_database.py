@@ -0,0 +1,157 @@
+import asyncio
+
+import bson
+from bson.raw_bson import RawBSONDocument
+from pymongo import InsertOne, UpdateOne
+
+from src.config.settings import settings
+from src.db.database import (
+    RAW_TRANSACTION_PROJECTION, chunk_by_limits, mongodb, _available_compressors, _write_op_size
+)
+from src.services.data_sync_service import DataSyncService
+
+RAW_DOCS = [
+    {"_id": i, "store_code": f"S{i}", "quantity": i, "processed": False, "payload": "x" * 100}
+    for i in range(5)
+]
+
+class FakeCursor:
+    """The parts of a Motor cursor the raw transaction reads use."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.limit_value = 0
+        self.batch_size_value = None
+
+    def limit(self, limit):
+        self.limit_value = limit
+        return self
+
+    def batch_size(self, batch_size):
+        self.batch_size_value = batch_size
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs[:self.limit_value or None]:
+            yield doc
+
+class FakeCollection:
+    def __init__(self, docs, document_class=dict):
+        self.docs = docs
+        self.document_class = document_class
+        self.queries = []
+        self.cursors = []
+
+    def with_options(self, codec_options):
+        raw = FakeCollection(self.docs, codec_options.document_class)
+        raw.queries, raw.cursors = self.queries, self.cursors
+        return raw
+
+    def find(self, query, projection):
+        self.queries.append((query, projection))
+        docs = [
+            {key: value for key, value in doc.items() if key == "_id" or key in projection}
+            for doc in self.docs if all(doc.get(key) == value for key, value in query.items())
+        ]
+        if self.document_class is RawBSONDocument:
+            docs = [RawBSONDocument(bson.encode(doc)) for doc in docs]
+        cursor = FakeCursor(docs)
+        self.cursors.append(cursor)
+        return cursor
+
+def _use_collection(monkeypatch, collection):
+    async def get_collection():
+        return collection
+    monkeypatch.setattr(mongodb, "_get_collection", get_collection)
+
+def test_chunk_by_op_count():
+    batches = list(chunk_by_limits(range(10), lambda _: 1, max_ops=4))
+    assert [len(b) for b in batches] == [4, 4, 2]
+
+def test_chunk_by_bytes():
+    docs = [{"trans_no": f"T-{i}", "payload": "x" * 100} for i in range(10)]
+    doc_size = len(bson.encode(docs[0]))
+    batches = list(chunk_by_limits(docs, lambda d: len(bson.encode(d)), max_bytes=doc_size * 3))
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+
+def test_oversized_item_gets_own_batch():
+    batches = list(chunk_by_limits([1, 50, 1], lambda n: n, max_bytes=10))
+    assert batches == [[1], [50], [1]]
+
+def test_write_op_size():
+    assert _write_op_size(InsertOne({"a": 1})) == len(bson.encode({"a": 1}))
+    update = UpdateOne({"a": 1}, {"$set": {"b": 2}})
+    assert _write_op_size(update) == len(bson.encode({"a": 1})) + len(bson.encode({"$set": {"b": 2}}))
+
+def test_unknown_compressors_are_dropped():
+    assert _available_compressors("zlib, bogus") == ["zlib"]
+    assert _available_compressors("") == []
+
+def test_index_matches_spec():
+    from src.db.mongo_indexes import _index_matches
+    spec = {"name": "store_trans_no_uniq", "keys": [("store_code", 1), ("trans_no", 1)], "options": {"unique": True}}
+    info = {"key": [("store_code", 1.0), ("trans_no", 1.0)], "unique": True, "v": 2}
+    assert _index_matches(info, spec)
+    assert not _index_matches({**info, "unique": False}, spec)
+    assert not _index_matches({"key": [("store_code", 1)], "unique": True}, spec)
+
+def test_summarize_plan_detects_collection_scan():
+    from src.db.mongo_indexes import summarize_plan
+    ixscan = {"queryPlanner": {"winningPlan": {
+        "stage": "FETCH",
+        "inputStage": {"stage": "IXSCAN", "indexName": "unprocessed_idx"},
+    }}}
+    assert summarize_plan(ixscan) == {
+        "collection_scan": False, "indexes": ["unprocessed_idx"], "stages": ["FETCH", "IXSCAN"]
+    }
+    collscan = {"queryPlanner": {"winningPlan": {"queryPlan": {"stage": "COLLSCAN"}}}}
+    assert summarize_plan(collscan)["collection_scan"]
+
+def test_unprocessed_transactions_are_projected_and_streamed(monkeypatch):
+    collection = FakeCollection(RAW_DOCS)
+    _use_collection(monkeypatch, collection)
+
+    async def read(**kwargs):
+        return [doc async for doc in mongodb.iter_unprocessed_transactions(**kwargs)]
+
+    docs = asyncio.run(read(limit=3, batch_size=2))
+    assert [doc["_id"] for doc in docs] == [0, 1, 2]
+    assert "payload" not in docs[0]
+    assert collection.queries[0] == ({"processed": False}, RAW_TRANSACTION_PROJECTION)
+    assert collection.cursors[0].batch_size_value == 2
+
+    # Without a batch size the cursor uses the configured one
+    assert len(asyncio.run(read())) == 5
+    assert collection.cursors[1].batch_size_value == settings.mongodb_cursor_batch_size
+
+def test_unprocessed_columns_are_decoded_from_raw_bson(monkeypatch):
+    collection = FakeCollection(RAW_DOCS)
+    _use_collection(monkeypatch, collection)
+    monkeypatch.setattr(settings, "mongodb_cursor_batch_size", 2)
+
+    columns = asyncio.run(mongodb.get_unprocessed_columns(batch_size=4, fields=("store_code", "quantity", "tender")))
+    assert columns == {
+        "_id": [0, 1, 2, 3],
+        "store_code": ["S0", "S1", "S2", "S3"],
+        "quantity": [0, 1, 2, 3],
+        "tender": [None] * 4,
+    }
+    assert collection.queries[0][1] == {"store_code": 1, "quantity": 1, "tender": 1}
+    assert (collection.cursors[0].limit_value, collection.cursors[0].batch_size_value) == (4, 2)
+
+def test_sync_streams_the_backlog_in_cursor_batches(monkeypatch):
+    _use_collection(monkeypatch, FakeCollection(RAW_DOCS))
+    groups = []
+
+    async def sync_group(self, transactions):
+        groups.append([record["_id"] for record in transactions])
+        return len(transactions), 0
+
+    monkeypatch.setattr(DataSyncService, "_sync_group", sync_group)
+    service = DataSyncService(db=None)
+    assert asyncio.run(service.sync_transactions(batch_size=0, cursor_batch_size=2)) == {"synced": 5, "errors": 0}
+    assert groups == [[0, 1], [2, 3], [4]]
+
+    groups.clear()
+    assert asyncio.run(service.sync_transactions(batch_size=3, cursor_batch_size=2)) == {"synced": 3, "errors": 0}
+    assert groups == [[0, 1], [2]]
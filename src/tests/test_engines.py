@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError, TimeoutError
+
+from src.config.settings import settings
+from src.db.engines import EngineRegistry, to_async_url
+from src.db.sqlite import configure_sqlite_engine, is_sqlite_file, read_only_url
+
+def test_read_only_url():
+    assert read_only_url("sqlite:////data/app.db") == "sqlite:///file:/data/app.db?mode=ro&uri=true"
+    assert read_only_url("sqlite://") == "sqlite://"
+    assert read_only_url("postgresql://db/pos") == "postgresql://db/pos"
+    assert not is_sqlite_file("sqlite:///:memory:")
+
+def test_readers_see_commits_but_cannot_write(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    writer = configure_sqlite_engine(create_engine(url))
+    reader = configure_sqlite_engine(create_engine(read_only_url(url)), read_only=True)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    with reader.connect() as read_conn:
+        read_conn.execute(text("SELECT COUNT(*) FROM t")).scalar()
+        # An open read does not block the writer in WAL mode
+        with writer.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (1)"))
+        read_conn.rollback()
+        assert read_conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+        with pytest.raises(OperationalError):
+            read_conn.execute(text("INSERT INTO t VALUES (2)"))
+
+def test_writer_pool_queues_concurrent_writes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    writer = configure_sqlite_engine(create_engine(url, pool_size=1, max_overflow=0, pool_timeout=5))
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    def insert_rows(offset):
+        for i in range(20):
+            with writer.begin() as conn:
+                conn.execute(text("INSERT INTO t VALUES (:x)"), {"x": offset + i})
+
+    threads = [threading.Thread(target=insert_rows, args=(n * 100,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with writer.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 80
+
+def test_to_async_url():
+    assert to_async_url("sqlite:///tmp/app.db") == "sqlite+aiosqlite:///tmp/app.db"
+    assert to_async_url("postgresql://u:p@db/pos") == "postgresql+asyncpg://u:p@db/pos"
+    assert to_async_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+def test_registry_shares_lazy_engines(tmp_path):
+    registry = EngineRegistry(f"sqlite:///{tmp_path / 'data' / 'app.db'}", replica_url="")
+    assert registry.get_metrics() == {}
+
+    writer = registry.writer()
+    assert registry.writer() is writer
+    assert writer.pool.size() == 1
+    with registry.session() as db:
+        db.execute(text("CREATE TABLE t (x INTEGER)"))
+        db.execute(text("INSERT INTO t VALUES (1)"))
+        db.commit()
+
+    with registry.read_session() as db:
+        assert db.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+    assert "mode=ro" in str(registry.reader().url)
+
+    async def count():
+        async with registry.async_session() as db:
+            return (await db.execute(text("SELECT COUNT(*) FROM t"))).scalar()
+
+    assert asyncio.run(count()) == 1
+    asyncio.run(registry.dispose())
+
+    metrics = registry.get_metrics()
+    assert set(metrics) == {"writer", "reader", "async_writer"}
+    assert metrics["writer"]["checked_out"] >= 1
+    assert metrics["reader"]["connections_created"] == 1
+    assert metrics["writer"]["in_use"] == 0
+
+def test_sync_and_async_writers_take_turns(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "writer_queue_timeout", 1)
+    registry = EngineRegistry(f"sqlite:///{tmp_path / 'app.db'}", replica_url="")
+    with registry.session() as db:
+        db.execute(text("CREATE TABLE t (x INTEGER)"))
+        db.commit()
+
+    async def write_async(x):
+        async with registry.async_session() as db:
+            await db.execute(text("INSERT INTO t VALUES (:x)"), {"x": x})
+            await db.commit()
+
+    async def while_sync_writes():
+        with registry.session() as db:
+            db.execute(text("INSERT INTO t VALUES (1)"))
+            task = asyncio.create_task(write_async(2))
+            await asyncio.sleep(0.2)
+            # The async write waits for the lock without taking its connection
+            assert not task.done()
+            assert registry.get_metrics()["async_writer"]["in_use"] == 0
+            db.commit()
+        await task
+
+    asyncio.run(while_sync_writes())
+
+    def write_sync(x):
+        with registry.session() as db:
+            db.execute(text("INSERT INTO t VALUES (:x)"), {"x": x})
+            db.commit()
+
+    async def while_async_writes():
+        async with registry.async_session() as db:
+            await db.execute(text("INSERT INTO t VALUES (3)"))
+            # A sync write gives up after the writer queue timeout
+            with pytest.raises(TimeoutError):
+                await asyncio.to_thread(write_sync, 4)
+            await db.commit()
+
+    asyncio.run(while_async_writes())
+    with registry.session() as db:
+        assert db.execute(text("SELECT x FROM t ORDER BY x")).scalars().all() == [1, 2, 3]
+    assert registry.get_metrics()["writer"]["checkout_timeouts"] == 1
+    asyncio.run(registry.dispose())
@@ -0,0 +1,66 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.db.base import Base
+from src.models.pos_transaction import POSTransaction
+from src.services.export_service import ExportService
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        POSTransaction(
+            user_id=1 if i < 5 else 2,
+            store_code="S001",
+            store_display_name="Store 1",
+            trans_date=datetime(2024, 1, 1 + i),
+            trans_time="10:00:00",
+            trans_no=f"T{i}",
+            net_sales_header_values=10.0 * i,
+            quantity=1,
+            tender="CASH"
+        )
+        for i in range(8)
+    ])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def read(chunks) -> bytes:
+    return b"".join(chunks)
+
+def test_csv_export_is_scoped_and_chunked(session):
+    chunks, media_type, filename = ExportService(session).export(
+        {"id": 1, "role": "user"}, "csv", batch_size=2
+    )
+    chunks = list(chunks)
+    rows = list(csv.DictReader(io.StringIO(read(chunks).decode())))
+
+    assert media_type == "text/csv" and filename.endswith(".csv")
+    assert len(chunks) > 1
+    assert [row["trans_no"] for row in rows] == ["T0", "T1", "T2", "T3", "T4"]
+
+def test_gzip_ndjson_export_applies_filters(session):
+    chunks, media_type, filename = ExportService(session).export(
+        {"id": 99, "role": "admin"}, "ndjson", {"start_date": "2024-01-07"}, compress=True
+    )
+    lines = gzip.decompress(read(chunks)).decode().splitlines()
+
+    assert media_type == "application/gzip" and filename.endswith(".ndjson.gz")
+    assert [json.loads(line)["trans_no"] for line in lines] == ["T6", "T7"]
+
+def test_invalid_export_fails_before_streaming(session):
+    with pytest.raises(ValueError):
+        ExportService(session).export({"id": 1, "role": "user"}, "xlsx")
+    with pytest.raises(ValueError):
+        ExportService(session).export({"id": 1, "role": "user"}, "csv", {"start_date": "01/02/2024"})
@@ -0,0 +1,162 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, Request
+
+from src.config.settings import settings
+from src.db.base import Base
+from src.db.engines import EngineRegistry
+from src.db.init_db import get_async_read_db, get_db
+from src.main import app as main_router, get_analytics_repository
+from src.models.pos_transaction import POSTransaction
+from src.models.user import User
+from src.repositories.analytics_repository import AsyncAnalyticsRepository
+from src.services.analytics_service import get_cache_scope, invalidate_user_data
+from src.services.data_service import DataService
+from src.services.data_version_service import bump_data_versions, get_data_version
+from src.services.rollup_service import apply_rollups, transaction_values
+from src.services.upload_service import UploadService
+from src.utils.cache import result_cache
+
+USER = {"id": 1, "role": "user"}
+
+@pytest.fixture
+def env(tmp_path):
+    registry = EngineRegistry(f"sqlite:///{tmp_path / 'app.db'}", replica_url="")
+    Base.metadata.create_all(bind=registry.writer())
+    with registry.session() as db:
+        db.add_all([
+            User(username="cashier", password_hash="x", role="user"),
+            User(username="other", password_hash="x", role="user"),
+            User(username="boss", password_hash="x", role="manager"),
+        ])
+        db.flush()
+        rows = [
+            POSTransaction(
+                user_id=1, store_code="S1", store_display_name="Store 1",
+                trans_date=datetime(2024, 1, 1 + i % 4), trans_time="12:00", trans_no=f"T{i}",
+                net_sales_header_values=5.0 * i, quantity=1, tender="CASH"
+            )
+            for i in range(10)
+        ]
+        db.add_all(rows)
+        db.flush()
+        apply_rollups(db, [transaction_values(row) for row in rows])
+        db.commit()
+
+    calls = []
+
+    class CountingAnalyticsRepository(AsyncAnalyticsRepository):
+        async def get_analytics(self, *args, **kwargs):
+            calls.append(args)
+            return await super().get_analytics(*args, **kwargs)
+
+    async def override_get_async_read_db():
+        async with registry.async_read_session() as session:
+            yield session
+
+    def override_get_db():
+        db = registry.session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def fake_session(request: Request, call_next):
+        request.scope["session"] = {"user": USER}
+        return await call_next(request)
+
+    app.include_router(main_router)
+    app.dependency_overrides[get_async_read_db] = override_get_async_read_db
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_analytics_repository] = (
+        lambda db=Depends(get_async_read_db): CountingAnalyticsRepository(db)
+    )
+    yield registry, app, calls
+    asyncio.run(registry.dispose())
+
+def _get(app, url, headers=None):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(url, headers=headers or {})
+    return asyncio.run(go())
+
+def test_matching_etag_is_answered_without_running_queries(env):
+    registry, app, calls = env
+    first = _get(app, "/api/analytics")
+    assert first.status_code == 200
+    assert first.headers["etag"].startswith('W/"')
+    assert len(calls) == 1
+
+    cached = _get(app, "/api/analytics", {"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == first.headers["etag"]
+    assert len(calls) == 1
+
+    page = _get(app, "/api/data?per_page=5")
+    assert _get(app, "/api/data?per_page=5", {"If-None-Match": page.headers["etag"]}).status_code == 304
+
+    with registry.session() as db:
+        DataService(db).clear(USER)
+    changed = _get(app, "/api/analytics", {"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert "last-modified" in changed.headers
+    assert changed.json()["summary"]["total_transactions"] == 0
+
+def test_a_bumped_version_is_never_served_from_the_old_cached_result(env):
+    registry, app, _ = env
+    first = _get(app, "/api/analytics")
+    misses = result_cache.misses
+
+    # Another worker bumped the version but its invalidation has not reached this one
+    with registry.session() as db:
+        bump_data_versions(db, ["owner:1"])
+        db.commit()
+    second = _get(app, "/api/analytics", {"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert result_cache.misses == misses + 1
+
+def test_upload_history_etag_follows_upload_status(env, tmp_path, monkeypatch):
+    registry, app, _ = env
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    first = _get(app, "/api/uploads/history")
+    assert first.json() == {"history": []}
+    assert _get(app, "/api/uploads/history", {"If-None-Match": first.headers["etag"]}).status_code == 304
+    analytics = _get(app, "/api/analytics")
+
+    with registry.session() as db:
+        uploads = UploadService(db)
+        uploads.record_progress(uploads.create(USER, "sales.csv"), 10)
+    changed = _get(app, "/api/uploads/history", {"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert [entry["status"] for entry in changed.json()["history"]] == ["receiving"]
+    # Upload progress alone does not touch the dashboard validators
+    assert _get(app, "/api/analytics", {"If-None-Match": analytics.headers["etag"]}).status_code == 304
+
+def test_data_versions_follow_cache_scopes(env):
+    registry, _, _ = env
+    scopes = {
+        "user": {"id": 1, "role": "user"},
+        "other": {"id": 2, "role": "user"},
+        "manager": {"id": 3, "role": "manager"},
+        "admin": {"id": 4, "role": "admin"},
+    }
+
+    def versions():
+        with registry.session() as db:
+            return {name: get_data_version(db, get_cache_scope(user)[1])[0] for name, user in scopes.items()}
+
+    before = versions()
+    with registry.session() as db:
+        invalidate_user_data(db, [1])
+    after = versions()
+    assert after["other"] == before["other"]
+    assert all(after[name] > before[name] for name in ("user", "manager", "admin"))
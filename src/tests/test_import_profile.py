@@ -0,0 +1,12 @@
+from pathlib import Path
+
+from src.config.settings import settings
+from src.utils.import_profile import profile_imports
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+def test_entry_point_import_budget():
+    profile = profile_imports("api.index", cwd=str(REPO_ROOT))
+    assert profile["lazy_modules_loaded"] == []
+    assert "src.main" in profile["modules"]
+    assert profile["total_ms"] < settings.import_time_budget_ms
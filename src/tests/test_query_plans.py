@@ -0,0 +1,65 @@
+import pytest
+from datetime import date, datetime
+from sqlalchemy import create_engine, text, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import sqlite
+
+from src.db.base import Base
+from src.db.migrations import run_migrations
+from src.models.pos_transaction import POSTransaction
+from src.services.analytics_service import AnalyticsService
+from src.services.data_service import DataService
+
+USER = {"id": 3, "role": "user"}
+START, END = date(2024, 1, 1), date(2024, 1, 31)
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def query_plan(session, query) -> str:
+    sql = query.statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True})
+    rows = session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+@pytest.mark.parametrize("name", ["summary_query", "store_query", "tender_query", "daily_query"])
+def test_user_analytics_use_daily_rollup_key(session, name):
+    query = getattr(AnalyticsService(session), name)(USER, START, END)
+    assert "USING INDEX ix_daily_sales_rollup_key (user_id=? AND trans_date>? AND trans_date<?)" in query_plan(session, query)
+
+def test_user_hourly_analytics_use_hourly_rollup_key(session):
+    plan = query_plan(session, AnalyticsService(session).hourly_query(USER, START, END))
+    assert "ix_hourly_sales_rollup_key (user_id=? AND trans_date>? AND trans_date<?)" in plan
+
+def test_user_date_scan_on_raw_rows_is_covered(session):
+    query = session.query(func.sum(POSTransaction.net_sales_header_values)).filter(
+        POSTransaction.user_id == USER["id"],
+        POSTransaction.trans_date >= START,
+        POSTransaction.trans_date < END
+    )
+    assert "USING COVERING INDEX ix_pos_transactions_user_date_store" in query_plan(session, query)
+
+def test_keyset_page_seeks_without_sorting(session):
+    service = DataService(session)
+    after = (POSTransaction.trans_date < datetime(2024, 1, 15)) | (
+        (POSTransaction.trans_date == datetime(2024, 1, 15)) & (POSTransaction.id < 100)
+    )
+    query = service.filtered_query(USER, {}).filter(after).order_by(
+        POSTransaction.trans_date.desc(), POSTransaction.id.desc()
+    ).limit(21)
+    plan = query_plan(session, query)
+    assert "USING INDEX ix_pos_transactions_user_date (" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_migrations_are_recorded_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    Base.metadata.create_all(bind=engine)
+    assert run_migrations(engine) == [1, 2, 3, 4, 5]
+    assert run_migrations(engine) == []
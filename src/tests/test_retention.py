@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+
+from src.config.settings import settings
+from src.services.retention_service import RetentionService
+
+class FakeMongo:
+    """In-memory stand-in for the MongoDB wrapper"""
+
+    def __init__(self, documents):
+        self.documents = {doc["_id"]: doc for doc in documents}
+
+    async def get_processed_before(self, cutoff, after_id=None, limit=1000):
+        matching = sorted(
+            (doc for doc in self.documents.values()
+             if doc["processed"] and doc["processed_at"] < cutoff
+             and (after_id is None or doc["_id"] > after_id)),
+            key=lambda doc: doc["_id"]
+        )
+        return matching[:limit]
+
+    async def delete_by_ids(self, ids):
+        return sum(1 for id_ in ids if self.documents.pop(id_, None) is not None)
+
+    async def insert_many_raw(self, documents):
+        inserted = duplicates = 0
+        for doc in documents:
+            if doc["_id"] in self.documents:
+                duplicates += 1
+            else:
+                self.documents[doc["_id"]] = doc
+                inserted += 1
+        return {"inserted": inserted, "duplicates": duplicates, "errors": 0}
+
+def _documents():
+    old = datetime(2020, 1, 1)
+    return [
+        {"_id": ObjectId(), "trans_no": f"T-{i}", "net_sales_header_values": 1.5 * i,
+         "processed": True, "processed_at": old if i < 5 else datetime.utcnow()}
+        for i in range(8)
+    ]
+
+def test_archive_and_restore_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "retention_batch_size", 2)
+    monkeypatch.setattr(settings, "retention_max_docs_per_second", 0)
+    monkeypatch.setattr(settings, "retention_compression", "gzip")
+    originals = _documents()
+    mongo = FakeMongo(originals)
+    service = RetentionService(mongo, archive_dir=str(tmp_path))
+
+    result = asyncio.run(service.archive(older_than_days=30))
+    assert result["archived"] == 5
+    assert result["deleted"] == 5
+    assert result["batches"] == 3
+    assert len(mongo.documents) == 3
+
+    restored = asyncio.run(service.restore(result["path"]))
+    assert restored == {"inserted": 5, "duplicates": 0, "errors": 0}
+    assert sorted(mongo.documents.values(), key=lambda d: d["_id"]) == originals
+
+def test_dry_run_keeps_documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "retention_max_docs_per_second", 0)
+    mongo = FakeMongo(_documents())
+    result = asyncio.run(RetentionService(mongo, archive_dir=str(tmp_path)).archive(30, dry_run=True))
+    assert result["archived"] == 5
+    assert result["deleted"] == 0
+    assert result["path"] is None
+    assert len(mongo.documents) == 8
@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from src.db.base import Base
+from src.models.pos_transaction import POSTransaction
+from src.models.sales_rollup import DailySalesRollup, HourlySalesRollup
+from src.services.analytics_service import AnalyticsService
+from src.services.etl_service import ETLService
+from src.services.rollup_service import apply_rollups, rebuild_rollups, transaction_values
+
+CSV = """store_code,store_display_name,trans_date,trans_time,trans_no,till_no,net_sales_header_values,quantity,tender,tax_header,discount_header
+ABCD0001,Store 1,2024-01-01,9:15:00,A-1,1,100.00,2,CASH,5,0
+ABCD0001,Store 1,2024-01-01,9:45:00,A-2,1,50.00,1,CARD,2.5,1
+ABCD0002,Store 2,2024-01-02,14:00:00,A-3,2,25.50,3,CASH,1,0
+"""
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def loaded(session, tmp_path):
+    path = tmp_path / "upload.csv"
+    path.write_text(CSV)
+    asyncio.run(ETLService(session).process_file(str(path), user_id=7))
+    return session
+
+def rollup_snapshot(session):
+    daily = sorted(
+        (r.user_id, r.store_code, str(r.trans_date), r.tender, r.net_sales, r.quantity, r.transaction_count)
+        for r in session.query(DailySalesRollup)
+    )
+    hourly = sorted(
+        (r.user_id, r.store_code, str(r.trans_date), r.hour, r.net_sales, r.transaction_count)
+        for r in session.query(HourlySalesRollup)
+    )
+    return daily, hourly
+
+def test_ingest_updates_rollups(loaded):
+    analytics = AnalyticsService(loaded).get_analytics({"id": 7, "role": "user"})
+    raw_total = loaded.query(func.sum(POSTransaction.net_sales_header_values)).scalar()
+    assert analytics["summary"]["total_sales"] == pytest.approx(raw_total)
+    assert analytics["summary"]["total_transactions"] == 3
+    assert analytics["summary"]["total_tax"] == pytest.approx(8.5)
+    assert {s["store_code"]: s["transaction_count"] for s in analytics["sales_by_store"]} == {
+        "ABCD0001": 2, "ABCD0002": 1
+    }
+    assert [(h["hour"], h["transaction_count"]) for h in analytics["sales_by_hour"]] == [(9, 2), (14, 1)]
+
+def test_rollups_are_scoped_to_user(loaded):
+    analytics = AnalyticsService(loaded).get_analytics({"id": 8, "role": "user"})
+    assert analytics["summary"]["total_transactions"] == 0
+    assert analytics["sales_by_store"] == []
+
+def test_rebuild_matches_incremental(loaded):
+    incremental = rollup_snapshot(loaded)
+    rebuild_rollups(loaded)
+    assert rollup_snapshot(loaded) == incremental
+
+def test_removing_records_drops_empty_rollups(loaded):
+    for transaction in loaded.query(POSTransaction).filter(POSTransaction.store_code == "ABCD0002"):
+        apply_rollups(loaded, [transaction_values(transaction)], sign=-1)
+    assert [row[1] for row in rollup_snapshot(loaded)[0]] == ["ABCD0001", "ABCD0001"]
+
+def test_ingest_invalidates_cached_analytics(loaded, tmp_path):
+    user = {"id": 7, "role": "user"}
+    assert AnalyticsService(loaded).get_analytics(user)["summary"]["total_transactions"] == 3
+
+    path = tmp_path / "second.csv"
+    path.write_text(CSV.replace("A-", "B-"))
+    asyncio.run(ETLService(loaded).process_file(str(path), user_id=7))
+    assert AnalyticsService(loaded).get_analytics(user)["summary"]["total_transactions"] == 6
+
+def test_columnar_backend_matches_rollups(loaded, monkeypatch):
+    pytest.importorskip("duckdb")
+    from src.config.settings import settings
+    from src.services.columnar_analytics import ColumnarAnalyticsStore
+
+    user = {"id": 7, "role": "user"}
+    service = AnalyticsService(loaded)
+    expected = service._compute_analytics(user, None, None)
+
+    store = ColumnarAnalyticsStore(":memory:")
+    monkeypatch.setattr(settings, "analytics_backend", "duckdb")
+    monkeypatch.setattr("src.services.analytics_service.columnar_store", store)
+    assert service._compute_analytics(user, None, None) == expected
+
+    # Owners marked stale by an update are reloaded on the next query
+    row = loaded.query(POSTransaction).filter(POSTransaction.trans_no == "A-3").one()
+    apply_rollups(loaded, [transaction_values(row)], sign=-1)
+    row.net_sales_header_values = 30.0
+    apply_rollups(loaded, [transaction_values(row)])
+    loaded.commit()
+    store.mark_stale([7])
+    assert service._compute_analytics(user, None, None)["summary"]["total_sales"] == pytest.approx(180.0)
+
+def test_columnar_backend_falls_back_without_duckdb(loaded, monkeypatch):
+    from src.config.settings import settings
+
+    monkeypatch.setattr(settings, "analytics_backend", "duckdb")
+    monkeypatch.setattr("src.services.analytics_service.duckdb_available", lambda: False)
+    analytics = AnalyticsService(loaded).get_analytics({"id": 7, "role": "user"})
+    assert analytics["summary"]["total_transactions"] == 3
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from src.config.settings import settings
+from src.db.base import Base
+from src.db.engines import EngineRegistry
+from src.models.upload import Upload
+from src.models.user import User
+from src.services.upload_service import IngestQueue, ingest_upload, progress_events
+from src.utils.cache import MemoryCacheBackend, SharedInvalidationBackend, shared_invalidation
+from src.utils.shared_state import SharedStateStore, get_shared_state
+from src.utils.status_monitor import ProcessingMonitor
+
+CSV = (
+    "store_code,store_display_name,trans_date,trans_time,trans_no,till_no,"
+    "net_sales_header_values,discount_header,tax_header,quantity,tender\n"
+    + "".join(f"S1,Store 1,2024-01-0{i % 9 + 1},12:00,T{i},1,{i}.50,0,0,1,CASH\n" for i in range(40))
+)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "shared_state_path", str(tmp_path / "shared.db"))
+    monkeypatch.setattr(settings, "shared_state_poll_ms", 0)
+    return get_shared_state()
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "batch_size", 16)
+    registry = EngineRegistry(f"sqlite:///{tmp_path / 'app.db'}", replica_url="")
+    Base.metadata.create_all(bind=registry.writer())
+    with registry.session() as db:
+        db.add(User(username="cashier", password_hash="x", role="user"))
+        db.commit()
+    yield registry
+    asyncio.run(registry.dispose())
+
+def _queued_upload(registry, tmp_path, name):
+    path = tmp_path / name
+    path.write_text(CSV)
+    with registry.session() as db:
+        upload = Upload(user_id=1, filename=name, path=str(path), size=len(CSV), received=len(CSV), status="queued")
+        db.add(upload)
+        db.commit()
+        return upload.id
+
+def _status(registry, upload_id):
+    with registry.session() as db:
+        return db.get(Upload, upload_id).status
+
+def test_invalidations_reach_other_workers(store, monkeypatch):
+    here = SharedInvalidationBackend(MemoryCacheBackend(100), store, "results")
+    there = SharedInvalidationBackend(MemoryCacheBackend(100), SharedStateStore(store.path), "results")
+    here.set("a", 1, {"owner:1"}, 60)
+    here.set("b", 2, {"owner:2"}, 60)
+
+    # An invalidation by another worker process is replayed on the next read
+    with monkeypatch.context() as m:
+        m.setattr(os, "getpid", lambda: -1)
+        there.invalidate_tags({"owner:1"})
+    assert here.get("a") is None
+    assert here.get("b") == 2
+
+    # Own invalidations are applied locally and not replayed twice
+    here.set("a", 3, {"owner:1"}, 60)
+    here.invalidate_tags({"owner:2"})
+    assert here.get("a") == 3
+    assert here.get("b") is None
+
+    # Other caches' invalidations are ignored
+    with monkeypatch.context() as m:
+        m.setattr(os, "getpid", lambda: -1)
+        SharedInvalidationBackend(MemoryCacheBackend(100), store, "users").invalidate_tags({"owner:1"})
+    assert here.get("a") == 3
+
+def test_shared_invalidation_is_off_without_a_store(monkeypatch):
+    monkeypatch.setattr(settings, "shared_state_path", "")
+    backend = MemoryCacheBackend(100)
+    assert shared_invalidation(backend, "results") is backend
+
+def test_only_one_worker_claims_a_job_and_publishes_progress(store, registry, tmp_path):
+    upload_id = _queued_upload(registry, tmp_path, "sales.csv")
+    monitor = ProcessingMonitor(upload_id)
+    published = []
+    monitor.add_listener(lambda: published.append(store.get_progress(upload_id)))
+
+    ingest_upload(upload_id, registry.session, monitor)
+    assert _status(registry, upload_id) == "completed"
+    assert any(progress and progress["status"] == "processing" for progress in published)
+    assert store.get_progress(upload_id) is None
+
+    # A second worker submitting the same upload finds it already claimed
+    other = ProcessingMonitor(upload_id)
+    ingest_upload(upload_id, registry.session, other)
+    assert other.get_progress()["status"] == "completed"
+    with registry.session() as db:
+        assert db.get(Upload, upload_id).records_processed == 40
+
+def test_progress_of_a_job_in_another_worker_is_streamed(store, monkeypatch):
+    monkeypatch.setattr(settings, "progress_poll_seconds", 0.01)
+    store.publish_progress(7, {"job_id": 7, "status": "processing", "rows_loaded": 16})
+
+    async def read_upload():
+        return {"id": 7, "status": "completed", "record_count": 40, "received": 10, "size": 10, "error": None}
+
+    async def go():
+        events = progress_events(7, read_upload, interval=0.01)
+        first = await events.__anext__()
+        store.remove_progress(7)
+        return [first] + [event async for event in events]
+
+    events = [json.loads(event.decode().split("data: ", 1)[1]) for event in asyncio.run(go())]
+    assert [(event["status"], event["rows_loaded"]) for event in events] == [("processing", 16), ("completed", 40)]
+
+def test_shutdown_leaves_unstarted_jobs_queued_for_resume(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ingest_concurrency", 1)
+    first = _queued_upload(registry, tmp_path, "first.csv")
+    second = _queued_upload(registry, tmp_path, "second.csv")
+
+    async def stop():
+        queue = IngestQueue(registry.session)
+        queue.submit(first)
+        queue.submit(second)
+        # Let the first job start while the second waits for the slot
+        await asyncio.sleep(0)
+        return await queue.shutdown(timeout=30)
+
+    assert asyncio.run(stop()) == 0
+    assert _status(registry, first) == "completed"
+    assert _status(registry, second) == "queued"
+
+    async def restart():
+        queue = IngestQueue(registry.session)
+        resumed = await queue.resume()
+        await queue.drain()
+        return resumed
+
+    assert asyncio.run(restart()) == 1
+    assert _status(registry, second) == "completed"
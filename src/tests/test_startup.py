@@ -0,0 +1,80 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from starlette.middleware.sessions import SessionMiddleware
+
+from src.db.base import Base
+from src.db.engines import EngineRegistry
+from src.db.init_db import get_async_read_db, init_test_users
+from src.db.migrations import MIGRATIONS
+from src.main import app as main_router
+from src.models.user import User
+
+def test_requests_run_no_extra_queries(tmp_path):
+    registry = EngineRegistry(f"sqlite:///{tmp_path / 'app.db'}", replica_url="")
+    Base.metadata.create_all(bind=registry.writer())
+
+    async def override_get_async_read_db():
+        async with registry.async_read_session() as session:
+            yield session
+
+    app = FastAPI()
+    app.add_middleware(SessionMiddleware, secret_key="test")
+    app.include_router(main_router)
+    app.dependency_overrides[get_async_read_db] = override_get_async_read_db
+    client = TestClient(app)
+
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(registry.async_reader().sync_engine, "before_cursor_execute", record)
+    # Each login looks the user up once and runs nothing else
+    for _ in range(2):
+        response = client.post("/login", data={"username": "nobody", "password": "x"})
+        assert response.status_code == 401
+    assert len(statements) == 2
+    assert not any("count(" in statement.lower() for statement in statements)
+    asyncio.run(registry.dispose())
+
+def test_seeding_runs_once(db):
+    db.query(User).delete()
+    db.commit()
+    assert init_test_users(db) == 3
+    assert init_test_users(db) == 0
+    db.query(User).delete()
+    db.commit()
+
+STARTUP_WORKER = """
+import os, sys, time
+from src.db.init_db import init_database
+while not os.path.exists(sys.argv[1]):
+    time.sleep(0.001)
+init_database()
+"""
+
+def test_workers_starting_together_initialize_the_database_once(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    go = tmp_path / "go"
+    env = dict(os.environ, DATABASE_URL=url, SEED_TEST_USERS="true")
+    workers = [
+        subprocess.Popen([sys.executable, "-c", STARTUP_WORKER, str(go)], env=env, stderr=subprocess.PIPE)
+        for _ in range(4)
+    ]
+    # Release every worker at once, after their imports are done
+    time.sleep(3)
+    go.touch()
+    errors = [worker.communicate(timeout=60)[1].decode() for worker in workers]
+    assert [worker.returncode for worker in workers] == [0] * 4, errors
+
+    registry = EngineRegistry(url, replica_url="")
+    with registry.session() as db:
+        assert db.query(User).count() == 3
+        assert db.execute(text("SELECT COUNT(*) FROM schema_migrations")).scalar() == len(MIGRATIONS)
+    asyncio.run(registry.dispose())
@@ -0,0 +1,161 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.db.base import Base
+from src.db.migrations import run_migrations
+from src.db.types import format_time_of_day, parse_time_of_day
+from src.models.dimensions import Store, TenderType
+from src.models.pos_transaction import POSTransaction
+from src.models.sales_rollup import DailySalesRollup, HourlySalesRollup
+from src.services.data_service import DataService
+from src.services.dimension_service import encode_dimensions
+
+USER = {"id": 4, "role": "user"}
+
+def test_time_of_day_round_trip():
+    assert parse_time_of_day("9:05") == 9 * 3600 + 5 * 60
+    assert format_time_of_day(parse_time_of_day("23:59:59")) == "23:59:59"
+    assert parse_time_of_day("9:05 PM") == 21 * 3600 + 5 * 60
+    assert parse_time_of_day("12:30:15 am") == 30 * 60 + 15
+    assert parse_time_of_day("12:00 p.m.") == 12 * 3600
+    assert parse_time_of_day(float("nan")) is None
+    assert parse_time_of_day("") is None
+
+def test_invalid_times_of_day_are_rejected():
+    for value in ("not a time", "25:00", "24:00:00", "12:60", "10:00:61", "13:00 PM", "0:15 AM", 86400, -1):
+        with pytest.raises(ValueError):
+            parse_time_of_day(value)
+
+def test_compact_columns_read_back_unchanged():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(POSTransaction(
+        user_id=USER["id"], store_code="S1", store_display_name="Main St",
+        trans_date=datetime(2024, 1, 2), trans_time="9:30", trans_no="T1",
+        net_sales_header_values=12.345, tax_header=1.1, discount_header=0.1,
+        quantity=2, trans_type="SALE", tender="CASH"
+    ))
+    session.commit()
+
+    raw = session.execute(text(
+        "SELECT net_sales_header_values, trans_time, tender_code FROM pos_transactions"
+    )).one()
+    assert raw[0] == 1235 and raw[1] == 9 * 3600 + 30 * 60 and isinstance(raw[2], int)
+
+    row = DataService(session).get_page(USER, 1, 10, {"store": "Main St", "tender": "CASH"})["data"][0]
+    assert row["store_display_name"] == "Main St" and row["tender"] == "CASH"
+    assert row["trans_time"] == "09:30:00" and row["net_sales_header_values"] == 12.35
+    assert row["trans_type"] == "SALE"
+    assert DataService(session).get_page(USER, 1, 10, {"tender": "CARD"})["data"] == []
+    session.close()
+
+def test_encode_dimensions_reuses_codes():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        first = [{"store_code": "S1", "store_display_name": "Old", "tender": "CARD"}]
+        second = [{"store_code": "S1", "store_display_name": "New", "tender": "CARD"},
+                  {"store_code": "S1", "store_display_name": None, "tender": None}]
+        encode_dimensions(conn, first)
+        encode_dimensions(conn, second)
+        assert second[0]["tender_code"] == first[0]["tender_code"]
+        assert second[1]["tender_code"] is None
+        assert conn.execute(text("SELECT COUNT(*) FROM tender_types")).scalar() == 1
+        assert conn.execute(text("SELECT store_display_name FROM stores")).scalar() == "New"
+
+def test_migration_compacts_existing_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE pos_transactions (id INTEGER PRIMARY KEY, store_code VARCHAR, "
+            "store_display_name VARCHAR, trans_date DATETIME, trans_time VARCHAR, trans_no VARCHAR, "
+            "till_no VARCHAR, net_sales_header_values FLOAT, quantity INTEGER, trans_type VARCHAR, "
+            "tender VARCHAR, discount_header FLOAT, tax_header FLOAT, user_id INTEGER, dm_load_date DATETIME)"
+        ))
+        conn.execute(text("CREATE INDEX ix_pos_transactions_store_code ON pos_transactions (store_code)"))
+        conn.execute(text(
+            "INSERT INTO pos_transactions (store_code, store_display_name, trans_date, trans_time, "
+            "trans_no, net_sales_header_values, quantity, trans_type, tender, user_id) VALUES "
+            "('S1', 'Main St', '2024-01-02 00:00:00.000000', '14:05', 'T1', 20.5, 1, '0', 'CASH', 4), "
+            "('S1', 'Main St', '2024-01-02 00:00:00.000000', '15:00:00', 'T2', 4.25, 2, '0', 'CARD', 4)"
+        ))
+    Base.metadata.create_all(bind=engine)
+    assert run_migrations(engine) == [1, 2, 3, 4, 5]
+
+    session = sessionmaker(bind=engine)()
+    rows = session.query(POSTransaction).order_by(POSTransaction.id).all()
+    assert [(r.trans_time, r.net_sales_header_values, r.tender, r.store_display_name) for r in rows] == [
+        ("14:05:00", 20.5, "CASH", "Main St"), ("15:00:00", 4.25, "CARD", "Main St")
+    ]
+    assert session.query(Store).count() == 1 and session.query(TenderType).count() == 2
+    assert sorted(r.net_sales for r in session.query(DailySalesRollup)) == [4.25, 20.5]
+    session.close()
+
+def _legacy_engine(path, times):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE pos_transactions (id INTEGER PRIMARY KEY, store_code VARCHAR, "
+            "store_display_name VARCHAR, trans_date DATETIME, trans_time VARCHAR, trans_no VARCHAR, "
+            "till_no VARCHAR, net_sales_header_values FLOAT, quantity INTEGER, trans_type VARCHAR, "
+            "tender VARCHAR, discount_header FLOAT, tax_header FLOAT, user_id INTEGER, dm_load_date DATETIME)"
+        ))
+        for trans_time in times:
+            conn.execute(text(
+                "INSERT INTO pos_transactions (store_code, trans_date, trans_time, net_sales_header_values, "
+                "quantity, tender, user_id) VALUES ('S1', '2024-01-02 00:00:00.000000', :t, 1.5, 1, 'CASH', 4)"
+            ), {"t": trans_time})
+    return engine
+
+def test_migration_parses_twelve_hour_times(tmp_path):
+    engine = _legacy_engine(tmp_path / "legacy.db", ["2:05 PM", "12:10 AM"])
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    session = sessionmaker(bind=engine)()
+    assert [r.trans_time for r in session.query(POSTransaction).order_by(POSTransaction.id)] == ["14:05:00", "00:10:00"]
+    assert sorted(r.hour for r in session.query(HourlySalesRollup)) == [0, 14]
+    session.close()
+
+def test_migration_stops_on_unparseable_times(tmp_path):
+    engine = _legacy_engine(tmp_path / "legacy.db", ["10:00", "25:61", "lunch"])
+    Base.metadata.create_all(bind=engine)
+    with pytest.raises(ValueError, match=r"2 transactions .*\(ids 2, 3\)"):
+        run_migrations(engine)
+
+    # The original rows and their times are left as they were
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT trans_time FROM pos_transactions ORDER BY id")).scalars().all() == [
+            "10:00", "25:61", "lunch"
+        ]
+
+def test_float_rollups_are_migrated_to_cents(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # The rollup tables as migration 2 created them before they held cents
+        for name, key in (("daily_sales_rollup", "tender VARCHAR NOT NULL, store_display_name VARCHAR"),
+                          ("hourly_sales_rollup", "hour INTEGER NOT NULL")):
+            conn.execute(text(f"DROP TABLE {name}"))
+            conn.execute(text(
+                f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, store_code VARCHAR NOT NULL, "
+                f"trans_date DATE NOT NULL, {key}, net_sales FLOAT NOT NULL, tax FLOAT NOT NULL, "
+                "discount FLOAT NOT NULL, quantity INTEGER NOT NULL, transaction_count INTEGER NOT NULL)"
+            ))
+    session = sessionmaker(bind=engine)()
+    for i in range(3):
+        session.add(POSTransaction(
+            user_id=USER["id"], store_code="S1", trans_date=datetime(2024, 1, 2), trans_time="9:30",
+            trans_no=f"T{i}", net_sales_header_values=0.1, tax_header=0.2, quantity=1, tender="CASH"
+        ))
+    session.commit()
+    run_migrations(engine)
+
+    raw = session.execute(text("SELECT net_sales, tax FROM daily_sales_rollup")).one()
+    assert raw == (30, 60) and all(isinstance(value, int) for value in raw)
+    assert [(r.net_sales, r.tax) for r in session.query(DailySalesRollup)] == [(0.3, 0.6)]
+    session.close()
@@ -0,0 +1,254 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from src.config.settings import settings
+from src.db.base import Base
+from src.db.engines import EngineRegistry
+from src.db.init_db import get_async_read_db, get_db
+from src.main import app as main_router, get_ingest_queue
+from src.models.pos_transaction import POSTransaction
+from src.models.upload import Upload
+from src.models.user import User
+from src.services.analytics_service import AnalyticsService
+from src.services.data_version_service import get_data_version
+from src.services.etl_service import ETLService
+from src.services.upload_service import IngestQueue, progress_events
+from src.utils.status_monitor import ingest_monitors
+
+CSV = (
+    "store_code,store_display_name,trans_date,trans_time,trans_no,till_no,"
+    "net_sales_header_values,discount_header,tax_header,quantity,tender\n"
+    + "".join(f"S1,Store 1,2024-01-0{i % 9 + 1},12:00,T{i},1,{i}.50,0,0,1,CASH\n" for i in range(40))
+).encode()
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "batch_size", 16)
+    registry = EngineRegistry(f"sqlite:///{tmp_path / 'app.db'}", replica_url="")
+    Base.metadata.create_all(bind=registry.writer())
+    with registry.session() as db:
+        db.add(User(username="cashier", password_hash="x", role="user"))
+        db.commit()
+    queue = IngestQueue(registry.session)
+
+    def override_get_db():
+        db = registry.session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_read_db():
+        async with registry.async_read_session() as session:
+            yield session
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def fake_session(request: Request, call_next):
+        request.scope["session"] = {"user": {"id": 1, "role": "user"}}
+        return await call_next(request)
+
+    app.include_router(main_router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_read_db
+    app.dependency_overrides[get_ingest_queue] = lambda: queue
+    yield registry, queue, app
+    asyncio.run(registry.dispose())
+
+def _run(app, queue, requests):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            result = await requests(client)
+            await queue.drain()
+            return result
+    return asyncio.run(go())
+
+def test_upload_is_streamed_loaded_and_deduplicated(env):
+    registry, queue, app = env
+
+    async def requests(client):
+        first = await client.post("/api/upload?filename=sales.csv", content=CSV)
+        await queue.drain()
+        second = await client.post("/api/upload", content=CSV, headers={"X-Filename": "again.csv"})
+        history = await client.get("/api/uploads/history")
+        return first, second, history
+
+    first, second, history = _run(app, queue, requests)
+    assert first.status_code == 202
+    assert first.json()["status"] == "queued"
+    assert second.json()["status"] == "duplicate"
+    assert second.json()["duplicate_of"] == first.json()["id"]
+
+    entries = {entry["id"]: entry for entry in history.json()["history"]}
+    assert entries[first.json()["id"]]["status"] == "completed"
+    assert entries[first.json()["id"]]["record_count"] == 40
+    with registry.session() as db:
+        assert db.query(POSTransaction).count() == 40
+        # Loaded and duplicate files are removed from the upload directory
+        assert all(upload.path is None for upload in db.query(Upload))
+
+def test_upload_over_the_limit_is_rejected(env, monkeypatch):
+    registry, queue, app = env
+    monkeypatch.setattr(settings, "max_file_size", 100)
+    monkeypatch.setattr(settings, "upload_chunk_size", 16)
+
+    async def chunks():
+        for start in range(0, len(CSV), 32):
+            yield CSV[start:start + 32]
+
+    async def requests(client):
+        declared = await client.post("/api/upload?filename=big.csv", content=CSV)
+        streamed = await client.post("/api/upload?filename=big.csv", content=chunks())
+        return declared, streamed
+
+    declared, streamed = _run(app, queue, requests)
+    assert declared.status_code == 413
+    assert streamed.status_code == 413
+    with registry.session() as db:
+        assert [upload.status for upload in db.query(Upload)] == ["failed"]
+
+def test_load_failing_partway_invalidates_the_committed_chunks(env, tmp_path):
+    registry, _, _ = env
+    user = {"id": 1, "role": "user"}
+    lines = CSV.decode().splitlines(keepends=True)
+    # Row 20 is in the second chunk of 16; its date cannot be parsed
+    lines[21] = lines[21].replace("2024-01-03", "not a date")
+    path = tmp_path / "broken.csv"
+    path.write_text("".join(lines))
+
+    with registry.session() as db:
+        assert AnalyticsService(db).get_analytics(user)["summary"]["total_transactions"] == 0
+        version = get_data_version(db, ["owner:1"])[0]
+        with pytest.raises(Exception):
+            ETLService(db).load_csv(str(path), 1)
+        assert get_data_version(db, ["owner:1"])[0] > version
+        assert AnalyticsService(db).get_analytics(user)["summary"]["total_transactions"] == 16
+
+def test_writer_connection_is_free_while_the_body_streams(env):
+    registry, queue, app = env
+    checked_out = []
+
+    async def chunks():
+        for start in range(0, len(CSV), 256):
+            checked_out.append(registry.writer().pool.checkedout())
+            yield CSV[start:start + 256]
+
+    async def requests(client):
+        created = await client.post("/api/uploads?filename=sales.csv", headers={"Upload-Length": str(len(CSV))})
+        simple = await client.post("/api/upload?filename=sales.csv", content=chunks())
+        # Loading the first file legitimately writes while the second streams
+        await queue.drain()
+        patched = await client.patch(created.headers["location"], content=chunks(), headers={
+            "Content-Type": "application/offset+octet-stream", "Upload-Offset": "0"
+        })
+        return simple, patched
+
+    simple, patched = _run(app, queue, requests)
+    assert simple.status_code == 202
+    assert patched.status_code == 204
+    # No session holds the writer connection while chunks are read
+    assert set(checked_out) == {0}
+
+def test_resumable_upload_in_chunks(env):
+    registry, queue, app = env
+    name = base64.b64encode(b"sales.csv").decode()
+
+    async def requests(client):
+        created = await client.post("/api/uploads", headers={
+            "Upload-Length": str(len(CSV)), "Upload-Metadata": f"filename {name}"
+        })
+        location = created.headers["location"]
+        patch_headers = {"Content-Type": "application/offset+octet-stream"}
+        responses = [created]
+        for offset in (0, 500):
+            responses.append(await client.patch(
+                location, content=CSV[offset:offset + 500], headers={**patch_headers, "Upload-Offset": str(offset)}
+            ))
+        # A chunk at a stale offset is refused with the current offset
+        responses.append(await client.patch(
+            location, content=CSV[500:], headers={**patch_headers, "Upload-Offset": "500"}
+        ))
+        responses.append(await client.head(location))
+        offset = responses[-1].headers["upload-offset"]
+        responses.append(await client.patch(
+            location, content=CSV[int(offset):], headers={**patch_headers, "Upload-Offset": offset}
+        ))
+        await queue.drain()
+        responses.append(await client.get(location))
+        return responses
+
+    created, first, second, stale, head, last, status = _run(app, queue, requests)
+    assert created.status_code == 201
+    assert created.headers["tus-resumable"] == "1.0.0"
+    assert first.headers["upload-offset"] == "500"
+    assert second.headers["upload-status"] == "receiving"
+    assert stale.status_code == 409
+    assert stale.headers["upload-offset"] == "1000"
+    assert head.headers["upload-length"] == str(len(CSV))
+    assert last.status_code == 204
+    assert last.headers["upload-offset"] == str(len(CSV))
+    assert status.json()["status"] == "completed"
+    assert status.json()["record_count"] == 40
+
+def _events(body: str):
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+
+def test_progress_is_streamed_as_server_sent_events(env):
+    registry, queue, app = env
+
+    async def requests(client):
+        upload = await client.post("/api/upload?filename=sales.csv", content=CSV)
+        events = await client.get(f"/api/uploads/{upload.json()['id']}/events")
+        return events
+
+    events = _run(app, queue, requests)
+    assert events.headers["content-type"].startswith("text/event-stream")
+    progress = _events(events.text)
+    assert progress[-1]["status"] == "completed"
+    assert progress[-1]["rows_loaded"] == 40
+
+    # Once the job is done the stream is answered from the upload row
+    finished = _run(app, queue, lambda client: client.get(f"/api/uploads/{progress[-1]['job_id']}/events"))
+    assert [event["status"] for event in _events(finished.text)] == ["completed"]
+
+def test_progress_events_are_coalesced():
+    monitor = ingest_monitors.create(999)
+    monitor.start(total_rows=2000)
+
+    def work():
+        for _ in range(200):
+            monitor.record_batch(10, 9)
+            time.sleep(0.001)
+        monitor.finish("completed")
+
+    async def stream():
+        async def read_upload():
+            raise AssertionError("the monitor should be used")
+        thread = threading.Thread(target=work)
+        thread.start()
+        events = [event async for event in progress_events(999, read_upload, interval=0.05)]
+        thread.join()
+        return events
+
+    try:
+        events = asyncio.run(stream())
+    finally:
+        ingest_monitors.discard(999)
+    progress = [json.loads(event.decode().split("data: ", 1)[1]) for event in events]
+    # Far fewer events than the 200 updates, ending with the final counts
+    assert 1 < len(progress) < 50
+    assert progress[-1]["status"] == "completed"
+    assert progress[-1]["rows_parsed"] == 2000
+    assert progress[-1]["rows_loaded"] == 1800
+    assert progress[-1]["rows_rejected"] == 200
+    assert any(event["eta_seconds"] is not None for event in progress[:-1])
@@ -1,9 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-import bcrypt
+from typing import Any, Callable, Dict, Optional
+from src.config.settings import settings
+from src.utils.cache import MemoryCacheBackend
+import asyncio
+import hashlib
 import logging
+import threading
+import time
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -13,32 +17,45 @@ SECRET_KEY = "your-secret-key-keep-it-secret"  # In production, use environment
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=12,
-    bcrypt__ident="2b"
-)
+# Password hashing; passlib, bcrypt and jose are imported on first use so
+# a cold start that serves no login does not pay for them
+_pwd_context = None
+
+def _get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__rounds=12,
+            bcrypt__ident="2b"
+        )
+    return _pwd_context
 
 def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt."""
     try:
-        return pwd_context.hash(password)
+        return _get_pwd_context().hash(password)
     except Exception as e:
         logger.error(f"Error hashing password: {str(e)}")
         # Fallback to direct bcrypt if passlib fails
+        import bcrypt
+
         salt = bcrypt.gensalt()
         return bcrypt.hashpw(password.encode(), salt).decode()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return _get_pwd_context().verify(plain_password, hashed_password)
     except Exception as e:
         logger.error(f"Error verifying password: {str(e)}")
         # Fallback to direct bcrypt if passlib fails
         try:
+            import bcrypt
+
             return bcrypt.checkpw(
                 plain_password.encode(),
                 hashed_password.encode()
@@ -47,6 +64,111 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
             logger.error(f"Error in bcrypt fallback: {str(e)}")
             return False
 
+class PasswordHashMetrics:
+    """Queue wait and run time of the hashing pool, per operation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations: Dict[str, Dict[str, float]] = {}
+            self._waiting = 0
+            self._max_waiting = 0
+
+    def submitted(self) -> None:
+        with self._lock:
+            self._waiting += 1
+            self._max_waiting = max(self._max_waiting, self._waiting)
+
+    def started(self) -> None:
+        with self._lock:
+            self._waiting = max(self._waiting - 1, 0)
+
+    def record(self, operation: str, wait: float, duration: float) -> None:
+        with self._lock:
+            stats = self._operations.setdefault(
+                operation,
+                {"count": 0, "wait_total": 0.0, "wait_max": 0.0, "run_total": 0.0, "run_max": 0.0}
+            )
+            stats["count"] += 1
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            stats["run_total"] += duration
+            stats["run_max"] = max(stats["run_max"], duration)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return latency counters keyed by operation"""
+        with self._lock:
+            operations = {
+                name: {
+                    "count": int(stats["count"]),
+                    "avg_wait_ms": stats["wait_total"] / stats["count"] * 1000,
+                    "max_wait_ms": stats["wait_max"] * 1000,
+                    "avg_ms": stats["run_total"] / stats["count"] * 1000,
+                    "max_ms": stats["run_max"] * 1000,
+                }
+                for name, stats in self._operations.items()
+            }
+            return {
+                "workers": settings.password_hash_workers,
+                "waiting": self._waiting,
+                "max_waiting": self._max_waiting,
+                "operations": operations,
+            }
+
+password_hash_metrics = PasswordHashMetrics()
+
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_executor_lock = threading.Lock()
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        with _hash_executor_lock:
+            if _hash_executor is None:
+                _hash_executor = ThreadPoolExecutor(
+                    max_workers=max(settings.password_hash_workers, 1),
+                    thread_name_prefix="password-hash"
+                )
+    return _hash_executor
+
+async def _run_hashing(operation: str, func: Callable, *args) -> Any:
+    """Run a bcrypt call on the hashing pool so it does not block the event loop.
+
+    The pool has a fixed number of threads, so a burst of logins queues
+    behind them instead of taking every core.
+    """
+    submitted = time.perf_counter()
+    password_hash_metrics.submitted()
+
+    def run():
+        started = time.perf_counter()
+        password_hash_metrics.started()
+        try:
+            return func(*args)
+        finally:
+            password_hash_metrics.record(operation, started - submitted, time.perf_counter() - started)
+
+    return await asyncio.get_running_loop().run_in_executor(_get_hash_executor(), run)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool."""
+    return await _run_hashing("hash", get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool."""
+    return await _run_hashing("verify", verify_password, plain_password, hashed_password)
+
+def shutdown_password_hashing() -> None:
+    """Stop the hashing pool threads."""
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is not None:
+            _hash_executor.shutdown(wait=False)
+            _hash_executor = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -56,21 +178,38 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     try:
+        from jose import jwt
+
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     except Exception as e:
         logger.error(f"Error creating access token: {str(e)}")
         raise
 
+# Verified claims keyed by token digest, each kept until the token's exp
+claims_cache = MemoryCacheBackend(max_entries=settings.token_cache_max_entries)
+
 def decode_token(token: str) -> dict:
     """Decode and verify a JWT token."""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = claims_cache.get(key)
+    if payload is not None and payload["exp"] > time.time():
+        return dict(payload)
+
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError as e:
         logger.error(f"Error decoding token: {str(e)}")
         raise
 
+    # Tokens without a numeric exp are verified every time
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and exp > time.time():
+        claims_cache.set(key, dict(payload), set(), exp - time.time())
+    return payload
+
 def get_current_user(credentials: str) -> dict:
     """Get the current user from JWT token."""
     try:
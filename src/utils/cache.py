@@ -0,0 +1,342 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+from src.config.settings import settings
+from src.utils.concurrency import run_blocking
+from src.utils.shared_state import SharedStateStore, get_shared_state
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend:
+    """Interface for result cache storage."""
+
+    # Whether calls may wait on I/O (see ResultCache._call)
+    blocking = False
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, tags: Set[str], ttl: float) -> None:
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Set[str]) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+class NullCacheBackend(CacheBackend):
+    """Backend that never stores anything, used when caching is disabled."""
+
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any, tags: Set[str], ttl: float) -> None:
+        pass
+
+    def invalidate_tags(self, tags: Set[str]) -> int:
+        return 0
+
+    def clear(self) -> None:
+        pass
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache with per-entry TTL and tag invalidation."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float, Set[str]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any, tags: Set[str], ttl: float) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags: Set[str]) -> int:
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache stored in a local SQLite file so every worker on a host shares it."""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, last_access REAL);"
+                "CREATE TABLE IF NOT EXISTS cache_tags (key TEXT, tag TEXT);"
+                "CREATE INDEX IF NOT EXISTS ix_cache_tags_tag ON cache_tags (tag);"
+                "CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key);"
+                "CREATE INDEX IF NOT EXISTS ix_cache_entries_last_access ON cache_entries (last_access);"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _delete_keys(self, conn: sqlite3.Connection, where: str, params: Iterable[Any] = ()) -> int:
+        keys = [row[0] for row in conn.execute(f"SELECT key FROM cache_entries WHERE {where}", tuple(params))]
+        conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(k,) for k in keys])
+        conn.executemany("DELETE FROM cache_tags WHERE key = ?", [(k,) for k in keys])
+        return len(keys)
+
+    def get(self, key: str) -> Optional[Any]:
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now:
+            with conn:
+                self._delete_keys(conn, "key = ?", (key,))
+            return None
+        conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, tags: Set[str], ttl: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now + ttl, now)
+            )
+            conn.executemany("INSERT INTO cache_tags (key, tag) VALUES (?, ?)", [(key, tag) for tag in tags])
+            overflow = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._delete_keys(
+                    conn,
+                    "key IN (SELECT key FROM cache_entries ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+
+    def invalidate_tags(self, tags: Set[str]) -> int:
+        if not tags:
+            return 0
+        conn = self._connect()
+        placeholders = ", ".join("?" for _ in tags)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._delete_keys(
+                conn,
+                f"key IN (SELECT key FROM cache_tags WHERE tag IN ({placeholders}))",
+                list(tags)
+            )
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache_entries")
+            conn.execute("DELETE FROM cache_tags")
+
+class SharedInvalidationBackend(CacheBackend):
+    """An in-process cache whose invalidations reach every worker on the host.
+
+    Invalidations are applied locally and logged in the shared state
+    store; before a read or write the log is checked, at most every
+    settings.shared_state_poll_ms, and tags invalidated by other workers
+    are dropped from the local cache.
+    """
+
+    def __init__(self, local: CacheBackend, store: SharedStateStore, name: str):
+        self.local = local
+        self.store = store
+        self.name = name
+        self._lock = threading.Lock()
+        self._seq = store.last_invalidation()
+        self._checked = time.monotonic()
+
+    def _sync_due(self) -> bool:
+        return time.monotonic() - self._checked >= settings.shared_state_poll_ms / 1000
+
+    @property
+    def blocking(self) -> bool:
+        # Only a read of the shared invalidation log touches the disk
+        return self.local.blocking or self._sync_due()
+
+    def _sync(self) -> None:
+        interval = settings.shared_state_poll_ms / 1000
+        if time.monotonic() - self._checked < interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked < interval:
+                return
+            self._checked = time.monotonic()
+            try:
+                self._seq, tags = self.store.invalidations_since(self.name, self._seq)
+            except sqlite3.Error as e:
+                logger.warning(f"Reading shared invalidations failed: {str(e)}")
+                return
+        if tags:
+            self.local.invalidate_tags(tags)
+
+    def get(self, key: str) -> Optional[Any]:
+        self._sync()
+        return self.local.get(key)
+
+    def set(self, key: str, value: Any, tags: Set[str], ttl: float) -> None:
+        self._sync()
+        self.local.set(key, value, tags, ttl)
+
+    def invalidate_tags(self, tags: Set[str]) -> int:
+        removed = self.local.invalidate_tags(tags)
+        if tags:
+            self.store.publish_invalidation(self.name, tags)
+        return removed
+
+    def clear(self) -> None:
+        self.local.clear()
+
+def shared_invalidation(backend: CacheBackend, name: str) -> CacheBackend:
+    """Share a per-process cache's invalidations with the other workers, if any."""
+    store = get_shared_state()
+    if store is None:
+        return backend
+    return SharedInvalidationBackend(backend, store, name)
+
+def create_backend() -> CacheBackend:
+    """Create the cache backend selected in settings."""
+    if settings.cache_backend == "sqlite":
+        return SQLiteCacheBackend(settings.cache_path, settings.cache_max_entries)
+    if settings.cache_backend == "memory":
+        return shared_invalidation(MemoryCacheBackend(settings.cache_max_entries), "results")
+    return NullCacheBackend()
+
+class ResultCache:
+    """Cache of computed responses, invalidated by data-change tags.
+
+    Each entry is stored under a namespace, the caller's data scope and a
+    hash of the query parameters, and carries the tags of the data it was
+    computed from so a change to that data drops exactly those entries.
+    Callers that know the data version (see data_version_service) pass it
+    too, so a bumped version misses even before the invalidation reaches
+    this process.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: Optional[float] = None):
+        self._backend = backend
+        self.ttl = settings.cache_ttl_seconds if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
+
+    @staticmethod
+    def make_key(namespace: str, scope: str, params: Dict[str, Any], version: Optional[int] = None) -> str:
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        if version is not None:
+            return f"{namespace}:{scope}:v{version}:{digest}"
+        return f"{namespace}:{scope}:{digest}"
+
+    def _call(self, method: Callable[..., Any], *args: Any) -> Any:
+        # Disk-backed lookups inside AsyncSession.run_sync go to the threadpool
+        if self.backend.blocking:
+            return run_blocking(method, *args)
+        return method(*args)
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        scope: str,
+        tags: Set[str],
+        params: Dict[str, Any],
+        compute: Callable[[], Any],
+        version: Optional[int] = None
+    ) -> Any:
+        """Return the cached value or compute, store and return it."""
+        key = self.make_key(namespace, scope, params, version)
+        try:
+            value = self._call(self.backend.get, key)
+        except Exception as e:
+            logger.warning(f"Cache read failed: {str(e)}")
+            value = None
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute()
+        try:
+            self._call(self.backend.set, key, value, tags, self.ttl)
+        except Exception as e:
+            logger.warning(f"Cache write failed: {str(e)}")
+        return value
+
+    def invalidate(self, tags: Set[str]) -> int:
+        """Drop every entry computed from data carrying one of the tags."""
+        try:
+            removed = self.backend.invalidate_tags(tags)
+        except Exception as e:
+            logger.error(f"Cache invalidation failed: {str(e)}")
+            return 0
+        if removed:
+            logger.info(f"Invalidated {removed} cached results for {sorted(tags)}")
+        return removed
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": settings.cache_backend, "hits": self.hits, "misses": self.misses}
+
+result_cache = ResultCache()
@@ -0,0 +1,140 @@
+import zlib
+from typing import Callable, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Streams that must reach the client event by event
+UNBUFFERED_TYPES = ("text/event-stream",)
+
+# Bodies that are already compressed and would only grow if gzipped again
+COMPRESSED_TYPES = (
+    "application/gzip", "application/x-gzip", "application/zip", "application/x-parquet",
+    "application/vnd.apache.parquet", "application/octet-stream", "image/", "audio/", "video/",
+)
+
+def is_compressed_type(content_type: str) -> bool:
+    """Whether a Content-Type names an already compressed format (SVG images are text)."""
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    return content_type.startswith(COMPRESSED_TYPES) and content_type != "image/svg+xml"
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, preferring br when installed."""
+    offered = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            offered.add(coding.strip())
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+def _compressor(encoding: str, gzip_level: int, brotli_quality: int) -> Tuple[Callable, Callable]:
+    """Get (compress, finish) functions for one response body."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=brotli_quality)
+        return compressor.process, compressor.finish
+    # wbits 16 + MAX_WBITS writes a gzip header and trailer
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip, whichever the client accepts.
+
+    Works like Starlette's GZipMiddleware: bodies under minimum_size are
+    sent as they are, and streamed bodies are compressed chunk by chunk.
+    Responses that already carry a Content-Encoding, already compressed
+    content types (gzip and Parquet exports, archives, images) and event
+    streams are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self, encoding, send)(scope, receive)
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Message = {}
+        self.passthrough = False
+        self.started = False
+        self.compress: Optional[Callable] = None
+        self.finish: Optional[Callable] = None
+
+    async def __call__(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers back until the first body chunk shows whether to compress
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or content_type.startswith(UNBUFFERED_TYPES)
+                or is_compressed_type(content_type)
+            )
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            if self.passthrough or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compress, self.finish = _compressor(
+                self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality
+            )
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self.compress(body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body += self.finish()
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+        body = self.compress(body)
+        if not more_body:
+            body += self.finish()
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
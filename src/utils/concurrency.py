@@ -0,0 +1,25 @@
+import asyncio
+from typing import Any, Callable, TypeVar
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import MissingGreenlet
+from sqlalchemy.util import await_only
+
+T = TypeVar("T")
+
+def run_blocking(func: Callable[..., T], *args: Any) -> T:
+    """Run blocking work that is not a database call without stalling the event loop.
+
+    The sync services run either on a worker thread (sync routes, ingest
+    jobs) or on the event loop inside AsyncSession.run_sync. In the latter
+    case func is handed to the threadpool and awaited, so other requests
+    keep being served; everywhere else it simply runs in place.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return func(*args)
+    try:
+        return await_only(run_in_threadpool(func, *args))
+    except MissingGreenlet:
+        # On the loop but outside run_sync: nothing to hand the wait to
+        return func(*args)
@@ -0,0 +1,43 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+from src.config.settings import settings
+
+def cache_headers(scope: str, version: int, updated_at: Optional[datetime]) -> Dict[str, str]:
+    """Build ETag/Last-Modified headers for a response that depends on a data version.
+
+    The ETag is weak because the compression middleware may re-encode the
+    body, and it includes the cache scope because the same URL returns
+    different data to different users.
+    """
+    digest = hashlib.sha1(f"{settings.api_version}:{scope}:{version}".encode()).hexdigest()[:16]
+    headers = {
+        "ETag": f'W/"{digest}"',
+        # Let browsers keep the response but revalidate it on every use
+        "Cache-Control": "private, no-cache",
+        "Vary": "Cookie"
+    }
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(updated_at.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+def is_not_modified(request_headers: Mapping[str, str], headers: Dict[str, str]) -> bool:
+    """Whether the request's conditional headers match the current validators.
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = headers["ETag"].removeprefix("W/")
+        return etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(headers["Last-Modified"])
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+from typing import Any, Dict, Optional
+
+# Heavy modules the app entry point must not load at import time; the code
+# that needs them imports them on first use
+LAZY_MODULES = ("pandas", "numpy", "motor", "pymongo", "bson", "passlib", "jose", "bcrypt", "duckdb", "pyarrow")
+
+def profile_imports(module: str = "api.index", cwd: Optional[str] = None) -> Dict[str, Any]:
+    """Import a module in a fresh interpreter under ``-X importtime`` and summarize the cost.
+
+    The child runs with VERCEL set, like a serverless cold start. Returns
+    the total import time, the cumulative time of each module, and which
+    of LAZY_MODULES were loaded anyway.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        env=dict(os.environ, VERCEL="1"),
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+
+    self_us = 0
+    modules: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            own, cumulative = int(parts[0]), int(parts[1])
+        except ValueError:
+            # Column header
+            continue
+        self_us += own
+        modules[parts[2].strip()] = cumulative / 1000
+
+    return {
+        "module": module,
+        "total_ms": self_us / 1000,
+        "modules": modules,
+        "lazy_modules_loaded": [name for name in LAZY_MODULES if name in modules],
+    }
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Invalidations older than this are pruned; workers poll far more often
+INVALIDATION_RETENTION_SECONDS = 3600
+
+class SharedStateStore:
+    """State shared by the server workers of one host, in a local SQLite file.
+
+    Holds the progress of running ingest jobs, so any worker can report
+    a job another worker is loading, and a log of cache invalidations
+    that every worker replays into its in-process caches.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS job_progress ("
+                "job_id INTEGER PRIMARY KEY, payload TEXT, updated_at REAL);"
+                "CREATE TABLE IF NOT EXISTS cache_invalidations ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, cache TEXT, tags TEXT, pid INTEGER, created_at REAL);"
+                "CREATE INDEX IF NOT EXISTS ix_cache_invalidations_cache ON cache_invalidations (cache, seq);"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def publish_progress(self, job_id: int, progress: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO job_progress (job_id, payload, updated_at) VALUES (?, ?, ?)",
+            (job_id, json.dumps(progress, default=str), time.time())
+        )
+
+    def get_progress(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT payload FROM job_progress WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remove_progress(self, job_id: int) -> None:
+        self._connect().execute("DELETE FROM job_progress WHERE job_id = ?", (job_id,))
+
+    def all_progress(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute("SELECT payload FROM job_progress ORDER BY job_id")
+        return [json.loads(payload) for (payload,) in rows]
+
+    def publish_invalidation(self, cache: str, tags: Set[str]) -> int:
+        """Record that tags of a cache were invalidated; returns the log position."""
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            seq = conn.execute(
+                "INSERT INTO cache_invalidations (cache, tags, pid, created_at) VALUES (?, ?, ?, ?)",
+                (cache, json.dumps(sorted(tags)), os.getpid(), now)
+            ).lastrowid
+            if seq % 1000 == 0:
+                conn.execute(
+                    "DELETE FROM cache_invalidations WHERE created_at < ?",
+                    (now - INVALIDATION_RETENTION_SECONDS,)
+                )
+        return seq
+
+    def last_invalidation(self) -> int:
+        return self._connect().execute("SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations").fetchone()[0]
+
+    def invalidations_since(self, cache: str, seq: int) -> Tuple[int, Set[str]]:
+        """Tags other processes invalidated in a cache after seq, and the new position."""
+        rows = self._connect().execute(
+            "SELECT seq, tags, pid FROM cache_invalidations WHERE cache = ? AND seq > ? ORDER BY seq",
+            (cache, seq)
+        ).fetchall()
+        tags: Set[str] = set()
+        pid = os.getpid()
+        for row_seq, row_tags, row_pid in rows:
+            seq = row_seq
+            if row_pid != pid:
+                tags.update(json.loads(row_tags))
+        return seq, tags
+
+_store: Optional[SharedStateStore] = None
+_store_lock = threading.Lock()
+
+def get_shared_state() -> Optional[SharedStateStore]:
+    """The store at settings.shared_state_path, or None when running a single process."""
+    global _store
+    if not settings.shared_state_path:
+        return None
+    if _store is None or _store.path != settings.shared_state_path:
+        with _store_lock:
+            if _store is None or _store.path != settings.shared_state_path:
+                _store = SharedStateStore(settings.shared_state_path)
+    return _store
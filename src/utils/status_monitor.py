@@ -1,29 +1,122 @@
+import asyncio
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional
+
+# Job states after which no more progress is reported
+TERMINAL_STATUSES = ("completed", "failed", "duplicate")
 
 class ProcessingMonitor:
-    def __init__(self):
+    """Status and progress counters of a processing job.
+
+    Updates may come from worker threads; listeners are called after each
+    one so async code can wait for changes (see wait_for_change).
+    """
+
+    def __init__(self, job_id: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+        self.job_id = job_id
         self._status = "Idle"
         self._processed_count = 0
         self._processing_time = 0.0
         self._last_update = None
         self._error_count = 0
+        self._error: Optional[str] = None
+        self._rows_parsed = 0
+        self._rows_rejected = 0
+        self._total_rows: Optional[int] = None
+        self._started: Optional[float] = None
+        self._version = 0
+
+    def _changed(self) -> None:
+        with self._lock:
+            self._last_update = datetime.utcnow()
+            self._version += 1
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
 
     def update_status(self, status: str) -> None:
         self._status = status
-        self._last_update = datetime.utcnow()
+        self._changed()
 
     def increment_processed(self, count: int = 1) -> None:
-        self._processed_count += count
-        self._last_update = datetime.utcnow()
+        with self._lock:
+            self._processed_count += count
+        self._changed()
 
     def reset_processed_count(self) -> None:
         self._processed_count = 0
-        self._last_update = datetime.utcnow()
+        self._changed()
 
     def update_processing_time(self, time_in_seconds: float) -> None:
         self._processing_time = time_in_seconds
-        self._last_update = datetime.utcnow()
+        self._changed()
+
+    def start(self, total_rows: Optional[int] = None) -> None:
+        """Mark the job as processing; total_rows (an estimate is fine) enables the ETA."""
+        self._total_rows = total_rows
+        self._started = time.monotonic()
+        self.update_status("processing")
+
+    def record_batch(self, parsed: int, loaded: int) -> None:
+        """Count one batch: rows read from the input and rows written."""
+        with self._lock:
+            self._rows_parsed += parsed
+            self._processed_count += loaded
+            self._rows_rejected += parsed - loaded
+            if self._started is not None:
+                self._processing_time = time.monotonic() - self._started
+        self._changed()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        if error:
+            self._error = error
+            self._error_count += 1
+        if self._started is not None:
+            self._processing_time = time.monotonic() - self._started
+        self.update_status(status)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def done(self) -> bool:
+        return self._status in TERMINAL_STATUSES
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    async def wait_for_change(self, version: int, timeout: float) -> int:
+        """Wait until the monitor is past version or timeout passes; returns the new version."""
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+
+        def notify():
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:
+                # The waiting loop is already closed
+                pass
+
+        self.add_listener(notify)
+        try:
+            if self._version == version:
+                await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.remove_listener(notify)
+        return self._version
 
     def get_status(self) -> Dict[str, Any]:
         return {
@@ -33,4 +126,57 @@ class ProcessingMonitor:
             "last_update": self._last_update,
             "error_count": self._error_count
         }
-        self._last_update = datetime.utcnow()
\ No newline at end of file
+
+    def get_progress(self) -> Dict[str, Any]:
+        """Progress of the job with throughput (rows loaded per second) and ETA."""
+        with self._lock:
+            if self._started is not None and not self.done:
+                elapsed = time.monotonic() - self._started
+            else:
+                elapsed = self._processing_time
+            loaded = self._processed_count
+            parsed = self._rows_parsed
+            throughput = loaded / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if self._total_rows is not None and throughput > 0 and not self.done:
+                eta = max(self._total_rows - parsed, 0) / throughput
+            return {
+                "job_id": self.job_id,
+                "status": self._status,
+                "rows_parsed": parsed,
+                "rows_loaded": loaded,
+                "rows_rejected": self._rows_rejected,
+                "total_rows": self._total_rows,
+                "percent": min(parsed / self._total_rows * 100, 100.0) if self._total_rows else None,
+                "elapsed_seconds": round(elapsed, 3),
+                "throughput_rows_per_sec": round(throughput, 1),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "error": self._error
+            }
+
+class MonitorRegistry:
+    """The monitors of the jobs running in this process, by job id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._monitors: Dict[int, ProcessingMonitor] = {}
+
+    def create(self, job_id: int) -> ProcessingMonitor:
+        monitor = ProcessingMonitor(job_id)
+        with self._lock:
+            self._monitors[job_id] = monitor
+        return monitor
+
+    def get(self, job_id: int) -> Optional[ProcessingMonitor]:
+        return self._monitors.get(job_id)
+
+    def discard(self, job_id: int) -> None:
+        with self._lock:
+            self._monitors.pop(job_id, None)
+
+    def active(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            monitors = list(self._monitors.values())
+        return [monitor.get_progress() for monitor in monitors]
+
+ingest_monitors = MonitorRegistry()